@@ -0,0 +1,82 @@
+"""
+Measure concurrent dashboard requests served through the asyncio API.
+
+Runs a batch of concurrent get_current_streaks/get_completion_summary
+requests and reports request throughput, together with the longest stall
+of the event loop seen by a ticker task. The same requests made directly
+on the blocking API stall the loop for their whole duration.
+
+Usage:
+  python -m benchmarks.async_dashboard [--habits 2000] [--days 90] [--requests 50] [--workers 4]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from src.analytics import HabitAnalytics
+from src.async_api import AsyncHabitAnalytics, AsyncHabitDatabase
+from src.data_generator import create_generated_data
+from src.db_manager import HabitDatabase
+
+async def measure(requests, count: int) -> tuple[float, float]:
+  """Return (elapsed seconds, longest event loop stall in ms) for count requests."""
+  stall = 0.0
+  running = True
+
+  async def ticker():
+    nonlocal stall
+    while running:
+      started = time.perf_counter()
+      await asyncio.sleep(0.001)
+      stall = max(stall, time.perf_counter() - started - 0.001)
+
+  tick = asyncio.create_task(ticker())
+  await asyncio.sleep(0)
+  started = time.perf_counter()
+  await asyncio.gather(*(requests(i) for i in range(count)))
+  elapsed = time.perf_counter() - started
+  running = False
+  await tick
+  return elapsed, stall * 1000
+
+async def run(path: str, count: int, workers: int) -> None:
+  blocking = HabitAnalytics(HabitDatabase(path))
+
+  async def blocking_request(i):
+    if i % 2:
+      blocking.get_completion_summary()
+    else:
+      blocking.get_current_streaks()
+
+  async with AsyncHabitDatabase(path, max_workers=workers) as db:
+    analytics = AsyncHabitAnalytics(db)
+
+    async def async_request(i):
+      if i % 2:
+        await analytics.get_completion_summary()
+      else:
+        await analytics.get_current_streaks()
+
+    print(f"{'API':<10} {'Requests/s':>11} {'Max stall ms':>13}")
+    for name, requests in (("blocking", blocking_request), ("async", async_request)):
+      elapsed, stall = await measure(requests, count)
+      print(f"{name:<10} {count / elapsed:>11.1f} {stall:>13.1f}")
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--habits", type=int, default=2000)
+  parser.add_argument("--days", type=int, default=90)
+  parser.add_argument("--requests", type=int, default=50)
+  parser.add_argument("--workers", type=int, default=4)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "bench.db")
+    db = HabitDatabase(path)
+    create_generated_data(db, num_habits=args.habits, days=args.days, seed=1)
+    db.close()
+    asyncio.run(run(path, args.requests, args.workers))
+
+if __name__ == "__main__":
+  main()
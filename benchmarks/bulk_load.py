@@ -0,0 +1,46 @@
+"""
+Benchmark HabitDatabase.get_all_habits as the number of habits grows.
+
+Reports the number of SQL statements executed and the wall time of a
+single load. The statement count should stay constant.
+
+Usage:
+  python -m benchmarks.bulk_load
+"""
+import time
+from datetime import datetime, timedelta
+from src.db_manager import HabitDatabase
+from src.habit import Habit
+
+SIZES = [100, 1_000, 10_000]
+CHECK_OFFS_PER_HABIT = 30
+
+def populate(db: HabitDatabase, num_habits: int) -> None:
+  """
+  Fill the database with habits that each have a month of history.
+
+  Rows go through the HabitDatabase write methods, so they look like
+  those of any database the app has written.
+  """
+  start = datetime(2024, 1, 1)
+  habit_ids = [db.save_habit(Habit(f"Habit {i}", "daily", start)) for i in range(num_habits)]
+  db.save_check_offs_bulk(habit_ids, [start + timedelta(days=d) for d in range(CHECK_OFFS_PER_HABIT)])
+
+def main():
+  print(f"{'Habits':>8} {'Queries':>8} {'Seconds':>10}")
+  for num_habits in SIZES:
+    db = HabitDatabase(":memory:")
+    try:
+      populate(db, num_habits)
+      statements = []
+      db.conn.set_trace_callback(statements.append)
+      started = time.perf_counter()
+      db.get_all_habits()
+      elapsed = time.perf_counter() - started
+      db.conn.set_trace_callback(None)
+      print(f"{num_habits:>8} {len(statements):>8} {elapsed:>10.3f}")
+    finally:
+      db.close()
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,53 @@
+"""
+Measure CLI process startup time for --help and list.
+
+Each command runs in a fresh interpreter, as when called from scripts.
+
+Usage:
+  python -m benchmarks.cli_startup [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COMMANDS = [["--help"], ["list"]]
+
+def time_command(args, env, runs: int) -> list:
+  """Return the wall time in milliseconds of each run."""
+  timings = []
+  for _ in range(runs):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "src.cli", *args], env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    timings.append((time.perf_counter() - started) * 1000)
+  return timings
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--runs", type=int, default=20)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    env = {**os.environ, "HABITS_DB": os.path.join(tmp, "bench.db")}
+    # Create the schema once so list measures an already migrated database
+    time_command(["list"], env, 1)
+
+    interpreter = []
+    for _ in range(args.runs):
+      started = time.perf_counter()
+      subprocess.run([sys.executable, "-c", "pass"], check=True)
+      interpreter.append((time.perf_counter() - started) * 1000)
+    print(f"{'Command':<12} {'Median ms':>10} {'p90 ms':>8}")
+    print(f"{'(python)':<12} {statistics.median(interpreter):>10.1f} "
+          f"{statistics.quantiles(interpreter, n=10)[-1]:>8.1f}")
+    for command in COMMANDS:
+      timings = time_command(command, env, args.runs)
+      print(f"{' '.join(command):<12} {statistics.median(timings):>10.1f} "
+            f"{statistics.quantiles(timings, n=10)[-1]:>8.1f}")
+
+if __name__ == "__main__":
+  main()
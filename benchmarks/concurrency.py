@@ -0,0 +1,82 @@
+"""
+Measure throughput of concurrent readers and writers on one database.
+
+N reader threads run streak analytics while M writer threads call
+save_check_off on a pooled database (WAL, per-thread readers, one
+writer). Running readers and writers alone and then together shows how
+much each side slows the other down.
+
+Usage:
+  python -m benchmarks.concurrency [--readers 4] [--writers 2] [--seconds 3] [--habits 200]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from src.analytics import HabitAnalytics
+from src.data_generator import create_generated_data
+from src.db_manager import HabitDatabase
+
+def run(db, habit_ids, readers: int, writers: int, seconds: float) -> tuple[int, int]:
+  """Return the number of (analytics calls, check-offs) completed in the time given."""
+  analytics = HabitAnalytics(db)
+  counts = {'reads': 0, 'writes': 0}
+  counts_lock = threading.Lock()
+  deadline = time.perf_counter() + seconds
+
+  def read():
+    done = 0
+    while time.perf_counter() < deadline:
+      analytics.get_current_streaks()
+      done += 1
+    with counts_lock:
+      counts['reads'] += done
+
+  def write(worker: int):
+    done = 0
+    check_date = datetime(2030, 1, 1) + timedelta(minutes=worker)
+    while time.perf_counter() < deadline:
+      db.save_check_off(habit_ids[done % len(habit_ids)], check_date)
+      if done % len(habit_ids) == len(habit_ids) - 1:
+        check_date += timedelta(days=1)
+      done += 1
+    with counts_lock:
+      counts['writes'] += done
+
+  threads = [threading.Thread(target=read) for _ in range(readers)]
+  threads += [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return counts['reads'], counts['writes']
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--readers", type=int, default=4)
+  parser.add_argument("--writers", type=int, default=2)
+  parser.add_argument("--seconds", type=float, default=3.0)
+  parser.add_argument("--habits", type=int, default=200)
+  args = parser.parse_args()
+
+  scenarios = [
+    ("readers", args.readers, 0),
+    ("writers", 0, args.writers),
+    ("mixed", args.readers, args.writers),
+  ]
+  print(f"{'Scenario':<10} {'Readers':>8} {'Writers':>8} {'Reads/s':>10} {'Writes/s':>10}")
+  for name, readers, writers in scenarios:
+    with tempfile.TemporaryDirectory() as tmp:
+      path = os.path.join(tmp, "bench.db")
+      db = HabitDatabase(path, pooled=True)
+      create_generated_data(db, num_habits=args.habits, days=90, seed=1)
+      habit_ids = [habit_id for habit_id, _, _ in db.get_all_stats()]
+      reads, writes = run(db, habit_ids, readers, writers, args.seconds)
+      db.close()
+    print(f"{name:<10} {readers:>8} {writers:>8} "
+          f"{reads / args.seconds:>10.1f} {writes / args.seconds:>10.1f}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,81 @@
+"""
+Measure CLI latency with and without a serve daemon.
+
+Each command runs in a fresh interpreter, as when called from scripts,
+first with HABITS_NO_DAEMON set so it opens the database itself (cold),
+then forwarded to a daemon started on the same generated database, with
+its analytics cache if --cache is given. Latency percentiles include
+interpreter startup in both cases.
+
+Usage:
+  python -m benchmarks.daemon [--habits 2000] [--days 365] [--runs 30] [--cache]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from src import daemon
+from src.data_generator import create_generated_data
+from src.db_manager import HabitDatabase
+
+COMMANDS = [
+  ["list", "--limit", "20"],
+  ["stats", "1"],
+  ["analytics", "summary"],
+  ["analytics", "longest-streak"],
+  ["analytics", "correlations", "--top", "5"],
+]
+
+def time_command(args, env, runs: int) -> list:
+  """Return the wall time in milliseconds of each run."""
+  timings = []
+  for _ in range(runs):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "src", *args], env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    timings.append((time.perf_counter() - started) * 1000)
+  return timings
+
+def percentiles(timings: list) -> str:
+  cuts = statistics.quantiles(timings, n=100, method='inclusive')
+  return f"{cuts[49]:>8.1f} {cuts[89]:>8.1f} {cuts[98]:>8.1f}"
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--habits", type=int, default=2000)
+  parser.add_argument("--days", type=int, default=365)
+  parser.add_argument("--runs", type=int, default=30)
+  parser.add_argument("--cache", action="store_true", help="Start the daemon with serve --cache")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    db_path = os.path.join(tmp, "bench.db")
+    db = HabitDatabase(db_path)
+    create_generated_data(db, args.habits, args.days, seed=0)
+    db.close()
+
+    env = {**os.environ, "HABITS_DB": db_path}
+    cold_env = {**env, "HABITS_NO_DAEMON": "1"}
+    serve = ["serve", "--cache"] if args.cache else ["serve"]
+    server = subprocess.Popen([sys.executable, "-m", "src", *serve], env=env,
+                              stderr=subprocess.DEVNULL)
+    try:
+      socket_path = daemon.socket_path_for(db_path)
+      while not os.path.exists(socket_path):
+        time.sleep(0.05)
+
+      print(f"{args.habits} habits, {args.days} days, {args.runs} runs, latency in ms")
+      print(f"{'Command':<34} {'Mode':<10} {'p50':>8} {'p90':>8} {'p99':>8}")
+      for command in COMMANDS:
+        name = " ".join(command)
+        for mode, mode_env in [("cold", cold_env), ("forwarded", env)]:
+          print(f"{name:<34} {mode:<10} {percentiles(time_command(command, mode_env, args.runs))}")
+    finally:
+      server.terminate()
+      server.wait()
+
+if __name__ == "__main__":
+  main()
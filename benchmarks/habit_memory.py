@@ -0,0 +1,37 @@
+"""
+Compare the memory used per check-off by each Habit storage mode.
+
+Usage:
+  python -m benchmarks.habit_memory
+"""
+import tracemalloc
+from datetime import datetime, timedelta
+from src.habit import CHECK_OFF_STORAGE, Habit
+
+NUM_HABITS = 100
+CHECK_OFFS_PER_HABIT = 1_000
+
+def measure(storage: str) -> float:
+  """Return the bytes allocated per check-off for a batch of loaded habits."""
+  start = datetime(2020, 1, 1, 7, 30)
+  dates = [start + timedelta(days=d) for d in range(CHECK_OFFS_PER_HABIT)]
+
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  habits = []
+  for i in range(NUM_HABITS):
+    habit = Habit(f"Habit {i}", "daily", start, storage=storage)
+    # Copy the datetimes so each habit owns its objects, as when loading rows
+    habit.load_sorted_check_offs(date.replace() for date in dates)
+    habits.append(habit)
+  allocated = tracemalloc.get_traced_memory()[0] - before
+  tracemalloc.stop()
+  return allocated / (NUM_HABITS * CHECK_OFFS_PER_HABIT)
+
+def main():
+  print(f"{'Storage':>14} {'Bytes/check-off':>16}")
+  for storage in CHECK_OFF_STORAGE:
+    print(f"{storage:>14} {measure(storage):>16.1f}")
+
+if __name__ == "__main__":
+  main()
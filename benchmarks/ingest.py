@@ -0,0 +1,77 @@
+"""
+Measure check-off ingestion rates of per-row commits and group commits.
+
+The same stream of check-offs is written to a pooled database with one
+save_check_off call (and transaction) per row, and through a
+BufferedCheckOffWriter in both durability modes, at the NORMAL and FULL
+synchronous levels. 'committed' runs use several producer threads, since
+each producer waits for its commit.
+
+Usage:
+  python -m benchmarks.ingest [--rows 20000] [--habits 100] [--batch-size 1000] [--producers 8]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from src.db_manager import HabitDatabase
+from src.habit import Habit
+from src.ingest import BufferedCheckOffWriter
+
+def check_offs(rows: int, habit_ids: list, offset: int = 0):
+  """Yield distinct (habit_id, check_date) pairs."""
+  start = datetime(2030, 1, 1)
+  for i in range(offset, offset + rows):
+    yield habit_ids[i % len(habit_ids)], start + timedelta(minutes=i)
+
+def per_row(db: HabitDatabase, habit_ids: list, rows: int, _) -> None:
+  for habit_id, check_date in check_offs(rows, habit_ids):
+    db.save_check_off(habit_id, check_date)
+
+def buffered(durability: str):
+  def run(db: HabitDatabase, habit_ids: list, rows: int, args) -> None:
+    producers = args.producers if durability == 'committed' else 1
+    share = rows // producers
+    with BufferedCheckOffWriter(db, batch_size=args.batch_size, durability=durability) as writer:
+      def produce(index: int):
+        for habit_id, check_date in check_offs(share, habit_ids, index * share):
+          writer.write(habit_id, check_date)
+      threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+  return run
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--rows", type=int, default=20_000)
+  parser.add_argument("--habits", type=int, default=100)
+  parser.add_argument("--batch-size", type=int, default=1000)
+  parser.add_argument("--producers", type=int, default=8)
+  args = parser.parse_args()
+
+  scenarios = [
+    ("save_check_off", per_row),
+    ("buffered queued", buffered('queued')),
+    ("buffered committed", buffered('committed')),
+  ]
+  print(f"{'Path':<20} {'Synchronous':>12} {'Rows/s':>12}")
+  for synchronous in ['NORMAL', 'FULL']:
+    for name, run in scenarios:
+      # The per-row path is far slower, so it writes a tenth of the rows
+      rows = args.rows // 10 if run is per_row else args.rows
+      with tempfile.TemporaryDirectory() as tmp:
+        db = HabitDatabase(os.path.join(tmp, "bench.db"), pooled=True, synchronous=synchronous)
+        habit_ids = [db.save_habit(Habit(f"Habit {i}", "daily")) for i in range(args.habits)]
+        started = time.perf_counter()
+        run(db, habit_ids, rows, args)
+        elapsed = time.perf_counter() - started
+        assert sum(stats.total_count for _, _, stats in db.get_all_stats()) == rows
+        db.close()
+      print(f"{name:<20} {synchronous:>12} {rows / elapsed:>12,.0f}")
+
+if __name__ == "__main__":
+  main()
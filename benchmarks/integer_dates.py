@@ -0,0 +1,102 @@
+"""
+Time text-date reads against integer-date reads on a synthetic database.
+
+A database with the original text-only schema is generated, queried,
+upgraded through the migrations and queried again.
+
+Usage:
+  python -m benchmarks.integer_dates [--habits 2000] [--days 1000]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from array import array
+from datetime import datetime, timedelta
+from src.dates import to_epoch_seconds
+from src.migrations import MIGRATIONS, migrate
+
+START = datetime(2020, 1, 1, 7, 30)
+
+def create_legacy_database(path: str, num_habits: int, num_days: int) -> None:
+  """Write a version 1 database with num_habits * num_days check-offs."""
+  conn = sqlite3.connect(path)
+  with conn:
+    conn.execute("BEGIN")
+    MIGRATIONS[0](conn)
+    conn.execute("PRAGMA user_version = 1")
+  dates = [(START + timedelta(days=d)).isoformat() for d in range(num_days)]
+  with conn:
+    for habit_id in range(1, num_habits + 1):
+      conn.execute(
+        "INSERT INTO habits (id, task_name, periodicity, creation_date) VALUES (?, ?, 'daily', ?)",
+        (habit_id, f"Habit {habit_id}", START.isoformat())
+      )
+      conn.executemany(
+        "INSERT INTO check_offs (habit_id, check_date) VALUES (?, ?)",
+        ((habit_id, date) for date in dates)
+      )
+  conn.close()
+
+def timed(label: str, func) -> None:
+  started = time.perf_counter()
+  result = func()
+  print(f"  {label:<38} {time.perf_counter() - started:>8.3f}s  ({result})")
+
+def text_queries(conn: sqlite3.Connection, num_habits: int, cutoff: datetime) -> None:
+  print("Text dates (schema version 1):")
+  timed("full history load", lambda: len([
+    datetime.fromisoformat(check_date) for (check_date,) in conn.execute(
+      "SELECT check_date FROM check_offs ORDER BY habit_id, check_date")
+  ]))
+  timed("per-habit window count", lambda: sum(
+    conn.execute(
+      "SELECT COUNT(*) FROM check_offs WHERE habit_id = ? AND check_date >= ?",
+      (habit_id, cutoff.isoformat())
+    ).fetchone()[0]
+    for habit_id in range(1, num_habits + 1)
+  ))
+  timed("all-habit window count", lambda: conn.execute(
+    "SELECT COUNT(*) FROM check_offs WHERE check_date >= ?", (cutoff.isoformat(),)
+  ).fetchone()[0])
+
+def integer_queries(conn: sqlite3.Connection, num_habits: int, cutoff: datetime) -> None:
+  print("Integer dates (current schema):")
+  # Compact storage packs the integers without building datetime objects
+  timed("full history load", lambda: len(array('q', (
+    check_ts for (check_ts,) in conn.execute(
+      "SELECT check_ts FROM check_offs ORDER BY habit_id, check_day, check_ts")
+  ))))
+  cutoff_day = to_epoch_seconds(cutoff) // 86400
+  timed("per-habit window count", lambda: sum(
+    conn.execute(
+      "SELECT COUNT(*) FROM check_offs WHERE habit_id = ? AND check_day >= ?",
+      (habit_id, cutoff_day)
+    ).fetchone()[0]
+    for habit_id in range(1, num_habits + 1)
+  ))
+  timed("all-habit window count", lambda: conn.execute(
+    "SELECT COUNT(*) FROM check_offs WHERE check_day >= ?", (cutoff_day,)
+  ).fetchone()[0])
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--habits", type=int, default=2000)
+  parser.add_argument("--days", type=int, default=1000)
+  args = parser.parse_args()
+
+  cutoff = START + timedelta(days=args.days - 30)
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "bench.db")
+    print(f"Generating {args.habits * args.days:,} check-offs...")
+    create_legacy_database(path, args.habits, args.days)
+
+    conn = sqlite3.connect(path)
+    text_queries(conn, args.habits, cutoff)
+    timed("migration and backfill", lambda: f"version {migrate(conn)}")
+    integer_queries(conn, args.habits, cutoff)
+    conn.close()
+
+if __name__ == "__main__":
+  main()
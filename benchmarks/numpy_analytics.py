@@ -0,0 +1,67 @@
+"""
+Compare the NumPy analytics engine with the pure-Python streak loops.
+
+Both paths work on the same in-memory history, so the timings exclude
+SQLite reads.
+
+Usage:
+  python -m benchmarks.numpy_analytics [--habits 10000] [--check-offs 1000]
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+from src.analytics import HabitAnalytics
+from src.dates import to_epoch_seconds
+from src.habit import Habit
+from src.vectorized import CheckOffArrays, np
+
+def generate(num_habits: int, check_offs: int, seed: int = 42):
+  """Generate habits and (habit_id, epoch_seconds) rows ending today."""
+  rng = random.Random(seed)
+  now = to_epoch_seconds(datetime.now())
+  habits, rows = [], []
+  for habit_id in range(1, num_habits + 1):
+    habit = Habit(f"Habit {habit_id}", "daily", storage='epoch_seconds')
+    # Mostly consecutive days with occasional gaps
+    seconds, day = [], 0
+    for _ in range(check_offs):
+      seconds.append(now - day * 86400)
+      day += 1 if rng.random() < 0.9 else 3
+    seconds.reverse()
+    habit.load_sorted_epoch_seconds(seconds)
+    habits.append((habit_id, habit))
+    rows.extend((habit_id, value) for value in seconds)
+  return habits, rows
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--habits", type=int, default=10_000)
+  parser.add_argument("--check-offs", type=int, default=1_000)
+  args = parser.parse_args()
+  if np is None:
+    raise SystemExit("NumPy is not installed")
+
+  habits, rows = generate(args.habits, args.check_offs)
+  analytics = HabitAnalytics(db=None)
+
+  started = time.perf_counter()
+  python_longest = [analytics._calculate_longest_streak(habit) for _, habit in habits]
+  python_current = [habit.calculate_streak() for _, habit in habits]
+  python_time = time.perf_counter() - started
+
+  started = time.perf_counter()
+  arrays = CheckOffArrays.from_rows(habits, rows)
+  build_time = time.perf_counter() - started
+  started = time.perf_counter()
+  longest, current = arrays.streaks(to_epoch_seconds(datetime.now()))
+  numpy_time = time.perf_counter() - started
+
+  assert longest.tolist() == python_longest and current.tolist() == python_current
+  print(f"{args.habits:,} habits x {args.check_offs:,} check-offs")
+  print(f"  python loops      {python_time:>8.3f}s")
+  print(f"  numpy arrays      {build_time:>8.3f}s (build)")
+  print(f"  numpy streaks     {numpy_time:>8.3f}s ({python_time / numpy_time:.0f}x)")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,45 @@
+"""
+Measure streak analytics with worker processes over habit shards.
+
+Times get_current_streaks with the numpy and sql engines for each worker
+count on a generated database. Speedups depend on the number of cores.
+
+Usage:
+  python -m benchmarks.parallel_analytics [--habits 20000] [--days 365] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import tempfile
+import time
+from src.analytics import HabitAnalytics
+from src.data_generator import create_generated_data
+from src.db_manager import HabitDatabase
+from src import vectorized
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--habits", type=int, default=20_000)
+  parser.add_argument("--days", type=int, default=365)
+  parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+  args = parser.parse_args()
+
+  engines = ["numpy", "sql"] if vectorized.available() else ["sql"]
+  with tempfile.TemporaryDirectory() as tmp:
+    db = HabitDatabase(os.path.join(tmp, "bench.db"))
+    create_generated_data(db, num_habits=args.habits, days=args.days, seed=1)
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'Engine':<8} {'Workers':>8} {'Seconds':>9} {'Speedup':>8}")
+    for engine in engines:
+      baseline = None
+      for workers in args.workers:
+        analytics = HabitAnalytics(db, engine=engine, workers=workers)
+        started = time.perf_counter()
+        analytics.get_current_streaks()
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"{engine:<8} {workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+    db.close()
+
+if __name__ == "__main__":
+  main()
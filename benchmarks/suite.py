@@ -0,0 +1,178 @@
+"""
+Benchmark suite over generated databases of several sizes.
+
+For each size a database is generated with src.data_generator, then the
+storage methods, every HabitAnalytics method for each available engine and
+the CLI commands (in fresh processes) are timed. Results are written as
+JSON so separate runs can be compared.
+
+With --backend memory the data is held in a MemoryHabitStore instead of an
+SQLite file, which takes disk I/O out of the measurements; the CLI and
+the sql engine need a database file and are skipped.
+
+Usage:
+  python -m benchmarks.suite [--sizes small medium] [--repeat 5] [--output results.json]
+  python -m benchmarks.suite --size huge=1000000:100 --repeat 1
+  python -m benchmarks.suite --backend memory
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+from src.analytics import ENGINES, HabitAnalytics
+from src.data_generator import create_generated_data
+from src.storage import BACKENDS, HabitStore, open_store
+
+# Name -> (habits, days of history)
+SIZES: Dict[str, Tuple[int, int]] = {
+  'small': (100, 90),
+  'medium': (1_000, 365),
+  'large': (10_000, 365),
+}
+
+CLI_COMMANDS = [
+  ['list'],
+  ['stats', '1'],
+  ['analytics', 'habits'],
+  ['analytics', 'streaks'],
+  ['analytics', 'summary'],
+  ['analytics', 'longest-streak'],
+]
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+  """Run func repeat times and summarize the wall times in seconds."""
+  timings = []
+  for _ in range(repeat):
+    started = time.perf_counter()
+    func()
+    timings.append(time.perf_counter() - started)
+  return {
+    'median': statistics.median(timings),
+    'min': min(timings),
+    'max': max(timings),
+    'runs': repeat,
+  }
+
+def bench_storage(db: HabitStore, habit_ids: List[int], repeat: int) -> Dict[str, dict]:
+  rng = random.Random(0)
+  results = {
+    'get_all_habits': measure(db.get_all_habits, repeat),
+    'load_habit': measure(lambda: db.load_habit(rng.choice(habit_ids)), repeat * 10),
+  }
+  # Append new check-offs after the generated history
+  next_date = datetime.now() + timedelta(days=1)
+  def save_check_off():
+    nonlocal next_date
+    db.save_check_off(rng.choice(habit_ids), next_date)
+    next_date += timedelta(seconds=1)
+  results['save_check_off'] = measure(save_check_off, repeat * 10)
+  return results
+
+def bench_analytics(db: HabitStore, habit_ids: List[int], repeat: int) -> Dict[str, dict]:
+  results = {}
+  for engine in ENGINES:
+    try:
+      analytics = HabitAnalytics(db, engine=engine)
+    except ValueError:
+      continue  # the sql engine on the memory backend
+    if analytics.engine != engine:
+      continue  # e.g. numpy not installed
+    methods = {
+      'get_habits_by_periodicity': lambda: analytics.get_habits_by_periodicity('daily'),
+      'get_longest_streak_habit': analytics.get_longest_streak_habit,
+      'get_habit_longest_streak': lambda: analytics.get_habit_longest_streak(habit_ids[0]),
+      'get_completion_summary': analytics.get_completion_summary,
+      'get_current_streaks': analytics.get_current_streaks,
+    }
+    for name, method in methods.items():
+      results[f"HabitAnalytics.{name}[{engine}]"] = measure(method, repeat)
+  # Pair analytics use NumPy when installed, whatever the engine
+  analytics = HabitAnalytics(db)
+  results["HabitAnalytics.get_correlations"] = measure(analytics.get_correlations, repeat)
+  return results
+
+def bench_cli(db_path: str, repeat: int) -> Dict[str, dict]:
+  env = {**os.environ, 'HABITS_DB': db_path}
+  results = {}
+  for command in CLI_COMMANDS:
+    run = lambda: subprocess.run([sys.executable, '-m', 'src.cli', *command], env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    results[f"cli {' '.join(command)}"] = measure(run, repeat)
+  return results
+
+def run_size(name: str, num_habits: int, days: int, repeat: int, tmp: str,
+             backend: str = 'sqlite') -> dict:
+  db_path = os.path.join(tmp, f"{name}.db")
+  db = open_store(db_path, backend)
+  started = time.perf_counter()
+  habits_added, check_offs_added = create_generated_data(db, num_habits, days, seed=0)
+  generation_time = time.perf_counter() - started
+  print(f"[{name}] {habits_added:,} habits, {check_offs_added:,} check-offs "
+        f"generated in {generation_time:.1f}s", file=sys.stderr)
+
+  habit_ids = [habit_id for habit_id, _ in db.get_all_habits(load_history=False)]
+  benchmarks = {}
+  benchmarks.update(bench_analytics(db, habit_ids, repeat))
+  if backend == 'sqlite':
+    benchmarks.update(bench_cli(db_path, repeat))
+  # Writes last, so earlier measurements see the generated data only
+  benchmarks.update(bench_storage(db, habit_ids, repeat))
+  db.close()
+  return {
+    'size': name,
+    'backend': backend,
+    'habits': habits_added,
+    'check_offs': check_offs_added,
+    'generation_seconds': generation_time,
+    'benchmarks': benchmarks,
+  }
+
+def parse_size(value: str) -> Tuple[str, int, int]:
+  """Parse NAME=HABITS:DAYS."""
+  name, _, spec = value.partition('=')
+  habits, _, days = spec.partition(':')
+  return name, int(habits), int(days)
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+  parser.add_argument('--size', action='append', type=parse_size, default=[],
+                      metavar='NAME=HABITS:DAYS', help='Additional custom size')
+  parser.add_argument('--repeat', type=int, default=5)
+  parser.add_argument('--backend', choices=BACKENDS, default='sqlite')
+  parser.add_argument('--output', help='JSON file to write (default: stdout)')
+  args = parser.parse_args()
+
+  sizes = [(name, *SIZES[name]) for name in args.sizes] + args.size
+  report = {
+    'meta': {
+      'timestamp': datetime.now().isoformat(timespec='seconds'),
+      'python': platform.python_version(),
+      'sqlite': sqlite3.sqlite_version,
+      'platform': platform.platform(),
+      'repeat': args.repeat,
+    },
+    'results': [],
+  }
+  with tempfile.TemporaryDirectory() as tmp:
+    for name, num_habits, days in sizes:
+      report['results'].append(run_size(name, num_habits, days, args.repeat, tmp, args.backend))
+
+  output = json.dumps(report, indent=2)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(output + "\n")
+  else:
+    print(output)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,19 @@
+"""
+Entry point of `python -m src`, the quickest way to run the CLI.
+
+Commands a serve daemon can answer are forwarded before click and the
+storage and analytics modules are imported, see src.daemon; everything
+else runs src.cli in this process.
+"""
+import sys
+from .daemon import forward_command_line
+
+def main() -> None:
+  exit_code = forward_command_line(sys.argv[1:])
+  if exit_code is not None:
+    sys.exit(exit_code)
+  from .cli import run
+  run()
+
+if __name__ == '__main__':
+  main()
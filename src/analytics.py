@@ -1,12 +1,63 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
+from .bitmaps import PeriodBitmap, period_of_day
+from .correlations import Correlation, top_correlations
+from .dates import to_epoch_day, to_epoch_seconds
 from .habit import Habit
 from .db_manager import HabitDatabase
+from .habit_stats import STREAK_INTERVALS
+from .storage import HabitStore
+from . import sql_analytics
+from .analytics_cache import AnalyticsCache, cached_result
+from .options import ENGINES
+from .profiling import profiled_section
+
+# Window and number of expected periods for the completion summary
+COMPLETION_WINDOWS = {
+  'daily': (timedelta(days=10), 10),
+  'weekly': (timedelta(weeks=4), 4),
+  'monthly': (timedelta(days=90), 3)
+}
 
 class HabitAnalytics:
-  def __init__(self, db: HabitDatabase):
+  def __init__(self, db: HabitStore, engine: str = 'python', workers: int = 1,
+               cache: Optional[AnalyticsCache] = None):
+    """
+    Initialize analytics over a habit store.
+
+    Args:
+      db: The habit store, see src.storage
+      engine: 'python' reads materialized stats and replays history in Python;
+        'numpy' computes over all check-offs at once with NumPy, falling back
+        to 'python' when NumPy is not installed; 'sql' pushes the work down
+        into SQLite queries and needs a HabitDatabase
+      workers: Processes computing streaks with the numpy and sql engines,
+        each over its own shard of habits (see src.parallel). The python
+        engine reads materialized stats and always runs in-process
+      cache: Optional cache memoizing results until the data or the date
+        changes, see src.analytics_cache
+    """
+    if engine not in ENGINES:
+      raise ValueError(f"Engine must be one of: {ENGINES}")
+    if engine == 'sql' and not isinstance(db, HabitDatabase):
+      raise ValueError("The sql engine needs an SQLite database")
+    if workers < 1:
+      raise ValueError("Workers must be at least 1")
+    if workers > 1 and db.db_path == ':memory:':
+      raise ValueError("Parallel analytics need a database file")
+    if engine == 'numpy':
+      # Imported here so NumPy is only loaded when asked for
+      from . import vectorized
+      if not vectorized.available():
+        engine = 'python'
     self.db = db
+    self.engine = engine
+    self.workers = workers
+    self.cache = cache
 
+  @profiled_section
+  @cached_result
   def get_habits_by_periodicity(self, periodicity: Optional[str] = None) -> List[Tuple[int, Habit]]:
     """
     Get all habits filtered by periodicity.
@@ -21,23 +72,51 @@ class HabitAnalytics:
       return [(id, habit) for id, habit in habits if habit.periodicity == periodicity.lower()]
     return habits
 
+  def iter_habits_by_periodicity(self, periodicity: Optional[str] = None, batch_size: int = 1000,
+                                 after_id: Optional[int] = None,
+                                 limit: Optional[int] = None) -> Iterator[Tuple[int, Habit]]:
+    """
+    Stream habits in ID order, optionally filtered by periodicity.
+
+    Unlike get_habits_by_periodicity, check-off histories are not loaded.
+
+    Args:
+      periodicity: Optional filter ('daily', 'weekly', 'monthly')
+      batch_size: Habits fetched per query
+      after_id: Only yield habits with a greater ID
+      limit: Maximum number of habits to yield
+    """
+    return self.db.iter_habits(batch_size, after_id, limit, periodicity)
+
+  @profiled_section
+  @cached_result
   def get_longest_streak_habit(self) -> Tuple[Optional[int], Optional[Habit], int]:
     """
     Find the habit with the longest streak ever.
     
+    Streaks are read from the materialized habit stats, so the returned
+    habit does not have its check-off history loaded.
+
     Returns:
       Tuple of (habit_id, habit, streak_length)
     """
-    habits = self.db.get_all_habits()
-    if not habits:
+    if self.workers > 1 and self.engine != 'python':
+      return self._parallel_longest_streak_habit()
+    if self.engine == 'numpy':
+      return self._numpy_longest_streak_habit()
+    if self.engine == 'sql':
+      return self._sql_longest_streak_habit()
+
+    all_stats = self.db.get_all_stats()
+    if not all_stats:
       return None, None, 0
 
     max_streak = 0
     max_streak_habit_id = None
     max_streak_habit = None
 
-    for habit_id, habit in habits:
-      streak = self._calculate_longest_streak(habit)
+    for habit_id, habit, stats in all_stats:
+      streak = stats.longest_streak
       if streak > max_streak:
         max_streak = streak
         max_streak_habit_id = habit_id
@@ -45,19 +124,21 @@ class HabitAnalytics:
 
     return max_streak_habit_id, max_streak_habit, max_streak
 
+  @profiled_section
+  @cached_result
   def get_habit_longest_streak(self, habit_id: int) -> int:
-    """Calculate the longest streak ever for a specific habit."""
-    habit = self.db.load_habit(habit_id)
-    if not habit:
+    """Return the longest streak ever for a specific habit."""
+    stats = self.db.get_stats(habit_id)
+    if not stats:
       return 0
-    return self._calculate_longest_streak(habit)
+    return stats.longest_streak
 
   def _calculate_longest_streak(self, habit: Habit) -> int:
     """Calculate the longest streak ever for a habit."""
     if not habit.check_off_dates:
       return 0
 
-    check_dates = sorted(habit.check_off_dates)
+    check_dates = habit.check_off_dates
     longest_streak = 1
     current_streak = 1
 
@@ -69,8 +150,10 @@ class HabitAnalytics:
     else:  # monthly
       expected_interval = timedelta(days=30)
 
-    for i in range(1, len(check_dates)):
-      date_diff = check_dates[i] - check_dates[i-1]
+    previous = check_dates[0]
+    for check_date in islice(check_dates, 1, None):
+      date_diff = check_date - previous
+      previous = check_date
       if date_diff <= expected_interval:
         current_streak += 1
         longest_streak = max(longest_streak, current_streak)
@@ -79,52 +162,365 @@ class HabitAnalytics:
 
     return longest_streak
 
-  def get_completion_summary(self) -> Dict[str, float]:
+  @profiled_section
+  @cached_result
+  def get_completion_summary(self, window: Optional[timedelta] = None) -> Dict[str, float]:
     """
     Calculate completion rates by periodicity.
     
+    Args:
+      window: Optional number of days, ending today, to measure instead of
+        the default windows; answered from the check-off rollups whatever
+        the engine
     Returns:
       Dictionary with completion rates for each periodicity
+    Raises:
+      ValueError: If the window is shorter than a day
     """
+    if window is not None:
+      return self._windowed_completion_summary(window)
+    if self.engine == 'numpy':
+      return self._numpy_completion_summary()
+    if self.engine == 'sql':
+      return self._sql_completion_summary()
+
     # Initialize summary with 0.0 for all periodicities
     summary = {'daily': 0.0, 'weekly': 0.0, 'monthly': 0.0}
-    habits = self.db.get_all_habits()
     today = datetime.now()
-    
-    for habit_id, habit in habits:
-      check_offs = self.db.get_check_offs(habit_id)
-      
-      if habit.periodicity == "daily":
-        # Calculate percentage for daily habits (last 10 days)
-        total_days = 10
-        recent_check_offs = [co for co in check_offs if (today - co) <= timedelta(days=total_days)]
-        completion_percentage = round((len(recent_check_offs) / total_days) * 100)
-        summary['daily'] = completion_percentage
-      elif habit.periodicity == "weekly":
-        # Calculate percentage for weekly habits (last 4 weeks)
-        total_weeks = 4
-        recent_check_offs = [co for co in check_offs if (today - co) <= timedelta(weeks=total_weeks)]
-        completion_percentage = (len(recent_check_offs) / total_weeks) * 100
-        summary['weekly'] = completion_percentage
-      elif habit.periodicity == "monthly":
-        # Calculate percentage for monthly habits (last 3 months)
-        total_months = 3
-        recent_check_offs = [co for co in check_offs if (today - co) <= timedelta(days=total_months * 30)]
-        completion_percentage = (len(recent_check_offs) / total_months) * 100
-        summary['monthly'] = completion_percentage
-    
+
+    # The newest habit of each periodicity decides its rate, and only its
+    # check-offs inside the window are read
+    for periodicity, habit_id in self.db.get_newest_habit_ids().items():
+      # Daily habits cover the last 10 days, weekly 4 weeks, monthly 3 months
+      window, periods = COMPLETION_WINDOWS[periodicity]
+      recent_check_offs = len(self.db.get_check_offs(habit_id, since=today - window))
+      summary[periodicity] = self._completion_percentage(
+        periodicity, recent_check_offs, periods
+      )
+
     return summary
 
+  def _windowed_completion_summary(self, window: timedelta) -> Dict[str, float]:
+    """get_completion_summary over the last window.days days, counted from rollups."""
+    days = window.days
+    if days < 1:
+      raise ValueError("Window must be at least one day")
+
+    summary = {'daily': 0.0, 'weekly': 0.0, 'monthly': 0.0}
+    end_day = to_epoch_day(datetime.now())
+    newest = self.db.get_newest_habit_ids()
+    counts = self.db.count_check_offs(end_day - days + 1, end_day, newest.values())
+
+    # Like the other paths, the newest habit of each periodicity decides its rate
+    for periodicity, habit_id in newest.items():
+      periods = days / STREAK_INTERVALS[periodicity].days
+      summary[periodicity] = self._completion_percentage(
+        periodicity, counts.get(habit_id, 0), periods
+      )
+    return summary
+
+  @staticmethod
+  def _completion_percentage(periodicity: str, recent_check_offs: int, periods: int) -> float:
+    """Percentage of expected periods completed; daily rates are rounded."""
+    completion_percentage = (recent_check_offs / periods) * 100
+    if periodicity == 'daily':
+      return round(completion_percentage)
+    return completion_percentage
+
+  @profiled_section
+  @cached_result
   def get_current_streaks(self) -> List[Tuple[int, Habit, int]]:
     """
     Get all habits with their current streaks, sorted by streak length.
     
+    Streaks are read from the materialized habit stats, so the returned
+    habits do not have their check-off history loaded.
+
     Returns:
       List of (habit_id, habit, current_streak) tuples
     """
-    habits = self.db.get_all_habits()
+    if self.workers > 1 and self.engine != 'python':
+      return self._parallel_current_streaks()
+    if self.engine == 'numpy':
+      return self._numpy_current_streaks()
+    if self.engine == 'sql':
+      return self._sql_current_streaks()
+
+    now = datetime.now()
     streak_data = [
-      (id, habit, habit.calculate_streak())
-      for id, habit in habits
+      (id, habit, stats.current_streak(habit.periodicity, now))
+      for id, habit, stats in self.db.get_all_stats()
     ]
-    return sorted(streak_data, key=lambda x: x[2], reverse=True) 
\ No newline at end of file
+    return sorted(streak_data, key=lambda x: x[2], reverse=True)
+
+  @profiled_section
+  @cached_result
+  def get_period_streaks(self) -> List[Tuple[int, Habit, int, int]]:
+    """
+    Get all habits with their current and longest runs of consecutive
+    completed periods, sorted by current run.
+
+    Unlike the check-off streaks, runs count calendar days, ISO weeks or
+    months: a daily habit checked off on Monday morning and Tuesday
+    evening has a run of two days here. Runs are read from the period
+    bitmaps whatever the engine, see src.bitmaps.
+
+    Returns:
+      List of (habit_id, habit, current_run, longest_run) tuples
+    """
+    today = to_epoch_day(datetime.now())
+    bitmaps = self.db.get_period_bitmaps()
+    runs = []
+    for habit_id, habit in self.db.iter_habits():
+      bitmap = bitmaps.get(habit_id, PeriodBitmap())
+      current = bitmap.current_run(period_of_day(today, habit.periodicity))
+      runs.append((habit_id, habit, current, bitmap.longest_run()))
+    return sorted(runs, key=lambda x: x[2], reverse=True)
+
+  @profiled_section
+  @cached_result
+  def get_perfect_days(self, days: int = 30,
+                       habit_ids: Optional[Tuple[int, ...]] = None) -> PeriodBitmap:
+    """
+    Find the days on which every daily habit was checked off.
+
+    The daily habits' bitmaps are intersected over the last days days,
+    ending today. Days before a habit was created do not count against
+    it, but a day is only perfect if at least one of the habits existed.
+
+    Args:
+      days: Length of the window in days
+      habit_ids: Only consider these daily habits (default: all daily habits)
+    Returns:
+      Bitmap of the perfect epoch days, starting at the first day of the
+      window; its runs are perfect-day streaks
+    Raises:
+      ValueError: If the window is shorter than a day, or a habit does not
+        exist or is not daily
+    """
+    if days < 1:
+      raise ValueError("Window must be at least one day")
+    end = to_epoch_day(datetime.now())
+    start = end - days + 1
+
+    if habit_ids is None:
+      found = self.db.get_period_bitmaps(periodicity='daily')
+      # Habits without check-offs have no bitmap
+      habits_and_bitmaps = [
+        (habit, found.get(habit_id, PeriodBitmap()))
+        for habit_id, habit in self.db.iter_habits(periodicity='daily')
+      ]
+    else:
+      found = self.db.get_period_bitmaps(habit_ids)
+      habits_and_bitmaps = []
+      for habit_id in habit_ids:
+        habit = self.db.load_habit(habit_id, load_history=False)
+        if habit is None:
+          raise ValueError(f"Habit {habit_id} not found")
+        if habit.periodicity != 'daily':
+          raise ValueError(f"Habit {habit_id} is not a daily habit")
+        habits_and_bitmaps.append((habit, found.get(habit_id, PeriodBitmap())))
+
+    window = (1 << days) - 1
+    perfect, tracked = window, 0
+    for habit, bitmap in habits_and_bitmaps:
+      # Days before the habit was created count as done
+      exempt = (1 << min(max(to_epoch_day(habit.creation_date) - start, 0), days)) - 1
+      perfect &= bitmap.window(start, end) | exempt
+      tracked |= window & ~exempt
+    return PeriodBitmap(start, perfect & tracked)
+
+  @profiled_section
+  @cached_result
+  def get_correlations(self, periods: int = 90, lag: int = 0, top: Optional[int] = 20,
+                       sort: str = 'lift', periodicity: str = 'daily',
+                       min_count: int = 1) -> List[Correlation]:
+    """
+    Rank pairs of habits by how they were done together.
+
+    Every habit of one periodicity is paired with every other over the
+    last periods periods, ending with the current one, see
+    src.correlations. Periods before a habit was created are left out of
+    its pairs. The counts are matrix products with NumPy whatever the
+    engine, and pairwise bit counts without it.
+
+    Args:
+      periods: Length of the window in days, weeks or months
+      lag: Periods from the first habit of a pair to the second, e.g. 1 to
+        see which daily habits predict others the next day
+      top: Number of pairs to return (default: all)
+      sort: One of CORRELATION_SORTS
+      periodicity: Habits to pair
+      min_count: Leave out pairs done together in fewer periods
+    Returns:
+      List of Correlation tuples, best first
+    Raises:
+      ValueError: For an invalid periodicity, window, lag, top or sort
+    """
+    if periodicity not in STREAK_INTERVALS:
+      raise ValueError(f"Periodicity must be one of: {list(STREAK_INTERVALS)}")
+    if periods < 1:
+      raise ValueError("Window must be at least one period")
+    end = period_of_day(to_epoch_day(datetime.now()), periodicity)
+    start = end - periods + 1
+
+    bitmaps = self.db.get_period_bitmaps(periodicity=periodicity)
+    window = (1 << periods) - 1
+    habit_ids, done, existed = [], [], []
+    for habit_id, habit in self.db.iter_habits(periodicity=periodicity):
+      created = period_of_day(to_epoch_day(habit.creation_date), periodicity)
+      alive = window & ~((1 << min(max(created - start, 0), periods)) - 1)
+      habit_ids.append(habit_id)
+      done.append(bitmaps.get(habit_id, PeriodBitmap()).window(start, end) & alive)
+      existed.append(alive)
+    return top_correlations(habit_ids, done, existed, periods, lag, top, sort, min_count)
+
+  def iter_current_streaks(self, batch_size: int = 1000, after_id: Optional[int] = None,
+                           limit: Optional[int] = None) -> Iterator[Tuple[int, Habit, int]]:
+    """
+    Stream habits with their current streaks in ID order.
+
+    The python engine reads stats page by page, so the first rows are
+    available immediately and memory stays bounded by batch_size. The
+    numpy and sql engines compute every streak at once and then page
+    through the result.
+
+    Args:
+      batch_size: Habits fetched per query
+      after_id: Only yield habits with a greater ID
+      limit: Maximum number of habits to yield
+    Returns:
+      Iterator of (habit_id, habit, current_streak) tuples
+    """
+    if self.engine != 'python':
+      streak_data = sorted(
+        (item for item in self.get_current_streaks() if after_id is None or item[0] > after_id),
+        key=lambda x: x[0]
+      )
+      return iter(streak_data[:limit] if limit is not None else streak_data)
+
+    now = datetime.now()
+    return (
+      (id, habit, stats.current_streak(habit.periodicity, now))
+      for id, habit, stats in self.db.iter_stats(batch_size, after_id, limit)
+    )
+
+  @profiled_section
+  def _parallel_streaks(self) -> List[Tuple[int, Habit, int, int]]:
+    """Compute (habit_id, habit, longest, current) of every habit in worker processes."""
+    from . import parallel
+    streaks = parallel.compute_streaks(self.db, self.engine, self.workers, datetime.now())
+    habits = dict(self.db.get_all_habits(load_history=False))
+    return [
+      (id, habits[id], longest, current)
+      for id, longest, current in streaks if id in habits
+    ]
+
+  def _parallel_longest_streak_habit(self) -> Tuple[Optional[int], Optional[Habit], int]:
+    """get_longest_streak_habit computed by worker processes."""
+    max_streak = 0
+    max_streak_habit_id = None
+    max_streak_habit = None
+    for habit_id, habit, longest, _ in self._parallel_streaks():
+      if longest > max_streak:
+        max_streak = longest
+        max_streak_habit_id = habit_id
+        max_streak_habit = habit
+    return max_streak_habit_id, max_streak_habit, max_streak
+
+  def _parallel_current_streaks(self) -> List[Tuple[int, Habit, int]]:
+    """get_current_streaks computed by worker processes."""
+    streak_data = [(id, habit, current) for id, habit, _, current in self._parallel_streaks()]
+    return sorted(streak_data, key=lambda x: x[2], reverse=True)
+
+  @profiled_section
+  def _numpy_longest_streak_habit(self) -> Tuple[Optional[int], Optional[Habit], int]:
+    """Vectorized get_longest_streak_habit."""
+    from . import vectorized
+    habits, arrays = vectorized.load_check_off_arrays(self.db)
+    if not habits:
+      return None, None, 0
+
+    longest, _ = arrays.streaks(to_epoch_seconds(datetime.now()))
+    index = int(longest.argmax())
+    if longest[index] == 0:
+      return None, None, 0
+    habit_id, habit = habits[index]
+    return habit_id, habit, int(longest[index])
+
+  @profiled_section
+  def _numpy_current_streaks(self) -> List[Tuple[int, Habit, int]]:
+    """Vectorized get_current_streaks."""
+    from . import vectorized
+    habits, arrays = vectorized.load_check_off_arrays(self.db)
+    _, current = arrays.streaks(to_epoch_seconds(datetime.now()))
+    streak_data = [
+      (id, habit, int(streak))
+      for (id, habit), streak in zip(habits, current.tolist())
+    ]
+    return sorted(streak_data, key=lambda x: x[2], reverse=True)
+
+  @profiled_section
+  def _numpy_completion_summary(self) -> Dict[str, float]:
+    """Vectorized get_completion_summary."""
+    from . import vectorized
+    summary = {'daily': 0.0, 'weekly': 0.0, 'monthly': 0.0}
+    habits, arrays = vectorized.load_check_off_arrays(self.db)
+    if not habits:
+      return summary
+
+    today = to_epoch_seconds(datetime.now())
+    windows = {
+      periodicity: int(window.total_seconds())
+      for periodicity, (window, _) in COMPLETION_WINDOWS.items()
+    }
+    cutoffs = vectorized.np.array(
+      [today - windows[habit.periodicity] for _, habit in habits], dtype=vectorized.np.int64
+    )
+    recent = arrays.counts_since(cutoffs).tolist()
+
+    # Like the Python path, the last habit of each periodicity wins
+    for (_, habit), recent_check_offs in zip(habits, recent):
+      periods = COMPLETION_WINDOWS[habit.periodicity][1]
+      summary[habit.periodicity] = self._completion_percentage(
+        habit.periodicity, recent_check_offs, periods
+      )
+    return summary
+
+  @profiled_section
+  def _sql_longest_streak_habit(self) -> Tuple[Optional[int], Optional[Habit], int]:
+    """get_longest_streak_habit computed inside SQLite."""
+    habits = self.db.get_all_habits(load_history=False)
+    streaks = sql_analytics.get_streaks(self.db, datetime.now())
+
+    max_streak = 0
+    max_streak_habit_id = None
+    max_streak_habit = None
+    for (habit_id, habit), (_, longest, _) in zip(habits, streaks):
+      if longest > max_streak:
+        max_streak = longest
+        max_streak_habit_id = habit_id
+        max_streak_habit = habit
+    return max_streak_habit_id, max_streak_habit, max_streak
+
+  @profiled_section
+  def _sql_current_streaks(self) -> List[Tuple[int, Habit, int]]:
+    """get_current_streaks computed inside SQLite."""
+    habits = self.db.get_all_habits(load_history=False)
+    streaks = sql_analytics.get_streaks(self.db, datetime.now())
+    streak_data = [
+      (id, habit, current)
+      for (id, habit), (_, _, current) in zip(habits, streaks)
+    ]
+    return sorted(streak_data, key=lambda x: x[2], reverse=True)
+
+  @profiled_section
+  def _sql_completion_summary(self) -> Dict[str, float]:
+    """get_completion_summary computed inside SQLite."""
+    summary = {'daily': 0.0, 'weekly': 0.0, 'monthly': 0.0}
+    windows = {periodicity: window for periodicity, (window, _) in COMPLETION_WINDOWS.items()}
+    counts = sql_analytics.get_completion_counts(self.db, datetime.now(), windows)
+    for periodicity, (_, recent_check_offs) in counts.items():
+      periods = COMPLETION_WINDOWS[periodicity][1]
+      summary[periodicity] = self._completion_percentage(periodicity, recent_check_offs, periods)
+    return summary
@@ -0,0 +1,152 @@
+"""
+Memoized HabitAnalytics results.
+
+Results are cached per method, engine and arguments in an LRU dictionary.
+Each entry records the date and the database version it was computed
+for, see HabitDatabase.get_data_version, and is only returned while both
+are unchanged. Streaks that end during the day are therefore refreshed
+the next day at the latest, or at the next write.
+
+Each call returns its own list or dictionary, so callers may sort or
+extend it, but the habits and tuples in it are shared by every call and
+must be treated as read-only.
+
+With a path, entries are also written to a pickle file keyed by date and
+change counter only, so consecutive processes, such as CLI invocations,
+reuse each other's results.
+"""
+import copy
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class AnalyticsCache:
+  def __init__(self, maxsize: int = 128, path: Optional[str] = None):
+    """
+    Args:
+      maxsize: Maximum number of results kept
+      path: Optional pickle file the results are persisted to
+    Raises:
+      ValueError: If maxsize is not positive
+    """
+    if maxsize < 1:
+      raise ValueError("Cache size must be positive")
+    self.maxsize = maxsize
+    self.path = path
+    self.hits = 0
+    self.misses = 0
+    # Key -> (token, result), least recently used first
+    self._entries: OrderedDict = OrderedDict()
+    # Key -> (durable token, result) as stored in the file
+    self._persisted: Dict[Hashable, Tuple[Any, Any]] = {}
+    # Pooled and async databases call analytics from several threads
+    self._lock = threading.RLock()
+    if path and os.path.exists(path):
+      self._load()
+
+  def get(self, key: Hashable, token: Tuple, persistent: bool = True) -> Tuple[bool, Any]:
+    """
+    Look up a result computed for a token.
+
+    Args:
+      key: Method and arguments
+      token: (durable, volatile) version; persisted entries only need the
+        durable part to match
+      persistent: Whether persisted entries may be used
+    Returns:
+      Tuple of (found, result)
+    """
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and entry[0] == token:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+      persisted = self._persisted.get(key)
+      if persistent and persisted is not None and persisted[0] == token[0]:
+        self._store(key, token, persisted[1])
+        self.hits += 1
+        return True, persisted[1]
+
+      self.misses += 1
+      return False, None
+
+  def put(self, key: Hashable, token: Tuple, result: Any, persistent: bool = True) -> None:
+    """Store a result computed for a token, also saving it to the file if persistent."""
+    with self._lock:
+      self._store(key, token, result)
+      if self.path and persistent:
+        # Entries for older data or earlier days can never match again
+        persisted = {
+          key: entry for key, entry in self._persisted.items() if entry[0] == token[0]
+        }
+        persisted[key] = (token[0], result)
+        while len(persisted) > self.maxsize:
+          del persisted[next(iter(persisted))]
+        self._persisted = persisted
+        self._save()
+
+  def _store(self, key: Hashable, token: Tuple, result: Any) -> None:
+    self._entries[key] = (token, result)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.maxsize:
+      self._entries.popitem(last=False)
+
+  def clear(self) -> None:
+    """Drop every result, including the persisted ones."""
+    with self._lock:
+      self._entries.clear()
+      self._persisted.clear()
+      if self.path and os.path.exists(self.path):
+        os.remove(self.path)
+
+  def stats(self) -> Dict[str, int]:
+    """Return hit and miss counters and the number of cached results."""
+    return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+  def _load(self) -> None:
+    """Read persisted results, ignoring unreadable files."""
+    try:
+      with open(self.path, 'rb') as f:
+        self._persisted = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+      self._persisted = {}
+
+  def _save(self) -> None:
+    """Write persisted results through a temporary file, replacing the old one atomically."""
+    temporary = f"{self.path}.tmp"
+    with open(temporary, 'wb') as f:
+      pickle.dump(self._persisted, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, self.path)
+
+def cached_result(method: Callable) -> Callable:
+  """
+  Memoize a HabitAnalytics method in its cache, if it has one.
+
+  Results are returned as shallow copies: copying every habit would cost
+  more than recomputing most results.
+  """
+  name = method.__name__
+
+  @wraps(method)
+  def wrapper(self, *args, **kwargs):
+    cache = self.cache
+    if cache is None:
+      return method(self, *args, **kwargs)
+
+    counter, data_version = self.db.get_data_version()
+    token = ((date.today().isoformat(), counter), data_version)
+    key = (name, self.db.db_path, self.engine, args, tuple(sorted(kwargs.items())))
+    # Counters of in-memory databases restart at zero, so never persist them
+    persistent = self.db.db_path != ':memory:'
+    found, result = cache.get(key, token, persistent)
+    if not found:
+      result = method(self, *args, **kwargs)
+      cache.put(key, token, result, persistent)
+    return copy.copy(result)
+  return wrapper
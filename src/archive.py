@@ -0,0 +1,160 @@
+"""
+Archival of old check-offs into a separate habit database.
+
+HabitDatabase.archive moves the check-offs before a cutoff day into an
+archive file, by default next to the database (habits.archive.db). The
+archive is itself a habit database holding copies of the habits and
+their archived check-offs, so every command works on it with --db.
+
+Before the rows leave, they are folded into one archived_history row per
+habit: the habit_stats figures of the archived check-offs (total count,
+longest streak, last check-off and the run ending at it) and their
+period bitmap. Moving the rows leaves the live stats and bitmaps as they
+were; rebuilding them starts from these summaries, and the numpy and sql
+engines continue runs from them, so streaks, totals and completion rates
+stay exact while the live database only holds the retention window.
+
+The archived days are closed: the live database could neither tell
+whether a check-off on them is already archived nor count it in the
+rollups, so saving or importing check-offs before the cutoff raises
+ValueError, and so does counting a range that starts before it.
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from .bitmaps import PeriodBitmap
+from .dates import from_epoch_day, to_epoch_seconds
+from .habit_stats import HabitStats
+
+class ArchiveState(NamedTuple):
+  """Where and up to which day check-offs were last archived."""
+  cutoff_day: int
+  path: str
+
+def default_archive_path(db_path: str) -> Optional[str]:
+  """Return the archive file of a database file, or None for an in-memory database."""
+  if db_path == ':memory:':
+    return None
+  root, extension = os.path.splitext(db_path)
+  return f"{root}.archive{extension or '.db'}"
+
+def get_state(conn: sqlite3.Connection) -> Optional[ArchiveState]:
+  """Return the state of the last archive run, or None if nothing was archived."""
+  row = conn.execute("SELECT cutoff_day, path FROM archive_state").fetchone()
+  return ArchiveState(*row) if row else None
+
+def ensure_live(conn: sqlite3.Connection, day: Optional[int]) -> None:
+  """
+  Check that a day is not archived.
+
+  Args:
+    conn: Connection to read the archive state from
+    day: Epoch day, or None for no day
+  Raises:
+    ValueError: If the day is before the archive cutoff
+  """
+  state = get_state(conn)
+  if day is not None and state is not None and day < state.cutoff_day:
+    raise ValueError(
+      f"Check-offs before {from_epoch_day(state.cutoff_day).date()} are archived in {state.path}"
+    )
+
+def _habit_filter(habit_ids: Optional[Iterable[int]]) -> tuple[str, list]:
+  if habit_ids is None:
+    return "", []
+  return "WHERE habit_id IN (SELECT value FROM json_each(?))", [json.dumps(list(habit_ids))]
+
+def load_archived_stats(conn: sqlite3.Connection,
+                        habit_ids: Optional[Iterable[int]] = None) -> Dict[int, HabitStats]:
+  """
+  Read the stats of archived check-offs.
+
+  Args:
+    conn: Connection to read from
+    habit_ids: Only these habits (default: all habits)
+  Returns:
+    Dictionary mapping habit ID to the stats of its archived check-offs;
+    habits without any are left out
+  """
+  where, params = _habit_filter(habit_ids)
+  cursor = conn.execute(f"""
+    SELECT habit_id, current_run, longest_streak, last_check_date, total_count
+    FROM archived_history {where}
+  """, params)
+  return {
+    row[0]: HabitStats(row[1], row[2], datetime.fromisoformat(row[3]) if row[3] else None, row[4])
+    for row in cursor
+  }
+
+def load_archived_bitmaps(conn: sqlite3.Connection,
+                          habit_ids: Optional[Iterable[int]] = None) -> Dict[int, PeriodBitmap]:
+  """Read the period bitmaps of archived check-offs, like load_archived_stats."""
+  where, params = _habit_filter(habit_ids)
+  cursor = conn.execute(f"""
+    SELECT habit_id, bitmap_base, bitmap_bits FROM archived_history {where}
+  """, params)
+  return {row[0]: PeriodBitmap.from_blob(row[1], row[2]) for row in cursor if row[2]}
+
+def backfilled_habits(conn: sqlite3.Connection) -> List[int]:
+  """Return the habits with live check-offs not newer than their last archived one."""
+  return [row[0] for row in conn.execute("""
+    SELECT DISTINCT c.habit_id
+    FROM check_offs c JOIN archived_history a ON a.habit_id = c.habit_id
+    WHERE c.check_ts <= a.last_check_ts
+  """)]
+
+def save_summaries(conn: sqlite3.Connection, stats: Dict[int, HabitStats],
+                   bitmaps: Dict[int, PeriodBitmap]) -> None:
+  """
+  Insert or replace the archived_history rows of habits.
+
+  Args:
+    conn: Connection, expected to be inside a transaction
+    stats: Stats of all archived check-offs by habit ID
+    bitmaps: Bitmaps of all archived check-offs by habit ID
+  """
+  rows = []
+  for habit_id, summary in stats.items():
+    last_check_off = summary.last_check_off
+    bitmap = bitmaps.get(habit_id, PeriodBitmap())
+    rows.append((
+      habit_id, summary.current_run, summary.longest_streak,
+      last_check_off.isoformat() if last_check_off else None,
+      to_epoch_seconds(last_check_off) if last_check_off else None,
+      summary.total_count, bitmap.base, bitmap.to_blob()
+    ))
+  conn.executemany("""
+    INSERT OR REPLACE INTO archived_history (habit_id, current_run, longest_streak,
+      last_check_date, last_check_ts, total_count, bitmap_base, bitmap_bits)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+  """, rows)
+
+def remove_check_offs(conn: sqlite3.Connection, cutoff_day: int, last_id: int, path: str) -> int:
+  """
+  Delete archived check-offs and their rollups, recording the archive.
+
+  Buckets starting before the cutoff are dropped whole: a range starting
+  at or after the cutoff never reads them, see rollups.cover.
+
+  Args:
+    conn: Connection, expected to be inside a transaction
+    cutoff_day: First epoch day that stays live
+    last_id: Highest check-off row ID copied to the archive; rows added
+      since are kept
+    path: Archive file, recorded for the next run
+  Returns:
+    Number of check-offs deleted
+  """
+  removed = conn.execute("""
+    DELETE FROM check_offs WHERE check_day < ? AND id <= ?
+  """, (cutoff_day, last_id)).rowcount
+  conn.execute("DELETE FROM check_off_rollups WHERE bucket < ?", (cutoff_day,))
+  # Keep the latest cutoff, so a later run never reopens archived days
+  conn.execute("""
+    INSERT INTO archive_state (id, cutoff_day, path) VALUES (1, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET cutoff_day = MAX(cutoff_day, excluded.cutoff_day),
+      path = excluded.path
+  """, (cutoff_day, path))
+  return removed
@@ -0,0 +1,157 @@
+"""
+asyncio front end for HabitDatabase and HabitAnalytics.
+
+Every call runs the blocking SQLite work on a thread pool owned by the
+AsyncHabitDatabase, so the event loop is never blocked. File databases are
+opened in pooled mode, letting reads run concurrently on the pool's
+threads while writes are serialized on the writer connection. An
+in-memory database is bound to the thread that created it, so its calls
+run one at a time on a single worker.
+
+Large result sets are streamed as async iterators. Each stream is pinned
+to one of a few dedicated stream workers for its whole lifetime, because
+an SQLite cursor must be stepped on the connection that opened it, and
+rows are handed to the event loop in batches.
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial, wraps
+from itertools import count, islice
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Optional
+from .analytics import HabitAnalytics
+from .analytics_cache import AnalyticsCache
+from .db_manager import HabitDatabase
+from .habit import Habit
+from .habit_stats import HabitStats
+
+def _in_executor(method: Callable) -> Callable:
+  """Make an async version of a blocking method, run on the executor."""
+  name = method.__name__
+
+  @wraps(method)
+  async def wrapper(self, *args, **kwargs):
+    return await self._run(getattr(self._target, name), *args, **kwargs)
+  return wrapper
+
+class AsyncHabitDatabase:
+  def __init__(self, db_path: str = "habits.db", max_workers: int = 4,
+               stream_workers: int = 2, **options):
+    """
+    Open a database for use from asyncio code.
+
+    Opening runs the schema migrations and blocks briefly, so databases
+    are best opened once at startup and shared by all requests.
+
+    Args:
+      db_path: SQLite database file
+      max_workers: Threads running calls, and so the number of concurrent reads
+      stream_workers: Threads stepping the cursors of async iterators
+      options: Further HabitDatabase arguments, such as busy_timeout
+    """
+    if db_path == ':memory:':
+      # The single connection must stay on the thread that created it
+      self._executor = ThreadPoolExecutor(1, thread_name_prefix='habits-db')
+      self._stream_executors = [self._executor]
+      self.db = self._executor.submit(HabitDatabase, db_path, **options).result()
+    else:
+      self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='habits-db')
+      self._stream_executors = [
+        ThreadPoolExecutor(1, thread_name_prefix=f'habits-stream-{i}')
+        for i in range(stream_workers)
+      ]
+      self.db = HabitDatabase(db_path, pooled=True, **options)
+    self._target = self.db
+    self._streams = count()
+
+  async def _run(self, func: Callable, *args, executor: Executor = None, **kwargs) -> Any:
+    """Run a blocking call on the executor and wait for its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or self._executor, partial(func, *args, **kwargs))
+
+  async def _stream(self, func: Callable[..., Iterable], *args,
+                    batch_size: int = 1000) -> AsyncIterator:
+    """Yield the items of a blocking iterable, fetched in batches on one stream worker."""
+    executor = self._stream_executors[next(self._streams) % len(self._stream_executors)]
+    iterator: Iterator = await self._run(lambda: iter(func(*args)), executor=executor)
+    try:
+      while batch := await self._run(lambda: list(islice(iterator, batch_size)), executor=executor):
+        for item in batch:
+          yield item
+    finally:
+      close = getattr(iterator, 'close', None)
+      if close is not None:
+        await self._run(close, executor=executor)
+
+  save_habit = _in_executor(HabitDatabase.save_habit)
+  save_habits_bulk = _in_executor(HabitDatabase.save_habits_bulk)
+  load_habit = _in_executor(HabitDatabase.load_habit)
+  save_check_off = _in_executor(HabitDatabase.save_check_off)
+  save_check_offs_bulk = _in_executor(HabitDatabase.save_check_offs_bulk)
+  get_stats = _in_executor(HabitDatabase.get_stats)
+  get_all_stats = _in_executor(HabitDatabase.get_all_stats)
+  rebuild_stats = _in_executor(HabitDatabase.rebuild_stats)
+  import_rows = _in_executor(HabitDatabase.import_rows)
+  get_all_habits = _in_executor(HabitDatabase.get_all_habits)
+  delete_habit = _in_executor(HabitDatabase.delete_habit)
+  get_check_offs = _in_executor(HabitDatabase.get_check_offs)
+  get_check_offs_many = _in_executor(HabitDatabase.get_check_offs_many)
+  get_period_bitmaps = _in_executor(HabitDatabase.get_period_bitmaps)
+
+  def iter_habits(self, batch_size: int = 1000, **options) -> AsyncIterator[tuple[int, Habit]]:
+    """Stream habits in ID order, see HabitDatabase.iter_habits."""
+    return self._stream(partial(self.db.iter_habits, batch_size, **options), batch_size=batch_size)
+
+  def iter_stats(self, batch_size: int = 1000,
+                 **options) -> AsyncIterator[tuple[int, Habit, HabitStats]]:
+    """Stream habits with their stats in ID order, see HabitDatabase.iter_stats."""
+    return self._stream(partial(self.db.iter_stats, batch_size, **options), batch_size=batch_size)
+
+  def iter_export_rows(self, batch_size: int = 1000) -> AsyncIterator[tuple]:
+    """Stream every habit and check-off as export rows, see HabitDatabase.iter_export_rows."""
+    return self._stream(self.db.iter_export_rows, batch_size=batch_size)
+
+  def iter_check_off_seconds(self, batch_size: int = 1000) -> AsyncIterator[tuple[int, int]]:
+    """Stream (habit_id, epoch_seconds) tuples, see HabitDatabase.get_check_off_seconds."""
+    return self._stream(self.db.get_check_off_seconds, batch_size=batch_size)
+
+  async def close(self) -> None:
+    """Close the database and stop the worker threads."""
+    await self._run(self.db.close)
+    for executor in {self._executor, *self._stream_executors}:
+      executor.shutdown(wait=False)
+
+  async def __aenter__(self) -> "AsyncHabitDatabase":
+    return self
+
+  async def __aexit__(self, *exc_info) -> None:
+    await self.close()
+
+class AsyncHabitAnalytics:
+  def __init__(self, db: AsyncHabitDatabase, engine: str = 'python',
+               cache: Optional[AnalyticsCache] = None):
+    """
+    Initialize analytics over an async habit database.
+
+    Args:
+      db: The async habit database, whose workers run the computations
+      engine: Analytics engine, see HabitAnalytics
+      cache: Optional result cache, see HabitAnalytics
+    """
+    self.db = db
+    self._target = HabitAnalytics(db.db, engine, cache=cache)
+
+  @property
+  def engine(self) -> str:
+    return self._target.engine
+
+  async def _run(self, func: Callable, *args, **kwargs) -> Any:
+    return await self.db._run(func, *args, **kwargs)
+
+  get_habits_by_periodicity = _in_executor(HabitAnalytics.get_habits_by_periodicity)
+  get_longest_streak_habit = _in_executor(HabitAnalytics.get_longest_streak_habit)
+  get_habit_longest_streak = _in_executor(HabitAnalytics.get_habit_longest_streak)
+  get_completion_summary = _in_executor(HabitAnalytics.get_completion_summary)
+  get_current_streaks = _in_executor(HabitAnalytics.get_current_streaks)
+  get_period_streaks = _in_executor(HabitAnalytics.get_period_streaks)
+  get_perfect_days = _in_executor(HabitAnalytics.get_perfect_days)
+  get_correlations = _in_executor(HabitAnalytics.get_correlations)
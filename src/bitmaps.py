@@ -0,0 +1,244 @@
+"""
+Per-habit bitmaps of the periods in which a habit was completed.
+
+A habit's history is indexed by period: epoch days for daily habits, ISO
+weeks for weekly habits and calendar months for monthly ones. Bit i of a
+bitmap is set when the habit has at least one check-off in period
+base + i, where base is its first completed period. A decade of daily
+history therefore takes about 460 bytes however many check-offs it
+holds. Bitmaps are Python integers in memory and little-endian BLOBs in
+the habit_bitmaps table, kept up to date by the HabitDatabase write
+paths.
+
+Runs of consecutive periods come from bit operations instead of date
+arithmetic. The run ending in a period is a scan for the highest clear
+bit below it. The longest run is found by ANDing the bitmap with shifted
+copies of itself, doubling the shift until no run is that long. Sets of
+habits are combined with AND and OR.
+"""
+import json
+import sqlite3
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+from .dates import from_epoch_day, to_epoch_day
+from .rollups import week_start
+
+def period_of_day(day: int, periodicity: str) -> int:
+  """Return the period index of an epoch day for a periodicity."""
+  if periodicity == 'daily':
+    return day
+  if periodicity == 'weekly':
+    # Mondays are 7 days apart, so this numbers ISO weeks consecutively
+    return week_start(day) // 7
+  date = from_epoch_day(day)
+  return date.year * 12 + date.month - 1
+
+def period_start_day(period: int, periodicity: str) -> int:
+  """Return the epoch day on which a period starts."""
+  if periodicity == 'daily':
+    return period
+  if periodicity == 'weekly':
+    return week_start(period * 7 + 6)
+  return to_epoch_day(from_epoch_day(0).replace(year=period // 12, month=period % 12 + 1))
+
+def longest_run(bits: int) -> int:
+  """Return the length of the longest run of set bits."""
+  if not bits:
+    return 0
+  # starts[j] marks the positions where a run of at least 2**j bits starts
+  starts = [bits]
+  while True:
+    step = 1 << (len(starts) - 1)
+    longer = starts[-1] & (starts[-1] >> step)
+    if not longer:
+      break
+    starts.append(longer)
+
+  # Extend the longest power of two by smaller ones, largest first
+  length = 1 << (len(starts) - 1)
+  current = starts[-1]
+  for j in range(len(starts) - 2, -1, -1):
+    extended = current & (starts[j] >> length)
+    if extended:
+      current = extended
+      length += 1 << j
+  return length
+
+class PeriodBitmap(NamedTuple):
+  """Set of period indices, bit i standing for period base + i."""
+  base: int = 0
+  bits: int = 0
+
+  @classmethod
+  def from_periods(cls, periods: Iterable[int]) -> "PeriodBitmap":
+    """Build a bitmap from period indices in any order."""
+    periods = set(periods)
+    if not periods:
+      return cls()
+    base = min(periods)
+    buffer = bytearray((max(periods) - base) // 8 + 1)
+    for period in periods:
+      offset = period - base
+      buffer[offset >> 3] |= 1 << (offset & 7)
+    return cls(base, int.from_bytes(buffer, 'little'))
+
+  @classmethod
+  def from_blob(cls, base: int, blob: bytes) -> "PeriodBitmap":
+    return cls(base, int.from_bytes(blob, 'little'))
+
+  def to_blob(self) -> bytes:
+    return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little')
+
+  def add(self, period: int) -> "PeriodBitmap":
+    """Return the bitmap with a period added."""
+    if not self.bits:
+      return PeriodBitmap(period, 1)
+    if period < self.base:
+      return PeriodBitmap(period, (self.bits << (self.base - period)) | 1)
+    return PeriodBitmap(self.base, self.bits | (1 << (period - self.base)))
+
+  def union(self, other: "PeriodBitmap") -> "PeriodBitmap":
+    """Return the bitmap of the periods in either bitmap."""
+    if not other.bits:
+      return self
+    if not self.bits:
+      return other
+    base = min(self.base, other.base)
+    return PeriodBitmap(base, (self.bits << (self.base - base)) | (other.bits << (other.base - base)))
+
+  def window(self, start: int, end: int) -> int:
+    """Return the bits of periods start to end, both inclusive, with start at bit 0."""
+    if end < start:
+      return 0
+    shift = start - self.base
+    bits = self.bits >> shift if shift >= 0 else self.bits << -shift
+    return bits & ((1 << (end - start + 1)) - 1)
+
+  def run_ending(self, period: int) -> int:
+    """Return the number of consecutive periods set up to and including period."""
+    if period < self.base:
+      return 0
+    offset = period - self.base
+    # The highest clear bit at or below the period ends the run
+    clear = ~self.bits & ((1 << (offset + 1)) - 1)
+    return offset - clear.bit_length() + 1
+
+  def current_run(self, period: int) -> int:
+    """
+    Return the streak alive in a period: the run ending in it, or in the
+    previous period while the current one is not completed yet.
+    """
+    return self.run_ending(period) or self.run_ending(period - 1)
+
+  def longest_run(self) -> int:
+    return longest_run(self.bits)
+
+  def periods(self) -> Iterator[int]:
+    """Yield the periods in the bitmap in ascending order."""
+    bits = self.bits
+    while bits:
+      lowest = bits & -bits
+      yield self.base + lowest.bit_length() - 1
+      bits ^= lowest
+
+  def __contains__(self, period: int) -> bool:
+    return period >= self.base and bool(self.bits >> (period - self.base) & 1)
+
+  def __len__(self) -> int:
+    return bin(self.bits).count('1')
+
+def load_bitmaps(conn: sqlite3.Connection, habit_ids: Optional[Iterable[int]] = None,
+                 periodicity: Optional[str] = None) -> Dict[int, PeriodBitmap]:
+  """
+  Read stored bitmaps.
+
+  Args:
+    conn: Connection to read from
+    habit_ids: Only these habits (default: all habits)
+    periodicity: Only habits with this periodicity
+  Returns:
+    Dictionary mapping habit ID to its bitmap; habits without check-offs
+    are left out
+  """
+  where, params = [], []
+  if habit_ids is not None:
+    where.append("b.habit_id IN (SELECT value FROM json_each(?))")
+    params.append(json.dumps(list(habit_ids)))
+  if periodicity:
+    where.append("h.periodicity = ?")
+    params.append(periodicity.lower())
+  cursor = conn.execute(f"""
+    SELECT b.habit_id, b.base, b.bits
+    FROM habit_bitmaps b JOIN habits h ON h.id = b.habit_id
+    {"WHERE " + " AND ".join(where) if where else ""}
+  """, params)
+  return {row[0]: PeriodBitmap.from_blob(row[1], row[2]) for row in cursor}
+
+def _save(conn: sqlite3.Connection, bitmaps: Iterable[Tuple[int, PeriodBitmap]]) -> None:
+  conn.executemany(
+    "INSERT OR REPLACE INTO habit_bitmaps (habit_id, base, bits) VALUES (?, ?, ?)",
+    ((habit_id, bitmap.base, bitmap.to_blob()) for habit_id, bitmap in bitmaps if bitmap.bits)
+  )
+
+def add_check_offs(conn: sqlite3.Connection, check_offs: Iterable[Tuple[int, int]]) -> None:
+  """
+  Set the bits of inserted check-offs.
+
+  Args:
+    conn: Connection, expected to be inside a transaction
+    check_offs: (habit_id, check_day) pairs; check-offs of unknown habits
+      are skipped
+  """
+  days_by_habit: Dict[int, set] = {}
+  for habit_id, day in check_offs:
+    days_by_habit.setdefault(habit_id, set()).add(day)
+  if not days_by_habit:
+    return
+
+  rows = conn.execute("""
+    SELECT h.id, h.periodicity, b.base, b.bits
+    FROM habits h LEFT JOIN habit_bitmaps b ON b.habit_id = h.id
+    WHERE h.id IN (SELECT value FROM json_each(?))
+  """, (json.dumps(list(days_by_habit)),)).fetchall()
+  updated = []
+  for habit_id, periodicity, base, blob in rows:
+    bitmap = PeriodBitmap.from_blob(base, blob) if blob else PeriodBitmap()
+    for day in days_by_habit[habit_id]:
+      bitmap = bitmap.add(period_of_day(day, periodicity))
+    updated.append((habit_id, bitmap))
+  _save(conn, updated)
+
+def rebuild_bitmaps(conn: sqlite3.Connection, habit_ids: Optional[Iterable[int]] = None,
+                    archived: Optional[Dict[int, PeriodBitmap]] = None) -> None:
+  """
+  Recompute bitmaps from the check-off history.
+
+  Args:
+    conn: Connection, expected to be inside a transaction
+    habit_ids: Only rebuild these habits (default: all habits)
+    archived: Bitmaps of archived check-offs by habit ID, merged into the
+      rebuilt ones, see src.archive
+  """
+  if habit_ids is None:
+    conn.execute("DELETE FROM habit_bitmaps")
+    where, params = "", []
+  else:
+    where, params = "WHERE h.id IN (SELECT value FROM json_each(?))", [json.dumps(list(habit_ids))]
+    conn.execute("DELETE FROM habit_bitmaps WHERE habit_id IN (SELECT value FROM json_each(?))", params)
+
+  rows = conn.execute(f"""
+    SELECT DISTINCT h.id, h.periodicity, c.check_day
+    FROM habits h JOIN check_offs c ON c.habit_id = h.id
+    {where}
+    ORDER BY h.id
+  """, params)
+  rebuilt = (
+    (habit_id, PeriodBitmap.from_periods(period_of_day(row[2], periodicity) for row in group))
+    for (habit_id, periodicity), group in groupby(rows, key=lambda row: (row[0], row[1]))
+  )
+  if archived:
+    merged = dict(archived)
+    for habit_id, bitmap in rebuilt:
+      merged[habit_id] = bitmap.union(merged.get(habit_id, PeriodBitmap()))
+    rebuilt = merged.items()
+  _save(conn, rebuilt)
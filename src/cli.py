@@ -1,22 +1,143 @@
+import os
+import sys
 import click
 from datetime import datetime, timedelta
-from typing import Optional
-from .db_manager import HabitDatabase
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Sequence
+from .dates import from_epoch_day
 from .habit import Habit
-from .analytics import HabitAnalytics
+from .options import BACKENDS, CORRELATION_SORTS, ENGINES, FORMATS, MIN_RETENTION_DAYS
 
-db = HabitDatabase()
+if TYPE_CHECKING:
+  from .analytics import HabitAnalytics
+  from .analytics_cache import AnalyticsCache
+  from .profiling import Profiler
+  from .storage import HabitStore
+
+DEFAULT_DB_PATH = "habits.db"
+
+# Program name in usage messages, also of commands run by the serve daemon
+PROG_NAME = "python -m src.cli"
+
+# Output formats of the listing commands
+OUTPUT_FORMATS = ['table', 'ndjson']
+
+_db: Optional["HabitStore"] = None
+_db_key: Optional[tuple[str, str]] = None
+_db_path = DEFAULT_DB_PATH
+_backend = 'sqlite'
+_profiler: Optional["Profiler"] = None
+# Analytics cache of the serve daemon, shared by the commands it runs
+_analytics_cache: Optional["AnalyticsCache"] = None
+
+def get_db() -> "HabitStore":
+  """Return the store for the selected backend and path, connecting on first use."""
+  global _db, _db_key
+  if _db is None or _db_key != (_backend, _db_path):
+    from .storage import open_store
+    if _db is not None:
+      _db.close()
+    _db = open_store(_db_path, _backend)
+    _db_key = (_backend, _db_path)
+  if _profiler is not None and _db.profiler is not _profiler:
+    _db.enable_profiling(_profiler)
+  return _db
+
+def close_db() -> None:
+  """Close the database connection if one was opened."""
+  global _db, _db_key
+  if _db is not None:
+    _db.close()
+    _db = _db_key = None
+
+def _report_profile(profiler: "Profiler", show_table: bool, json_path: Optional[str]) -> None:
+  """Print or save the figures collected while running a command."""
+  if show_table:
+    click.echo(profiler.format_table(), err=True)
+  if json_path:
+    import json
+    output = json.dumps(profiler.to_dict(), indent=2)
+    if json_path == '-':
+      click.echo(output, err=True)
+    else:
+      with open(json_path, 'w') as f:
+        f.write(output + "\n")
+
+def _start_cprofile(path: str) -> Callable[[], None]:
+  """Start cProfile and return a function that stops it and writes the stats."""
+  import cProfile
+  profile = cProfile.Profile()
+  profile.enable()
+  def stop():
+    profile.disable()
+    profile.dump_stats(path)
+  return stop
+
+def _listing_options(command: Callable) -> Callable:
+  """Add the pagination and output format options shared by listing commands."""
+  command = click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS),
+                         default='table', show_default=True,
+                         help='ndjson prints one JSON object per line for piping')(command)
+  command = click.option('--after-id', type=int, default=None,
+                         help='Only show habits with a greater ID (next page)')(command)
+  command = click.option('--limit', type=click.IntRange(min=1), default=None,
+                         help='Maximum number of habits to show')(command)
+  return command
+
+def _echo_rows(rows: Iterable[tuple], output_format: str, header: Sequence[str],
+               format_row: Callable[..., str], to_record: Callable[..., dict],
+               empty_message: str = "No habits found") -> None:
+  """Print rows as they are produced, either as a table or as NDJSON."""
+  if output_format == 'ndjson':
+    import json
+    for row in rows:
+      click.echo(json.dumps(to_record(*row)))
+    return
+
+  empty = True
+  for row in rows:
+    if empty:
+      for line in header:
+        click.echo(line)
+      empty = False
+    click.echo(format_row(*row))
+  if empty:
+    click.echo(empty_message)
 
 @click.group()
-def cli():
+@click.option('--db', 'db_path', envvar='HABITS_DB', default=DEFAULT_DB_PATH, show_default=True,
+              help='SQLite database file (env: HABITS_DB)')
+@click.option('--backend', type=click.Choice(BACKENDS), envvar='HABITS_BACKEND', default='sqlite',
+              show_default=True,
+              help='Storage backend; memory keeps habits in this process only (env: HABITS_BACKEND)')
+@click.option('--profile', is_flag=True,
+              help='Print SQL statement and analytics section timings to stderr')
+@click.option('--profile-json', type=click.Path(dir_okay=False),
+              help='Write SQL statement and section timings as JSON ("-" for stderr)')
+@click.option('--cprofile', type=click.Path(dir_okay=False),
+              help='Write cProfile stats of the command to a file')
+@click.option('--no-daemon', is_flag=True, envvar='HABITS_NO_DAEMON',
+              help='Run the command here even if a serve daemon is running (env: HABITS_NO_DAEMON)')
+@click.pass_context
+def cli(ctx: click.Context, db_path: str, backend: str, profile: bool, profile_json: Optional[str],
+        cprofile: Optional[str], no_daemon: bool):
   """Habit Tracker - Track and manage your daily, weekly, and monthly habits."""
-pass
+  global _db_path, _backend, _profiler
+  _db_path = db_path
+  _backend = backend
+  _profiler = None
+  if profile or profile_json:
+    from .profiling import Profiler
+    _profiler = Profiler()
+    ctx.call_on_close(lambda: _report_profile(_profiler, profile, profile_json))
+  if cprofile:
+    ctx.call_on_close(_start_cprofile(cprofile))
 
 @cli.command()
 @click.argument('task_name')
 @click.option('--periodicity', '-p', type=click.Choice(['daily', 'weekly', 'monthly'], case_sensitive=False), required=True)
 def create(task_name: str, periodicity: str):
   """Create a new habit to track."""
+  db = get_db()
   try:
     habit = Habit(task_name, periodicity)
     habit_id = db.save_habit(habit)
@@ -30,60 +151,106 @@ def create(task_name: str, periodicity: str):
               help='Date of completion (default: now)')
 def check(habit_id: int, date: Optional[datetime]):
   """Mark a habit as completed for today or a specific date."""
-  habit = db.load_habit(habit_id)
+  db = get_db()
+  habit = db.load_habit(habit_id, load_history=False)
   if not habit:
     click.echo(f"Error: Habit with ID {habit_id} not found", err=True)
     return
 
   try:
     check_date = date or datetime.now()
-    habit.check_off(check_date)
     db.save_check_off(habit_id, check_date)
     click.echo(f"Checked off '{habit.task_name}' for {check_date.date()}")
   except Exception as e:
     click.echo(f"Error: {e}", err=True)
 
 @cli.command()
-def list():
-  """List all habits and their current streaks."""
-  habits = db.get_all_habits()
-  if not habits:
-    click.echo("No habits found")
+@click.argument('habit_ids', nargs=-1, type=int, required=True)
+@click.option('--date', '-d', 'dates', type=click.DateTime(), multiple=True,
+              help='Date of completion, can be repeated')
+@click.option('--from', 'start', type=click.DateTime(), default=None,
+              help='First day of a range of completions')
+@click.option('--to', 'end', type=click.DateTime(), default=None,
+              help='Last day of the range (default: today)')
+def check_many(habit_ids: tuple, dates: tuple, start: Optional[datetime], end: Optional[datetime]):
+  """Mark several habits as completed on several dates at once."""
+  db = get_db()
+  check_dates = [*dates]
+  if start:
+    end = end or datetime.now()
+    check_dates.extend(
+      start + timedelta(days=i) for i in range((end.date() - start.date()).days + 1)
+    )
+  elif end:
+    click.echo("Error: --to requires --from", err=True)
     return
+  if not check_dates:
+    check_dates.append(datetime.now())
 
-  click.echo("\nYour Habits:")
-  click.echo("-" * 60)
-  click.echo(f"{'ID':4} {'Task':20} {'Periodicity':12} {'Streak':8} {'Completion Rate':15}")
-  click.echo("-" * 60)
+  try:
+    added = db.save_check_offs_bulk(habit_ids, check_dates)
+  except ValueError as e:
+    click.echo(f"Error: {e}", err=True)
+    return
+  click.echo(
+    f"Checked off {len(set(habit_ids))} habits on {len(set(check_dates))} dates "
+    f"({added} new check-offs)"
+  )
 
-  for habit_id, habit in habits:
-    streak = habit.calculate_streak()
-    completion_rate = habit.get_completion_rate()
-    click.echo(
+@cli.command()
+@_listing_options
+def list(limit: Optional[int], after_id: Optional[int], output_format: str):
+  """List all habits and their current streaks."""
+  db = get_db()
+  now = datetime.now()
+  rows = (
+    (habit_id, habit, habit_stats.current_streak(habit.periodicity, now),
+     habit_stats.completion_rate(habit.periodicity, habit.creation_date))
+    for habit_id, habit, habit_stats in db.iter_stats(after_id=after_id, limit=limit)
+  )
+  _echo_rows(
+    rows, output_format,
+    header=[
+      "\nYour Habits:",
+      "-" * 60,
+      f"{'ID':4} {'Task':20} {'Periodicity':12} {'Streak':8} {'Completion Rate':15}",
+      "-" * 60,
+    ],
+    format_row=lambda habit_id, habit, streak, completion_rate: (
       f"{habit_id:<4} {habit.task_name[:20]:<20} {habit.periodicity:<12} "
       f"{streak:<8} {completion_rate:>6.1f}%"
-    )
+    ),
+    to_record=lambda habit_id, habit, streak, completion_rate: {
+      'id': habit_id, 'task_name': habit.task_name, 'periodicity': habit.periodicity,
+      'streak': streak, 'completion_rate': round(completion_rate, 1),
+    }
+  )
 
 @cli.command()
 @click.argument('habit_id', type=int)
 def stats(habit_id: int):
   """Show detailed statistics for a specific habit."""
-  habit = db.load_habit(habit_id)
+  from .habit_stats import HabitStats
+  db = get_db()
+  habit = db.load_habit(habit_id, load_history=False)
   if not habit:
     click.echo(f"Error: Habit with ID {habit_id} not found", err=True)
     return
 
+  # Streak and count come from the stats row, so the history is never loaded
+  stats = db.get_stats(habit_id) or HabitStats()
   click.echo(f"\nStatistics for: {habit.task_name}")
   click.echo("-" * 40)
   click.echo(f"Periodicity: {habit.periodicity}")
   click.echo(f"Created: {habit.creation_date.date()}")
-  click.echo(f"Current streak: {habit.calculate_streak()}")
-  click.echo(f"Completion rate: {habit.get_completion_rate():.1f}%")
-    
+  click.echo(f"Current streak: {stats.current_streak(habit.periodicity)}")
+  click.echo(f"Completion rate: {stats.completion_rate(habit.periodicity, habit.creation_date):.1f}%")
+
   # Show recent check-offs
-  if habit.check_off_dates:
+  recent = db.get_check_offs(habit_id, limit=5, descending=True)
+  if recent:
     click.echo("\nRecent completions:")
-    for date in sorted(habit.check_off_dates, reverse=True)[:5]:
+    for date in recent:
       click.echo(f"  ✓ {date.date()}")
 
 @cli.command()
@@ -91,7 +258,8 @@ def stats(habit_id: int):
 @click.option('--force', '-f', is_flag=True, help='Skip confirmation')
 def delete(habit_id: int, force: bool):
   """Delete a habit and its history."""
-  habit = db.load_habit(habit_id)
+  db = get_db()
+  habit = db.load_habit(habit_id, load_history=False)
   if not habit:
     click.echo(f"Error: Habit with ID {habit_id} not found", err=True)
     return
@@ -104,57 +272,249 @@ def delete(habit_id: int, force: bool):
   db.delete_habit(habit_id)
   click.echo(f"Deleted habit: {habit.task_name}")
 
+@cli.command(name='import')
+@click.argument('source', type=click.File('r'))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Input format (default: from the file extension, else csv)')
+@click.option('--batch-size', type=int, default=10_000, show_default=True,
+              help='Rows written per transaction')
+def import_(source, file_format: Optional[str], batch_size: int):
+  """Import habits and check-offs from a CSV or NDJSON file ('-' for stdin)."""
+  from .transfer import detect_format, read_rows
+  db = get_db()
+  file_format = file_format or detect_format(source.name)
+  try:
+    habits_added, check_offs_added = db.import_rows(read_rows(source, file_format), batch_size)
+  except (KeyError, ValueError) as e:
+    click.echo(f"Error: invalid input: {e}", err=True)
+    return
+  click.echo(f"Imported {habits_added} habits and {check_offs_added} check-offs")
+
+@cli.command()
+@click.argument('destination', type=click.File('w'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Output format (default: from the file extension, else csv)')
+def export(destination, file_format: Optional[str]):
+  """Export all habits and check-offs as CSV or NDJSON (default: stdout)."""
+  from .transfer import detect_format, write_rows
+  db = get_db()
+  file_format = file_format or detect_format(destination.name)
+  count = write_rows(destination, file_format, db.iter_export_rows())
+  if destination.name != '<stdout>':
+    click.echo(f"Exported {count} rows to {destination.name}")
+
+@cli.command()
+def rebuild_stats():
+  """Recompute streak statistics from the full check-off history."""
+  db = get_db()
+  db.rebuild_stats()
+  click.echo("Rebuilt habit statistics")
+
+@cli.command()
+@click.option('--older-than', 'days', type=click.IntRange(min=MIN_RETENTION_DAYS), default=365,
+              show_default=True, help='Archive check-offs older than this many days')
+@click.option('--to', 'archive_path', type=click.Path(dir_okay=False),
+              help='Archive database (default: the last one used, else habits.archive.db '
+                   'next to the database)')
+@click.option('--no-compact', is_flag=True, help='Keep the freed space in the database file')
+def archive(days: int, archive_path: Optional[str], no_compact: bool):
+  """Move old check-offs to an archive database, keeping streaks and totals."""
+  from .db_manager import HabitDatabase
+  db = get_db()
+  if not isinstance(db, HabitDatabase):
+    raise click.UsageError("Archiving needs the sqlite backend")
+
+  today = datetime.combine(datetime.now().date(), datetime.min.time())
+  before = today - timedelta(days=days)
+  try:
+    check_offs, habits = db.archive(before, archive_path)
+  except ValueError as e:
+    raise click.UsageError(str(e))
+  click.echo(f"Archived {check_offs} check-offs of {habits} habits before {before.date()} "
+             f"to {db.get_archive_state().path}")
+  if no_compact or _db_path == ':memory:':
+    return
+  size = os.path.getsize(_db_path)
+  db.compact()
+  click.echo(f"Compacted {_db_path}: {size / 1e6:.1f} MB -> {os.path.getsize(_db_path) / 1e6:.1f} MB")
+
 @cli.group()
-def analytics():
+@click.option('--engine', type=click.Choice(ENGINES), default='python', show_default=True,
+              help='Computation engine (numpy falls back to python if not installed)')
+@click.option('--workers', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Processes computing streaks in parallel (numpy and sql engines)')
+@click.option('--cache', 'cache_path', envvar='HABITS_ANALYTICS_CACHE', type=click.Path(dir_okay=False),
+              help='Reuse results from this cache file until the data or the date changes '
+                   '(env: HABITS_ANALYTICS_CACHE)')
+@click.option('--cache-stats', is_flag=True, help='Print cache hits and misses to stderr')
+@click.pass_context
+def analytics(ctx: click.Context, engine: str, workers: int, cache_path: Optional[str],
+              cache_stats: bool):
   """Analytics and statistics commands."""
-  pass
+  from .analytics import HabitAnalytics
+  from .analytics_cache import AnalyticsCache
+  cache = AnalyticsCache(path=cache_path) if cache_path else _analytics_cache
+  try:
+    ctx.obj = HabitAnalytics(get_db(), engine=engine, workers=workers, cache=cache)
+  except ValueError as e:
+    raise click.UsageError(str(e))
+  if cache is not None and cache_stats:
+    ctx.call_on_close(lambda: click.echo(
+      f"Cache: {cache.hits} hits, {cache.misses} misses", err=True
+    ))
 
 @analytics.command()
 @click.option('--periodicity', '-p', type=click.Choice(['daily', 'weekly', 'monthly'], case_sensitive=False))
-def habits(periodicity: Optional[str]):
+@_listing_options
+@click.pass_obj
+def habits(analytics: "HabitAnalytics", periodicity: Optional[str], limit: Optional[int],
+           after_id: Optional[int], output_format: str):
   """List habits filtered by periodicity."""
-  analytics = HabitAnalytics(db)
-  habits = analytics.get_habits_by_periodicity(periodicity)
-  
-  if not habits:
-    click.echo("No habits found")
-    return
-      
-  click.echo(f"\nHabits{f' ({periodicity})' if periodicity else ''}:")
-  click.echo("-" * 40)
-  for habit_id, habit in habits:
-    click.echo(f"{habit_id}: {habit.task_name}")
+  _echo_rows(
+    analytics.iter_habits_by_periodicity(periodicity, after_id=after_id, limit=limit),
+    output_format,
+    header=[f"\nHabits{f' ({periodicity})' if periodicity else ''}:", "-" * 40],
+    format_row=lambda habit_id, habit: f"{habit_id}: {habit.task_name}",
+    to_record=lambda habit_id, habit: {
+      'id': habit_id, 'task_name': habit.task_name, 'periodicity': habit.periodicity,
+      'creation_date': habit.creation_date.isoformat(),
+    }
+  )
 
 @analytics.command()
-def streaks():
+@click.option('--sort', type=click.Choice(['streak', 'id']), default='streak', show_default=True,
+              help='Order by current streak, or by ID to stream the output')
+@_listing_options
+@click.pass_obj
+def streaks(analytics: "HabitAnalytics", sort: str, limit: Optional[int],
+            after_id: Optional[int], output_format: str):
   """Show all habits sorted by current streak."""
-  analytics = HabitAnalytics(db)
-  streaks = analytics.get_current_streaks()
-  
-  if not streaks:
-    click.echo("No habits found")
-    return
-      
-  click.echo("\nCurrent Streaks:")
-  click.echo("-" * 50)
-  for habit_id, habit, streak in streaks:
-    click.echo(f"{habit_id}: {habit.task_name:20} {streak:3} days")
+  if sort == 'id':
+    rows = analytics.iter_current_streaks(after_id=after_id, limit=limit)
+  else:
+    import heapq
+    rows = analytics.iter_current_streaks(after_id=after_id)
+    if limit is None:
+      rows = sorted(rows, key=lambda x: x[2], reverse=True)
+    else:
+      # Keeps only the top rows in memory, in the same order as sorted()
+      rows = heapq.nlargest(limit, rows, key=lambda x: x[2])
+
+  _echo_rows(
+    rows, output_format,
+    header=["\nCurrent Streaks:", "-" * 50],
+    format_row=lambda habit_id, habit, streak: f"{habit_id}: {habit.task_name:20} {streak:3} days",
+    to_record=lambda habit_id, habit, streak: {
+      'id': habit_id, 'task_name': habit.task_name, 'periodicity': habit.periodicity,
+      'streak': streak,
+    }
+  )
+
+def _parse_window(ctx: click.Context, param: click.Parameter,
+                  value: Optional[str]) -> Optional[timedelta]:
+  """Parse a window such as 90d, 12w or 6m (30-day months) into a timedelta."""
+  if value is None:
+    return None
+  units = {'d': 1, 'w': 7, 'm': 30}
+  number, unit = value[:-1], value[-1:].lower()
+  if unit not in units or not number.isdigit() or int(number) < 1:
+    raise click.BadParameter("expected a number of days, weeks or months such as 90d, 12w or 6m")
+  return timedelta(days=int(number) * units[unit])
 
 @analytics.command()
-def summary():
+@click.option('--window', callback=_parse_window,
+              help='Measure the last N days, weeks or months instead, e.g. 90d, 12w, 6m')
+@click.pass_obj
+def summary(analytics: "HabitAnalytics", window: Optional[timedelta]):
   """Show completion rate summary by periodicity."""
-  analytics = HabitAnalytics(db)
-  summary = analytics.get_completion_summary()
+  try:
+    summary = analytics.get_completion_summary(window)
+  except ValueError as e:
+    raise click.ClickException(str(e))
   
-  click.echo("\nCompletion Rates:")
+  if window is not None:
+    click.echo(f"\nCompletion Rates (last {window.days} days):")
+  else:
+    click.echo("\nCompletion Rates:")
   click.echo("-" * 40)
   for periodicity, rate in summary.items():
     click.echo(f"{periodicity.capitalize():8}: {rate:5.1f}%")
 
 @analytics.command()
-def longest_streak():
+@click.option('--days', type=click.IntRange(min=1), default=30, show_default=True,
+              help='Number of days, ending today, to search')
+@click.option('--habit', 'habit_ids', type=int, multiple=True,
+              help='Only consider this daily habit (repeatable, default: all daily habits)')
+@click.pass_obj
+def perfect_days(analytics: "HabitAnalytics", days: int, habit_ids: tuple):
+  """Show the days on which every daily habit was checked off."""
+  try:
+    perfect = analytics.get_perfect_days(days, habit_ids or None)
+  except ValueError as e:
+    click.echo(f"Error: {e}", err=True)
+    return
+
+  today = perfect.base + days - 1
+  click.echo(f"\nPerfect Days (last {days} days):")
+  click.echo("-" * 40)
+  for day in perfect.periods():
+    click.echo(from_epoch_day(day).strftime('%Y-%m-%d'))
+  click.echo(f"Total: {len(perfect)} of {days} days")
+  click.echo(f"Current run: {perfect.current_run(today)} days")
+  click.echo(f"Longest run: {perfect.longest_run()} days")
+
+@analytics.command()
+@click.option('--periodicity', '-p', type=click.Choice(['daily', 'weekly', 'monthly'], case_sensitive=False),
+              default='daily', show_default=True, help='Habits to pair')
+@click.option('--periods', type=click.IntRange(min=2), default=90, show_default=True,
+              help='Number of days, weeks or months, ending with the current one')
+@click.option('--lag', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Periods from the first habit of a pair to the second, e.g. 1 for the next day')
+@click.option('--sort', type=click.Choice(CORRELATION_SORTS), default='lift', show_default=True,
+              help='Rank pairs by lift, correlation or share of periods done together')
+@click.option('--top', type=click.IntRange(min=1), default=20, show_default=True,
+              help='Number of pairs to show')
+@click.option('--min-count', type=click.IntRange(min=1), default=3, show_default=True,
+              help='Ignore pairs done together in fewer periods')
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS),
+              default='table', show_default=True,
+              help='ndjson prints one JSON object per line for piping')
+@click.pass_obj
+def correlations(analytics: "HabitAnalytics", periodicity: str, periods: int, lag: int,
+                 sort: str, top: int, min_count: int, output_format: str):
+  """Show the pairs of habits most often done together."""
+  periodicity = periodicity.lower()
+  try:
+    pairs = analytics.get_correlations(periods, lag, top, sort, periodicity, min_count)
+  except ValueError as e:
+    click.echo(f"Error: {e}", err=True)
+    return
+  names = {habit_id: habit.task_name
+           for habit_id, habit in analytics.get_habits_by_periodicity(periodicity)}
+
+  def metric(value: Optional[float]) -> str:
+    return f"{value:7.2f}" if value is not None else "      -"
+
+  arrow = "->" if lag else "&"
+  _echo_rows(
+    pairs, output_format,
+    header=[f"\nHabit Pairs (last {periods} periods{f', lag {lag}' if lag else ''}):",
+            f"{'Pair':45} {'Count':>5} {'Both':>7} {'Lift':>7} {'Corr':>7}", "-" * 75],
+    format_row=lambda first, second, count, both, lift, correlation: (
+      f"{f'{names[first]} {arrow} {names[second]}':45.45} {count:5} "
+      f"{metric(both)} {metric(lift)} {metric(correlation)}"
+    ),
+    to_record=lambda first, second, count, both, lift, correlation: {
+      'first_id': first, 'first': names[first], 'second_id': second, 'second': names[second],
+      'lag': lag, 'count': count, 'both': both, 'lift': lift, 'correlation': correlation,
+    },
+    empty_message="No habit pairs found"
+  )
+
+@analytics.command()
+@click.pass_obj
+def longest_streak(analytics: "HabitAnalytics"):
   """Show the habit with the longest streak ever."""
-  analytics = HabitAnalytics(db)
   habit_id, habit, streak = analytics.get_longest_streak_habit()
   
   if not habit:
@@ -170,6 +530,7 @@ def longest_streak():
 @click.option('--force', '-f', is_flag=True, help='Skip confirmation if database exists')
 def load_examples(force: bool):
   """Load example habits with 4 weeks of history."""
+  db = get_db()
   if not force and db.get_all_habits():
     if not click.confirm("This will clear existing habits. Continue?"):
       click.echo("Operation cancelled")
@@ -183,24 +544,104 @@ def load_examples(force: bool):
         
     # Create example data
     from .example_data import create_example_data
+    from .habit_stats import HabitStats
     habits = create_example_data(db)
     
     click.echo("\nCreated example habits:")
     click.echo("-" * 50)
     for habit_id, habit in habits:
+      stats = db.get_stats(habit_id) or HabitStats()
       click.echo(f"ID {habit_id}: {habit.task_name} ({habit.periodicity})")
-      click.echo(f"  Current streak: {habit.calculate_streak()}")
-      click.echo(f"  Completion rate: {habit.get_completion_rate():.1f}%")
+      click.echo(f"  Current streak: {stats.current_streak(habit.periodicity)}")
+      click.echo(f"  Completion rate: {stats.completion_rate(habit.periodicity, habit.creation_date):.1f}%")
       click.echo()
           
   except Exception as e:
     click.echo(f"Error creating example data: {e}", err=True)
 
-def main():
+@cli.command()
+@click.option('--habits', 'num_habits', type=int, default=100, show_default=True,
+              help='Number of habits to generate')
+@click.option('--days', type=int, default=365, show_default=True, help='Days of history per habit')
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed')
+@click.option('--completion', type=(float, float), default=(0.5, 0.95), show_default=True,
+              help='Range of per-habit completion probabilities')
+@click.option('--gap-probability', type=float, default=0.02, show_default=True,
+              help='Chance per period of starting a multi-period break')
+@click.option('--batch-size', type=int, default=50_000, show_default=True,
+              help='Rows written per transaction')
+def generate(num_habits: int, days: int, seed: int, completion: tuple,
+             gap_probability: float, batch_size: int):
+  """Add synthetic habits with random history, for load testing."""
+  from .data_generator import create_generated_data
+  db = get_db()
+  habits_added, check_offs_added = create_generated_data(
+    db, num_habits, days, batch_size=batch_size, seed=seed,
+    completion_range=completion, gap_probability=gap_probability
+  )
+  click.echo(f"Generated {habits_added} habits and {check_offs_added} check-offs")
+
+@cli.command()
+@click.option('--socket', 'socket_path', envvar='HABITS_SOCKET', type=click.Path(dir_okay=False),
+              help='Unix socket to listen on (default: the database path plus .sock, env: HABITS_SOCKET)')
+@click.option('--cache', 'use_cache', is_flag=True,
+              help='Keep analytics results in memory until the data or the date changes, '
+                   'like analytics --cache')
+def serve(socket_path: Optional[str], use_cache: bool):
+  """Keep the database open and run forwarded commands until interrupted."""
+  import signal
+  from . import daemon
+  from .analytics_cache import AnalyticsCache
+  global _analytics_cache
+  if not daemon.available():
+    raise click.UsageError("The daemon needs Unix sockets, which this platform lacks")
+  if _backend != 'sqlite' or _db_path == ':memory:':
+    raise click.UsageError("The daemon serves an SQLite database file")
+
+  get_db()
+  # Opt-in like analytics --cache, as cached streaks may lag within a day
+  _analytics_cache = AnalyticsCache() if use_cache else None
+  socket_path = socket_path or daemon.socket_path_for(_db_path)
+  try:
+    server = daemon.CommandServer(socket_path, _run_forwarded)
+  except RuntimeError as e:
+    raise click.ClickException(str(e))
+  # Stop cleanly, removing the socket, when terminated
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  click.echo(f"Serving {_db_path} on {socket_path}", err=True)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    _analytics_cache = None
+
+def _run_forwarded(args: List[str]) -> int:
+  """Run a command forwarded to the serve daemon against its database, returning the exit code."""
+  try:
+    cli.main(['--db', _db_path, '--backend', _backend, *args], prog_name=PROG_NAME)
+  except SystemExit as e:
+    if e.code is None or isinstance(e.code, int):
+      return e.code or 0
+    click.echo(e.code, err=True)
+    return 1
+  return 0
+
+def run() -> None:
+  """Run the command line in this process."""
   try:
     cli()
   finally:
-    db.close()
+    close_db()
+
+def main():
+  """Run the command line, on the serve daemon of the database if one answers."""
+  from . import daemon
+  exit_code = daemon.forward_command_line(sys.argv[1:])
+  if exit_code is not None:
+    sys.exit(exit_code)
+  run()
 
 if __name__ == '__main__':
   main() 
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Co-occurrence analytics across habits, computed in bulk.
+
+The check-offs of the selected habits in a window of periods are laid out
+as a habits x periods 0/1 matrix X, from the period bitmaps (see
+src.bitmaps). Next to it, a matrix V marks the periods in which each habit
+already existed. For a lag k, period t of the first habit of a pair is
+matched with period t + k of the second, and each pairwise count is one
+matrix product over the shifted matrices:
+
+- X_a @ X_b.T: periods in which both were done
+- V_a @ V_b.T: periods in which both existed
+- X_a @ V_b.T and V_a @ X_b.T: periods in which each was done while both
+  existed
+
+These give, for every pair, the share of shared periods in which both
+were done, the lift and the Pearson (phi) correlation. Lift is how much
+more often the two were done together than if they were independent.
+With a lag of one, a positive correlation reads as "doing the first
+habit predicts doing the second one the next period".
+
+Rows are multiplied in blocks so memory stays bounded for thousands of
+habits, and only the top pairs of each block are kept. Without NumPy the
+same counts are taken pair by pair from the bitmaps, which is only
+practical for a few hundred habits.
+"""
+import math
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Sequence
+from .options import CORRELATION_SORTS
+
+if TYPE_CHECKING:
+  import numpy as np
+
+# Matrix cells computed at once per count, bounding the memory of a block
+_BLOCK_CELLS = 1 << 20
+
+class Correlation(NamedTuple):
+  """How two habits were done together, the second lagged by some periods."""
+  first_id: int
+  second_id: int
+  # Periods in which both were done
+  count: int
+  # Share of the periods in which both existed
+  both: Optional[float]
+  lift: Optional[float]
+  correlation: Optional[float]
+
+def top_correlations(habit_ids: Sequence[int], done: Sequence[int], existed: Sequence[int],
+                     periods: int, lag: int = 0, top: Optional[int] = 20, sort: str = 'lift',
+                     min_count: int = 1) -> List[Correlation]:
+  """
+  Rank habit pairs by how they were done together.
+
+  Args:
+    habit_ids: Habits to pair
+    done: Per habit, the bits of the periods it was done in, bit 0 being
+      the first period of the window
+    existed: Per habit, the bits of the periods it existed in
+    periods: Length of the window
+    lag: Periods between the first and second habit of a pair; with a lag
+      of 0 each unordered pair is reported once
+    top: Number of pairs to return (default: all)
+    sort: One of CORRELATION_SORTS, ranking pairs from highest to lowest;
+      pairs for which it is undefined are left out
+    min_count: Leave out pairs done together in fewer periods
+  Returns:
+    Correlations ordered by the sort key, then by habit IDs
+  Raises:
+    ValueError: For an invalid sort, lag, top or window
+  """
+  if sort not in CORRELATION_SORTS:
+    raise ValueError(f"Sort must be one of: {CORRELATION_SORTS}")
+  if lag < 0:
+    raise ValueError("Lag must not be negative")
+  if periods - lag < 2:
+    raise ValueError("The window must be at least two periods longer than the lag")
+  if top is not None and top < 1:
+    raise ValueError("Top must be at least 1")
+
+  # Imported here so NumPy is only loaded when pairs are computed
+  from . import vectorized
+  if vectorized.available():
+    found = _numpy_correlations(habit_ids, done, existed, periods, lag, top, sort, min_count)
+  else:
+    found = _python_correlations(habit_ids, done, existed, periods, lag, sort, min_count)
+  found.sort(key=lambda c: (-getattr(c, sort), c.first_id, c.second_id))
+  return found if top is None else found[:top]
+
+def _scores(count: int, shared: int, first: int, second: int) -> tuple:
+  """Return (both, lift, correlation) from the counts of one pair, None where undefined."""
+  if not shared:
+    return None, None, None
+  both = count / shared
+  lift = count * shared / (first * second) if first and second else None
+  p, q = first / shared, second / shared
+  variance = p * (1 - p) * q * (1 - q)
+  correlation = (both - p * q) / math.sqrt(variance) if variance > 0 else None
+  return both, lift, correlation
+
+def _python_correlations(habit_ids: Sequence[int], done: Sequence[int], existed: Sequence[int],
+                         periods: int, lag: int, sort: str, min_count: int) -> List[Correlation]:
+  """Count every pair with big-integer AND and popcount."""
+  span = (1 << (periods - lag)) - 1
+  heads = [(d & span, e & span) for d, e in zip(done, existed)]
+  tails = [((d >> lag) & span, (e >> lag) & span) for d, e in zip(done, existed)]
+  found = []
+  for i, (head_done, head_existed) in enumerate(heads):
+    for j in range(i + 1 if lag == 0 else 0, len(tails)):
+      if i == j:
+        continue
+      tail_done, tail_existed = tails[j]
+      count = (head_done & tail_done).bit_count()
+      if count < min_count:
+        continue
+      scores = _scores(
+        count, (head_existed & tail_existed).bit_count(),
+        (head_done & tail_existed).bit_count(), (head_existed & tail_done).bit_count()
+      )
+      correlation = Correlation(habit_ids[i], habit_ids[j], count, *scores)
+      if getattr(correlation, sort) is not None:
+        found.append(correlation)
+  return found
+
+def _to_matrix(values: Sequence[int], periods: int) -> "np.ndarray":
+  """Unpack per-habit bit integers into a habits x periods float32 0/1 matrix."""
+  import numpy as np
+  width = (periods + 7) // 8
+  buffer = b"".join(value.to_bytes(width, 'little') for value in values)
+  packed = np.frombuffer(buffer, dtype=np.uint8).reshape(len(values), width)
+  # Counts stay exact in float32 up to 2**24 periods, and BLAS multiplies floats
+  return np.unpackbits(packed, axis=1, bitorder='little')[:, :periods].astype(np.float32)
+
+def _numpy_correlations(habit_ids: Sequence[int], done: Sequence[int], existed: Sequence[int],
+                        periods: int, lag: int, top: Optional[int], sort: str,
+                        min_count: int) -> List[Correlation]:
+  """Count pairs with blocked matrix products, keeping each block's top pairs."""
+  import numpy as np
+  n = len(habit_ids)
+  if n < 2:
+    return []
+  x, v = _to_matrix(done, periods), _to_matrix(existed, periods)
+  span = periods - lag
+  x_head, v_head = x[:, :span], v[:, :span]
+  x_tail, v_tail = np.ascontiguousarray(x[:, lag:].T), np.ascontiguousarray(v[:, lag:].T)
+  columns = np.arange(n)
+
+  found = []
+  block = max(1, _BLOCK_CELLS // n)
+  for start in range(0, n, block):
+    stop = min(start + block, n)
+    # Exact counts from float32 products, ratios in float64
+    count = (x_head[start:stop] @ x_tail).astype(np.float64)
+    shared = (v_head[start:stop] @ v_tail).astype(np.float64)
+    first = (x_head[start:stop] @ v_tail).astype(np.float64)
+    second = (v_head[start:stop] @ x_tail).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      both = count / shared
+      lift = count * shared / (first * second)
+      p, q = first / shared, second / shared
+      correlation = (both - p * q) / np.sqrt(p * (1 - p) * q * (1 - q))
+    score = {'lift': lift, 'correlation': correlation, 'both': both}[sort]
+
+    rows = columns[start:stop, None]
+    keep = (columns > rows) if lag == 0 else (columns != rows)
+    keep &= (count >= min_count) & np.isfinite(score)
+    i, j = np.nonzero(keep)
+    if top is not None and len(i) > top:
+      # Only this block's top pairs can make the overall top; ties with the
+      # last of them are kept so the ID order decides between them
+      scores = score[i, j]
+      best = scores >= -np.partition(-scores, top - 1)[top - 1]
+      i, j = i[best], j[best]
+
+    for a, b in zip(i.tolist(), j.tolist()):
+      found.append(Correlation(
+        habit_ids[start + a], habit_ids[b], int(count[a, b]),
+        *(float(m[a, b]) if np.isfinite(m[a, b]) else None for m in (both, lift, correlation))
+      ))
+  return found
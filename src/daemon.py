@@ -0,0 +1,242 @@
+"""
+Local daemon running CLI commands in a long-lived process.
+
+`serve` opens the database once and listens on a Unix socket, by default
+next to the database file (habits.db.sock). Before running one of the
+FORWARDED_COMMANDS, the CLI checks for a daemon on the socket of its
+database and, if one answers, hands it the arguments instead of running
+the command itself. Run as `python -m src`, this check happens before
+click and the storage and analytics modules are imported (see
+src.__main__), so a forwarded call costs little more than starting the
+interpreter. The daemon runs the same click commands, so output and exit
+codes are unchanged. With serve --cache, analytics results are also kept
+in memory until the data or the date changes.
+
+Requests are served one at a time on the daemon's single connection, in
+the order they arrive. Other commands (import, export, delete, ...) run
+locally as before; every result the daemon caches is keyed by the
+database's data version, so their writes are picked up.
+
+The protocol is one JSON object per line in each direction:
+
+  request:  {"args": [...], "cwd": "/path", "env": {"HABITS_...": "..."}}
+  response: {"exit_code": 0, "stdout": "...", "stderr": "..."}
+
+The socket is only accessible to the user running the daemon.
+"""
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Commands the CLI forwards to a running daemon
+FORWARDED_COMMANDS = {'create', 'check', 'check-many', 'list', 'stats', 'analytics'}
+
+# Same as in src.cli, which is too heavy to import here
+DEFAULT_DB_PATH = "habits.db"
+
+# Environment variables forwarded with a request; the database and the
+# backend are the daemon's own
+FORWARDED_ENV_PREFIX = 'HABITS_'
+PINNED_ENV = {'HABITS_DB', 'HABITS_BACKEND', 'HABITS_SOCKET', 'HABITS_NO_DAEMON'}
+
+# Seconds to wait for a daemon to accept a connection
+CONNECT_TIMEOUT = 0.5
+
+# Longest path most platforms accept for a Unix socket
+_MAX_SOCKET_PATH = 100
+
+def available() -> bool:
+  """Return True if the platform supports Unix sockets."""
+  return hasattr(socket, 'AF_UNIX')
+
+def socket_path_for(db_path: str) -> str:
+  """Return the default socket of the daemon serving a database file."""
+  path = os.path.abspath(db_path) + '.sock'
+  if len(path) <= _MAX_SOCKET_PATH:
+    return path
+  import hashlib
+  import tempfile
+  digest = hashlib.sha1(path.encode()).hexdigest()[:16]
+  return os.path.join(tempfile.gettempdir(), f"habits-{digest}.sock")
+
+def _connect(socket_path: str) -> Optional[socket.socket]:
+  """Connect to a daemon, or return None if none is listening."""
+  if not available() or not os.path.exists(socket_path):
+    return None
+  client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  client.settimeout(CONNECT_TIMEOUT)
+  try:
+    client.connect(socket_path)
+  except (ConnectionRefusedError, FileNotFoundError, socket.timeout):
+    # A stale socket left by a daemon that did not shut down cleanly
+    client.close()
+    return None
+  # Commands may take a while, only connecting is bounded
+  client.settimeout(None)
+  return client
+
+def forward(socket_path: str, args: List[str]) -> Optional[Dict]:
+  """
+  Run a command on the daemon listening on a socket.
+
+  Args:
+    socket_path: Socket of the daemon
+    args: Command line arguments, without the global options
+  Returns:
+    The response with exit_code, stdout and stderr, or None if no daemon
+    is listening
+  Raises:
+    RuntimeError: If the daemon accepted the request but sent no valid
+      response; the command may have run, so it must not be retried
+  """
+  client = _connect(socket_path)
+  if client is None:
+    return None
+  with client:
+    request = {
+      'args': list(args),
+      'cwd': os.getcwd(),
+      'env': {key: value for key, value in os.environ.items() if _forwarded_env(key)},
+    }
+    try:
+      client.sendall(json.dumps(request).encode() + b'\n')
+      with client.makefile('rb') as reader:
+        line = reader.readline()
+      response = json.loads(line)
+    except (OSError, ValueError):
+      response = None
+  if not isinstance(response, dict) or not {'exit_code', 'stdout', 'stderr'} <= response.keys():
+    raise RuntimeError(
+      f"The daemon on {socket_path} did not answer; the command may have run there"
+    )
+  return response
+
+def forward_command_line(args: List[str]) -> Optional[int]:
+  """
+  Run a command line on the daemon of its database, if one is running.
+
+  Only the global options below are understood without click; anything
+  else, such as profiling options or --no-daemon, runs the command locally.
+
+  Args:
+    args: Command line arguments, as in sys.argv[1:]
+  Returns:
+    The exit code, after printing the command's output, or None if the
+    command has to run in this process. A command the daemon accepted
+    never runs again here: if it gets no answer, the error is printed
+    and the exit code is 1.
+  """
+  if _is_set(os.environ.get('HABITS_NO_DAEMON')):
+    return None
+  options = {'--db': os.environ.get('HABITS_DB') or DEFAULT_DB_PATH,
+             '--backend': os.environ.get('HABITS_BACKEND') or 'sqlite'}
+  index = 0
+  while index < len(args) and args[index].startswith('-'):
+    option, equals, value = args[index].partition('=')
+    if option not in options:
+      return None
+    if not equals:
+      index += 1
+      if index == len(args):
+        return None
+      value = args[index]
+    options[option] = value
+    index += 1
+
+  command = args[index:]
+  if not command or command[0] not in FORWARDED_COMMANDS or '--help' in command:
+    return None
+  if options['--backend'] != 'sqlite' or options['--db'] == ':memory:':
+    return None
+  socket_path = os.environ.get('HABITS_SOCKET') or socket_path_for(options['--db'])
+  try:
+    response = forward(socket_path, command)
+  except RuntimeError as e:
+    sys.stderr.write(f"Error: {e}\n")
+    return 1
+  if response is None:
+    return None
+  sys.stdout.write(response['stdout'])
+  sys.stderr.write(response['stderr'])
+  return response['exit_code']
+
+def _is_set(value: Optional[str]) -> bool:
+  """Interpret a flag's environment variable like click does."""
+  return bool(value) and value.lower() not in ('0', 'false', 'f', 'no', 'n', 'off')
+
+def _forwarded_env(key: str) -> bool:
+  return key.startswith(FORWARDED_ENV_PREFIX) and key not in PINNED_ENV
+
+@contextmanager
+def _request_context(cwd: str, env: Dict[str, str]) -> Iterator[None]:
+  """Run in the client's directory with its HABITS_ variables, restoring both after."""
+  previous_cwd = os.getcwd()
+  previous_env = {key: os.environ.pop(key) for key in list(os.environ) if _forwarded_env(key)}
+  os.environ.update({key: value for key, value in env.items() if _forwarded_env(key)})
+  previous_stdin = sys.stdin
+  # Prompts must fail instead of waiting on the daemon's terminal
+  sys.stdin = io.StringIO()
+  try:
+    os.chdir(cwd)
+    yield
+  finally:
+    sys.stdin = previous_stdin
+    os.chdir(previous_cwd)
+    for key in [key for key in os.environ if _forwarded_env(key)]:
+      del os.environ[key]
+    os.environ.update(previous_env)
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+  def handle(self) -> None:
+    line = self.rfile.readline()
+    if not line:
+      return
+    stdout, stderr = io.StringIO(), io.StringIO()
+    try:
+      request = json.loads(line)
+      with _request_context(request.get('cwd', os.getcwd()), request.get('env', {})), \
+           redirect_stdout(stdout), redirect_stderr(stderr):
+        exit_code = self.server.run_command(request['args'])
+    except Exception:
+      # A failing command must not take the daemon down
+      import traceback
+      stderr.write(traceback.format_exc())
+      exit_code = 1
+    response = {'exit_code': exit_code, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+    self.wfile.write(json.dumps(response).encode() + b'\n')
+
+class CommandServer(socketserver.UnixStreamServer):
+  def __init__(self, socket_path: str, run_command: Callable[[List[str]], int]):
+    """
+    Listen on a Unix socket, replacing a stale socket file.
+
+    Args:
+      socket_path: Socket to create
+      run_command: Runs one command's arguments, printing to sys.stdout
+        and sys.stderr, and returns its exit code
+    Raises:
+      RuntimeError: If another daemon is already listening on the socket
+    """
+    if os.path.exists(socket_path):
+      client = _connect(socket_path)
+      if client is not None:
+        client.close()
+        raise RuntimeError(f"A daemon is already listening on {socket_path}")
+      os.unlink(socket_path)
+    self.socket_path = socket_path
+    self.run_command = run_command
+    previous_umask = os.umask(0o177)
+    try:
+      super().__init__(socket_path, _CommandHandler)
+    finally:
+      os.umask(previous_umask)
+
+  def server_close(self) -> None:
+    super().server_close()
+    if os.path.exists(self.socket_path):
+      os.unlink(self.socket_path)
@@ -0,0 +1,93 @@
+"""
+Seeded generator of synthetic habit histories for load testing.
+
+Every habit draws its own completion probability and gap behaviour from a
+random stream derived from the seed and the habit's index, so a run is
+reproducible and habits are generated one at a time without holding the
+whole dataset in memory.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+from .habit import Habit
+from .storage import HabitStore
+
+# Share of generated habits per periodicity
+DEFAULT_PERIODICITY_MIX = {'daily': 0.7, 'weekly': 0.2, 'monthly': 0.1}
+
+# Length of one period; monthly matches the 30-day streak interval
+PERIOD_LENGTHS = {
+  'daily': timedelta(days=1),
+  'weekly': timedelta(weeks=1),
+  'monthly': timedelta(days=30)
+}
+
+def generate_habits(num_habits: int, days: int, seed: int = 0,
+                    periodicity_mix: Optional[Dict[str, float]] = None,
+                    completion_range: Tuple[float, float] = (0.5, 0.95),
+                    gap_probability: float = 0.02, max_gap_periods: int = 14,
+                    time_jitter: timedelta = timedelta(0),
+                    end: Optional[datetime] = None) -> Iterator[Habit]:
+  """
+  Yield habits with generated check-off histories.
+
+  Args:
+    num_habits: Number of habits to generate
+    days: Length of each history in days, ending at end
+    seed: Seed for reproducible output
+    periodicity_mix: Relative weight of each periodicity
+    completion_range: Bounds of each habit's per-period completion probability
+    gap_probability: Chance per period of starting a break (e.g. a holiday)
+    max_gap_periods: Longest break, in periods
+    time_jitter: Maximum random shift of each check-off around the habit's
+      time of day; note that daily streaks break on gaps over 24 hours
+    end: Last day of the histories (default: now)
+  """
+  mix = periodicity_mix or DEFAULT_PERIODICITY_MIX
+  periodicities = list(mix)
+  weights = [mix[periodicity] for periodicity in periodicities]
+  end = end or datetime.now()
+  start = end - timedelta(days=days)
+
+  for index in range(num_habits):
+    rng = random.Random(f"{seed}:{index}")
+    periodicity = rng.choices(periodicities, weights)[0]
+    completion = rng.uniform(*completion_range)
+    period = PERIOD_LENGTHS[periodicity]
+    # Each habit is done around the same time of day
+    habit_time = timedelta(hours=rng.randint(6, 21))
+    jitter_seconds = int(time_jitter.total_seconds())
+
+    # Compact storage keeps a generated habit small until it is written
+    habit = Habit(f"Habit {index + 1}", periodicity, start, storage='epoch_seconds')
+    period_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    gap_left = 0
+    while period_start <= end:
+      if gap_left:
+        gap_left -= 1
+      elif rng.random() < gap_probability:
+        gap_left = rng.randint(1, max_gap_periods) - 1
+      elif rng.random() < completion:
+        check_date = period_start + habit_time
+        if jitter_seconds:
+          check_date += timedelta(seconds=rng.randint(-jitter_seconds, jitter_seconds))
+        if start <= check_date <= end:
+          habit.check_off(check_date)
+      period_start += period
+    yield habit
+
+def create_generated_data(db: HabitStore, num_habits: int, days: int,
+                          batch_size: int = 50_000, **options) -> Tuple[int, int]:
+  """
+  Generate habits and write them through batched transactions.
+
+  Args:
+    db: Store to write to
+    num_habits: Number of habits to generate
+    days: Length of each history in days
+    batch_size: Rows per transaction
+    options: Further arguments for generate_habits
+  Returns:
+    Tuple of (habits_added, check_offs_added)
+  """
+  return db.save_habits_bulk(generate_habits(num_habits, days, **options), batch_size)
@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+# Naive datetimes are stored as-is, so the epoch is naive as well
+EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 86400
+
+def to_epoch_seconds(date: datetime) -> int:
+  """Convert a naive datetime to whole seconds since the epoch."""
+  delta = date - EPOCH
+  return delta.days * SECONDS_PER_DAY + delta.seconds
+
+def to_epoch_day(date: datetime) -> int:
+  """Convert a naive datetime to the number of days since the epoch."""
+  return (date - EPOCH).days
+
+def from_epoch_seconds(seconds: int) -> datetime:
+  """Convert seconds since the epoch back to a naive datetime."""
+  return EPOCH + timedelta(seconds=seconds)
+
+def from_epoch_day(day: int) -> datetime:
+  """Convert days since the epoch to a naive datetime at midnight."""
+  return EPOCH + timedelta(days=day)
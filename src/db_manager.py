@@ -1,49 +1,299 @@
+import json
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
 from datetime import datetime
-from typing import List, Optional
+from itertools import islice
+from typing import Collection, Dict, Iterable, Iterator, List, Optional
+from .dates import SECONDS_PER_DAY, to_epoch_day, to_epoch_seconds
 from .habit import Habit
+from .habit_stats import HabitStats, rebuild_habit_stats, save_habit_stats
+from .migrations import SCHEMA_VERSION, get_version, migrate
+from .options import MIN_RETENTION_DAYS
+from . import archive, bitmaps, rollups
+from .profiling import Profiler, ProfiledConnection
+
+# Above this many touched habits, derived tables are rebuilt in one pass
+FULL_REBUILD_THRESHOLD = 1000
+
+def _batched(rows: Iterable, size: int) -> Iterator[list]:
+  """Split an iterable into lists of at most size items."""
+  iterator = iter(rows)
+  while batch := list(islice(iterator, size)):
+    yield batch
+
+SYNCHRONOUS_MODES = ['OFF', 'NORMAL', 'FULL', 'EXTRA']
 
 class HabitDatabase:
-  def __init__(self, db_path: str = "habits.db"):
-    """Initialize database connection and create tables if they don't exist."""
+  def __init__(self, db_path: str = "habits.db", pooled: bool = False,
+               busy_timeout: float = 5.0, synchronous: str = 'NORMAL',
+               read_only: bool = False):
+    """
+    Initialize database connection and create tables if they don't exist.
+
+    By default a single connection is used, which must stay on the thread
+    that created the database. In pooled mode the database is switched to
+    WAL journaling and may be shared between threads: every thread reads
+    through its own connection, so readers never wait for writers, and
+    writes are serialized on one dedicated writer connection.
+
+    Args:
+      db_path: SQLite database file
+      pooled: Whether to use per-thread reader connections and a writer
+      busy_timeout: Seconds to wait for a lock held by another connection
+      synchronous: PRAGMA synchronous level used in pooled mode, NORMAL
+        is durable across application crashes with WAL
+      read_only: Open an existing, migrated database without write access
+    Raises:
+      ValueError: For an unknown synchronous level, or a pooled or
+        read-only in-memory database, which could not be shared between
+        connections
+    """
+    if synchronous.upper() not in SYNCHRONOUS_MODES:
+      raise ValueError(f"Synchronous must be one of {SYNCHRONOUS_MODES}")
+    if (pooled or read_only) and db_path == ':memory:':
+      raise ValueError("An in-memory database cannot be pooled or opened read-only")
+
     self.db_path = db_path
-    self.conn = sqlite3.connect(db_path)
-    self.conn.row_factory = sqlite3.Row
+    self.pooled = pooled
+    self.busy_timeout = busy_timeout
+    self.synchronous = synchronous.upper()
+    self.read_only = read_only
+    self.profiler: Optional[Profiler] = None
+
+    self._local = threading.local()
+    self._write_lock = threading.RLock()
+    self._connections: List[sqlite3.Connection] = []
+    self._connections_lock = threading.Lock()
+    self._writer_conn = self._connect()
+    if pooled and not read_only:
+      self._writer_conn.execute("PRAGMA journal_mode = WAL")
+    self._create_tables()
+
+  def _connect(self) -> sqlite3.Connection:
+    """Open a connection configured for the database's mode."""
+    database, uri = self.db_path, False
+    if self.read_only:
+      database, uri = f"file:{quote(self.db_path)}?mode=ro", True
+    # Pooled connections are closed by close() from whichever thread calls it
+    conn = sqlite3.connect(database, timeout=self.busy_timeout,
+                           check_same_thread=not self.pooled, uri=uri)
+    conn.row_factory = sqlite3.Row
+    if self.pooled:
+      conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+    with self._connections_lock:
+      self._connections.append(conn)
+    return conn
+
+  @property
+  def conn(self) -> sqlite3.Connection:
+    """
+    Connection for the calling thread.
+
+    This is the writer connection inside _write() or when not pooled, and
+    the thread's own reader connection otherwise.
+    """
+    if not self.pooled or getattr(self._local, 'writing', False):
+      conn = self._writer_conn
+    else:
+      conn = getattr(self._local, 'conn', None)
+      if conn is None:
+        conn = self._local.conn = self._connect()
+        # Writes must go through the writer connection
+        conn.execute("PRAGMA query_only = ON")
+    if self.profiler is not None:
+      return ProfiledConnection(conn, self.profiler)
+    return conn
+
+  @contextmanager
+  def _write(self) -> Iterator[sqlite3.Connection]:
+    """
+    Run a write transaction on the writer connection.
+
+    Writers from different threads are serialized, and self.conn refers to
+    the writer connection for the duration of the block. Every transaction
+    bumps the change counter read by get_data_version.
+    """
+    with self._write_lock:
+      writing = getattr(self._local, 'writing', False)
+      self._local.writing = True
+      try:
+        with self.conn as conn:
+          yield conn
+          conn.execute("UPDATE data_changes SET counter = counter + 1")
+      finally:
+        self._local.writing = writing
+
+  def get_data_version(self) -> tuple[int, int]:
+    """
+    Return a token that changes whenever the data may have changed.
+
+    Returns:
+      Tuple of (change counter, PRAGMA data_version). The counter is
+      stored in the database and bumped by every write transaction of any
+      HabitDatabase, so it can be compared across processes. data_version
+      is only meaningful for this connection, and also catches commits by
+      other programs writing to the file directly.
+    """
+    conn = self.conn
+    counter = conn.execute("SELECT counter FROM data_changes").fetchone()[0]
+    return counter, conn.execute("PRAGMA data_version").fetchone()[0]
+
+  def enable_profiling(self, profiler: Optional[Profiler] = None) -> Profiler:
+    """
+    Record every statement run from now on, see src.profiling.
+
+    Returns:
+      The profiler collecting the figures
+    """
+    if profiler is not None or self.profiler is None:
+      self.profiler = profiler or Profiler()
+    return self.profiler
+
+  def snapshot(self, path: str) -> None:
+    """
+    Copy the database to a file with SQLite's online backup API.
+
+    Mainly meant for in-memory databases, whose contents otherwise vanish
+    with the process. The copy is consistent even while other threads
+    keep reading.
+
+    Args:
+      path: File to write, replaced if it exists
+    """
+    target = sqlite3.connect(path)
+    try:
+      with self._write_lock:
+        self._writer_conn.backup(target)
+    finally:
+      target.close()
+
+  def restore(self, path: str) -> None:
+    """
+    Replace the contents of the database with a snapshot file.
+
+    Snapshots of older schema versions are migrated after loading.
+
+    Args:
+      path: File written by snapshot, or any habit database file
+    Raises:
+      FileNotFoundError: If the file does not exist
+    """
+    if not os.path.exists(path):
+      raise FileNotFoundError(path)
+    counter = self.get_data_version()[0]
+    source = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+    try:
+      with self._write_lock:
+        source.backup(self._writer_conn)
+    finally:
+      source.close()
     self._create_tables()
+    with self._write() as conn:
+      # Results cached before the restore must not match the restored data
+      conn.execute("UPDATE data_changes SET counter = MAX(counter, ?)", (counter,))
+
+  @classmethod
+  def from_snapshot(cls, path: str) -> "HabitDatabase":
+    """Open an in-memory database holding the contents of a snapshot file."""
+    db = cls(':memory:')
+    db.restore(path)
+    return db
 
   def _create_tables(self) -> None:
-    """Create the necessary database tables if they don't exist."""
-    with self.conn:
-      self.conn.execute("""
-        CREATE TABLE IF NOT EXISTS habits (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          task_name TEXT NOT NULL,
-          periodicity TEXT NOT NULL,
-          creation_date TEXT NOT NULL
-        )
-      """)
-          
-      self.conn.execute("""
-        CREATE TABLE IF NOT EXISTS check_offs (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          habit_id INTEGER NOT NULL,
-          check_date TEXT NOT NULL,
-          FOREIGN KEY (habit_id) REFERENCES habits (id),
-          UNIQUE(habit_id, check_date)
-        )
-      """)
+    """Create or upgrade the database tables to the current schema version."""
+    if not self.read_only:
+      migrate(self._writer_conn)
+      return
+    version = get_version(self._writer_conn)
+    if version != SCHEMA_VERSION:
+      raise RuntimeError(
+        f"Database schema version {version} must be {SCHEMA_VERSION} to open it read-only"
+      )
 
   def save_habit(self, habit: Habit) -> int:
     """Save a habit to the database and return its ID."""
-    with self.conn:
+    with self._write():
       cursor = self.conn.execute("""
-        INSERT INTO habits (task_name, periodicity, creation_date)
-        VALUES (?, ?, ?)
-      """, (habit.task_name, habit.periodicity, habit.creation_date.isoformat()))
-      return cursor.lastrowid
+        INSERT INTO habits (task_name, periodicity, creation_date, creation_ts)
+        VALUES (?, ?, ?, ?)
+      """, (habit.task_name, habit.periodicity, habit.creation_date.isoformat(),
+            to_epoch_seconds(habit.creation_date)))
+      habit_id = cursor.lastrowid
+      save_habit_stats(self.conn, habit_id, HabitStats())
+      return habit_id
+
+  def save_habits_bulk(self, habits: Iterable[Habit], batch_size: int = 50_000) -> tuple[int, int]:
+    """
+    Save new habits together with their check-off history.
+
+    Habits are consumed lazily and committed in transactions of roughly
+    batch_size rows, so arbitrarily large generated histories can be
+    written without holding them in memory. Stats rows are computed from
+    the histories on the way instead of being rebuilt afterwards, and
+    rollups are counted once per batch.
+
+    Returns:
+      Tuple of (habits_added, check_offs_added)
+    Raises:
+      ValueError: If a habit has check-offs before the archive cutoff;
+        its batch is not written then
+    """
+    habits_added = 0
+    check_offs_added = 0
+    iterator = iter(habits)
+    exhausted = False
+
+    while not exhausted:
+      exhausted = True
+      pending = 0
+      batch_ids = []
+      with self._write():
+        for habit in iterator:
+          cursor = self.conn.execute("""
+            INSERT INTO habits (task_name, periodicity, creation_date, creation_ts)
+            VALUES (?, ?, ?, ?)
+          """, (habit.task_name, habit.periodicity, habit.creation_date.isoformat(),
+                to_epoch_seconds(habit.creation_date)))
+          habit_id = cursor.lastrowid
+
+          dates = list(habit.check_off_dates)
+          if dates:
+            archive.ensure_live(self.conn, to_epoch_seconds(dates[0]) // SECONDS_PER_DAY)
+          rows = []
+          for check_date in dates:
+            check_ts = to_epoch_seconds(check_date)
+            rows.append((habit_id, check_date.isoformat(), check_ts, check_ts // SECONDS_PER_DAY))
+          self.conn.executemany("""
+            INSERT INTO check_offs (habit_id, check_date, check_ts, check_day)
+            VALUES (?, ?, ?, ?)
+          """, rows)
+          save_habit_stats(self.conn, habit_id, HabitStats.from_dates(dates, habit.periodicity))
+          batch_ids.append(habit_id)
+
+          habits_added += 1
+          check_offs_added += len(rows)
+          pending += len(rows) + 1
+          if pending >= batch_size:
+            exhausted = False
+            break
+        # Counting the whole batch in SQL beats upserting bucket by bucket
+        rollups.rebuild_rollups(self.conn, batch_ids)
+        bitmaps.rebuild_bitmaps(self.conn, batch_ids)
+    return habits_added, check_offs_added
+
+  def load_habit(self, habit_id: int, storage: str = 'dates',
+                 load_history: bool = True) -> Optional[Habit]:
+    """
+    Load a habit and its check-offs from the database.
 
-  def load_habit(self, habit_id: int) -> Optional[Habit]:
-    """Load a habit and its check-offs from the database."""
+    Args:
+      habit_id: ID of the habit to load
+      storage: In-memory check-off representation, see Habit
+      load_history: Whether to load check-offs, or only the habit
+    """
     cursor = self.conn.execute("""
       SELECT * FROM habits WHERE id = ?
     """, (habit_id,))
@@ -53,63 +303,774 @@ class HabitDatabase:
       return None
 
     # Create habit instance
-    habit = Habit(
-      task_name=habit_data['task_name'],
-      periodicity=habit_data['periodicity'],
-      creation_date=datetime.fromisoformat(habit_data['creation_date'])
-    )
+    habit = self._habit_from_row(habit_data, storage)
+    if not load_history:
+      return habit
 
-    # Load check-offs
-    check_offs = self.get_check_offs(habit_id)
-    for check_date in check_offs:
-      habit.check_off(check_date)
+    # Load check-offs, already sorted by the query
+    column, order = self._check_off_source(storage)
+    cursor = self.conn.execute(f"""
+      SELECT {column} FROM check_offs
+      WHERE habit_id = ?
+      ORDER BY {order}
+    """, (habit_id,))
+    self._load_check_offs(habit, storage, [row[0] for row in cursor])
 
     return habit
 
   def save_check_off(self, habit_id: int, check_date: datetime) -> None:
-    """Save a check-off date for a habit."""
-    with self.conn:
-      self.conn.execute("""
-        INSERT OR IGNORE INTO check_offs (habit_id, check_date)
-        VALUES (?, ?)
+    """
+    Save a check-off date for a habit.
+
+    Raises:
+      ValueError: If the date is before the archive cutoff, see archive
+    """
+    check_ts = to_epoch_seconds(check_date)
+    with self._write():
+      archive.ensure_live(self.conn, check_ts // SECONDS_PER_DAY)
+      cursor = self.conn.execute("""
+        INSERT OR IGNORE INTO check_offs (habit_id, check_date, check_ts, check_day)
+        VALUES (?, ?, ?, ?)
+      """, (habit_id, check_date.isoformat(), check_ts, check_ts // SECONDS_PER_DAY))
+      if cursor.rowcount:
+        self._update_stats(habit_id, check_date)
+        rollups.add_check_offs(self.conn, [(habit_id, check_ts // SECONDS_PER_DAY)])
+        bitmaps.add_check_offs(self.conn, [(habit_id, check_ts // SECONDS_PER_DAY)])
+
+  def delete_check_off(self, habit_id: int, check_date: datetime) -> bool:
+    """
+    Remove a check-off of a habit.
+
+    Returns:
+      True if the check-off existed
+    """
+    check_ts = to_epoch_seconds(check_date)
+    with self._write():
+      cursor = self.conn.execute("""
+        DELETE FROM check_offs WHERE habit_id = ? AND check_date = ?
       """, (habit_id, check_date.isoformat()))
+      if not cursor.rowcount:
+        return False
+      # Removing a date can split a run, so replay the history
+      self._rebuild_habit_stats(habit_id)
+      rollups.add_check_offs(self.conn, [(habit_id, check_ts // SECONDS_PER_DAY)], delta=-1)
+      self._rebuild_bitmaps([habit_id])
+      return True
 
-  def get_all_habits(self) -> List[tuple[int, Habit]]:
-    """Return all habits with their IDs."""
-    cursor = self.conn.execute("SELECT * FROM habits")
-    habits = []
-    for row in cursor.fetchall():
-      # Create habit instance
-      habit = Habit(
-        task_name=row['task_name'],
-        periodicity=row['periodicity'],
-        creation_date=datetime.fromisoformat(row['creation_date'])
-      )
-      
-      # Load check-offs for this habit
-      check_offs = self.get_check_offs(row['id'])
-      for check_date in check_offs:
-        habit.check_off(check_date)
-      
-      habits.append((row['id'], habit))
-    return habits
+  def _update_stats(self, habit_id: int, check_date: datetime) -> None:
+    """Fold a newly inserted check-off into the habit's stats row."""
+    row = self.conn.execute("""
+      SELECT h.id, h.periodicity, s.current_run, s.longest_streak, s.last_check_date, s.total_count
+      FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+      WHERE h.id = ?
+    """, (habit_id,)).fetchone()
+    if row:
+      self._fold_into_stats(row, [check_date])
+
+  def _fold_into_stats(self, row: sqlite3.Row, new_dates: List[datetime]) -> None:
+    """
+    Update a stats row with newly inserted check-offs.
+
+    Args:
+      row: Habit id and periodicity with its current habit_stats columns
+      new_dates: Inserted dates in ascending order
+    """
+    stats = self._stats_from_row(row)
+    if stats.last_check_off is not None and new_dates[0] <= stats.last_check_off:
+      # Backfilled dates can merge or split runs, so replay the history
+      self._rebuild_habit_stats(row['id'])
+      return
+
+    for check_date in new_dates:
+      stats = stats.extend(check_date, row['periodicity'])
+    save_habit_stats(self.conn, row['id'], stats)
+
+  def save_check_offs_bulk(self, habit_ids: Iterable[int], dates: Iterable[datetime]) -> int:
+    """
+    Check off every given habit on every given date in a single transaction.
+
+    Habit existence is verified with one query and no check-off history is
+    loaded; stats are extended in place unless older dates are backfilled.
+
+    Args:
+      habit_ids: Habits to check off
+      dates: Completion dates
+    Returns:
+      Number of check-offs added (existing ones are skipped)
+    Raises:
+      ValueError: If any habit does not exist, or a date is before the
+        archive cutoff; nothing is written then
+    """
+    habit_ids = sorted(set(habit_ids))
+    dates = sorted(set(dates))
+    if not habit_ids or not dates:
+      return 0
+
+    with self._write():
+      archive.ensure_live(self.conn, to_epoch_day(dates[0]))
+      rows = self.conn.execute("""
+        SELECT h.id, h.periodicity, s.current_run, s.longest_streak, s.last_check_date, s.total_count
+        FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+        WHERE h.id IN (SELECT value FROM json_each(?))
+      """, (json.dumps(habit_ids),)).fetchall()
+      missing = set(habit_ids) - {row['id'] for row in rows}
+      if missing:
+        raise ValueError(f"Habits not found: {sorted(missing)}")
+
+      date_params = []
+      for check_date in dates:
+        check_ts = to_epoch_seconds(check_date)
+        date_params.append((check_date.isoformat(), check_ts, check_ts // SECONDS_PER_DAY))
+      cursor = self.conn.executemany("""
+        INSERT OR IGNORE INTO check_offs (habit_id, check_date, check_ts, check_day)
+        VALUES (?, ?, ?, ?)
+      """, ((habit_id, *params) for habit_id in habit_ids for params in date_params))
+
+      for row in rows:
+        self._fold_into_stats(row, dates)
+      if cursor.rowcount == len(habit_ids) * len(date_params):
+        rollups.add_check_offs(self.conn, (
+          (habit_id, params[2]) for habit_id in habit_ids for params in date_params
+        ))
+      else:
+        # Some check-offs already existed, count the habits from scratch
+        rollups.rebuild_rollups(self.conn, habit_ids)
+      # Setting a bit twice is harmless, so existing check-offs need no rebuild
+      bitmaps.add_check_offs(self.conn, (
+        (habit_id, params[2]) for habit_id in habit_ids for params in date_params
+      ))
+      return cursor.rowcount
+
+  def save_check_offs_batch(self, check_offs: Iterable[tuple[int, datetime]]) -> int:
+    """
+    Save (habit_id, check_date) pairs in a single transaction.
+
+    Equivalent to calling save_check_off for every pair, but the rows are
+    inserted with one executemany and committed together, and each
+    touched habit's stats row is read and written once.
+
+    Returns:
+      Number of check-offs added (existing ones are skipped)
+    Raises:
+      ValueError: If a date is before the archive cutoff; nothing is
+        written then
+    """
+    dates_by_habit: Dict[int, set] = {}
+    for habit_id, check_date in check_offs:
+      dates_by_habit.setdefault(habit_id, set()).add(check_date)
+    if not dates_by_habit:
+      return 0
+
+    rows = []
+    for habit_id, dates in dates_by_habit.items():
+      dates_by_habit[habit_id] = sorted(dates)
+      for check_date in dates_by_habit[habit_id]:
+        check_ts = to_epoch_seconds(check_date)
+        rows.append((habit_id, check_date.isoformat(), check_ts, check_ts // SECONDS_PER_DAY))
+
+    with self._write():
+      archive.ensure_live(self.conn, min(row[3] for row in rows))
+      cursor = self.conn.executemany("""
+        INSERT OR IGNORE INTO check_offs (habit_id, check_date, check_ts, check_day)
+        VALUES (?, ?, ?, ?)
+      """, rows)
+      stats_rows = self.conn.execute("""
+        SELECT h.id, h.periodicity, s.current_run, s.longest_streak, s.last_check_date, s.total_count
+        FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+        WHERE h.id IN (SELECT value FROM json_each(?))
+      """, (json.dumps(list(dates_by_habit)),)).fetchall()
+      for row in stats_rows:
+        self._fold_into_stats(row, dates_by_habit[row['id']])
+      if cursor.rowcount == len(rows):
+        rollups.add_check_offs(self.conn, ((row[0], row[3]) for row in rows))
+      else:
+        # Some check-offs already existed, count the habits from scratch
+        rollups.rebuild_rollups(self.conn, dates_by_habit)
+      bitmaps.add_check_offs(self.conn, ((row[0], row[3]) for row in rows))
+      return cursor.rowcount
+
+  @staticmethod
+  def _stats_from_row(row: sqlite3.Row) -> HabitStats:
+    """Build HabitStats from a row with habit_stats columns, which may be NULL."""
+    last_check_date = row['last_check_date']
+    return HabitStats(
+      current_run=row['current_run'] or 0,
+      longest_streak=row['longest_streak'] or 0,
+      last_check_off=datetime.fromisoformat(last_check_date) if last_check_date else None,
+      total_count=row['total_count'] or 0
+    )
+
+  def get_stats(self, habit_id: int) -> Optional[HabitStats]:
+    """Return the materialized stats of a habit, or None if it doesn't exist."""
+    row = self.conn.execute("""
+      SELECT s.current_run, s.longest_streak, s.last_check_date, s.total_count
+      FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+      WHERE h.id = ?
+    """, (habit_id,)).fetchone()
+    return self._stats_from_row(row) if row else None
+
+  def get_all_stats(self) -> List[tuple[int, Habit, HabitStats]]:
+    """
+    Return every habit with its materialized stats, one row per habit.
+
+    The habits are returned without their check-off history.
+    """
+    cursor = self.conn.execute("""
+      SELECT h.*, s.current_run, s.longest_streak, s.last_check_date, s.total_count
+      FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+      ORDER BY h.id
+    """)
+    return [
+      (row['id'], self._habit_from_row(row), self._stats_from_row(row))
+      for row in cursor
+    ]
+
+  def iter_stats(self, batch_size: int = 1000, after_id: Optional[int] = None,
+                 limit: Optional[int] = None,
+                 periodicity: Optional[str] = None) -> Iterator[tuple[int, Habit, HabitStats]]:
+    """
+    Stream habits with their materialized stats in ID order.
+
+    Like get_all_stats, but rows are fetched with keyset pagination, so
+    memory use is bounded by batch_size however many habits exist.
+
+    Args:
+      batch_size: Habits fetched per query
+      after_id: Only yield habits with a greater ID
+      limit: Maximum number of habits to yield
+      periodicity: Only yield habits with this periodicity
+    """
+    for rows in self._keyset_batches("""
+      SELECT h.*, s.current_run, s.longest_streak, s.last_check_date, s.total_count
+      FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+    """, batch_size, after_id, limit, periodicity):
+      for row in rows:
+        yield row['id'], self._habit_from_row(row), self._stats_from_row(row)
+
+  def iter_habits(self, batch_size: int = 1000, after_id: Optional[int] = None,
+                  limit: Optional[int] = None, periodicity: Optional[str] = None,
+                  load_history: bool = False, storage: str = 'dates') -> Iterator[tuple[int, Habit]]:
+    """
+    Stream habits in ID order using keyset pagination.
+
+    Each batch costs one query for the habits and, with load_history, one
+    for their check-offs, so memory use is bounded by the batch rather
+    than the table.
+
+    Args:
+      batch_size: Habits fetched per query
+      after_id: Only yield habits with a greater ID
+      limit: Maximum number of habits to yield
+      periodicity: Only yield habits with this periodicity
+      load_history: Whether to load check-offs, or only the habits
+      storage: In-memory check-off representation, see Habit
+    """
+    column, order = self._check_off_source(storage)
+    for rows in self._keyset_batches("SELECT h.* FROM habits h", batch_size,
+                                     after_id, limit, periodicity):
+      if not load_history:
+        for row in rows:
+          yield row['id'], self._habit_from_row(row, storage)
+        continue
+
+      check_off_rows = self.conn.execute(f"""
+        SELECT habit_id, {column} FROM check_offs
+        WHERE habit_id BETWEEN ? AND ?
+        ORDER BY habit_id, {order}
+      """, (rows[0]['id'], rows[-1]['id']))
+      yield from self._build_habits(rows, check_off_rows, storage)
+
+  def _keyset_batches(self, select: str, batch_size: int, after_id: Optional[int],
+                      limit: Optional[int], periodicity: Optional[str]) -> Iterator[List[sqlite3.Row]]:
+    """
+    Run a query over habits aliased h in ID order, one page at a time.
+
+    Each page continues after the last ID of the previous one instead of
+    using OFFSET, so every page is an index range scan.
+
+    Raises:
+      ValueError: If batch_size is not positive
+    """
+    if batch_size < 1:
+      raise ValueError("Batch size must be positive")
+    where = "WHERE h.id > ?"
+    params: list = []
+    if periodicity:
+      where += " AND h.periodicity = ?"
+      params.append(periodicity.lower())
+
+    last_id = after_id if after_id is not None else 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+      size = batch_size if remaining is None else min(batch_size, remaining)
+      rows = self.conn.execute(
+        f"{select} {where} ORDER BY h.id LIMIT ?", (last_id, *params, size)
+      ).fetchall()
+      if not rows:
+        return
+      yield rows
+      if len(rows) < size:
+        return
+      last_id = rows[-1]['id']
+      if remaining is not None:
+        remaining -= len(rows)
+
+  def count_check_offs(self, start_day: int, end_day: int,
+                       habit_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """
+    Count check-offs per habit between two epoch days, both inclusive.
+
+    Counts are summed from the day, week and month rollups, see src.rollups.
+
+    Returns:
+      Dictionary mapping habit ID to its count, without habits having none
+    Raises:
+      ValueError: If the range starts before the archive cutoff, as the
+        rollups no longer count archived check-offs
+    """
+    archive.ensure_live(self.conn, start_day)
+    return rollups.count_check_offs(self.conn, start_day, end_day, habit_ids)
+
+  def get_period_bitmaps(self, habit_ids: Optional[Iterable[int]] = None,
+                         periodicity: Optional[str] = None) -> Dict[int, bitmaps.PeriodBitmap]:
+    """
+    Return the bitmaps of the days, ISO weeks or months habits were completed in.
+
+    Args:
+      habit_ids: Only these habits (default: all habits)
+      periodicity: Only habits with this periodicity
+    Returns:
+      Dictionary mapping habit ID to its bitmap, see src.bitmaps; habits
+      without check-offs are left out
+    """
+    return bitmaps.load_bitmaps(self.conn, habit_ids, periodicity)
+
+  def get_newest_habit_ids(self) -> Dict[str, int]:
+    """Return the ID of the most recently created habit of each periodicity."""
+    cursor = self.conn.execute("SELECT periodicity, MAX(id) FROM habits GROUP BY periodicity")
+    return {row[0]: row[1] for row in cursor}
+
+  def rebuild_stats(self) -> None:
+    """Recompute the stats, rollups and bitmaps of every habit from its check-off history."""
+    with self._write():
+      self._rebuild_habit_stats()
+      rollups.rebuild_rollups(self.conn)
+      self._rebuild_bitmaps()
+
+  def _rebuild_derived(self, habit_ids: Collection[int]) -> None:
+    """
+    Recompute data derived from check-offs after writes that bypassed
+    save_check_off. Must be called inside a transaction.
+    """
+    if len(habit_ids) > FULL_REBUILD_THRESHOLD:
+      self._rebuild_habit_stats()
+      rollups.rebuild_rollups(self.conn)
+      self._rebuild_bitmaps()
+      return
+    for habit_id in habit_ids:
+      self._rebuild_habit_stats(habit_id)
+    rollups.rebuild_rollups(self.conn, habit_ids)
+    self._rebuild_bitmaps(habit_ids)
+
+  def _rebuild_habit_stats(self, habit_id: Optional[int] = None) -> None:
+    """rebuild_habit_stats, continuing from the stats of archived check-offs."""
+    habit_ids = None if habit_id is None else [habit_id]
+    rebuild_habit_stats(self.conn, habit_id, archive.load_archived_stats(self.conn, habit_ids))
+
+  def _rebuild_bitmaps(self, habit_ids: Optional[Collection[int]] = None) -> None:
+    """rebuild_bitmaps, merging in the bitmaps of archived check-offs."""
+    bitmaps.rebuild_bitmaps(self.conn, habit_ids, archive.load_archived_bitmaps(self.conn, habit_ids))
+
+  def get_archived_stats(self) -> Dict[int, HabitStats]:
+    """
+    Return the stats of the check-offs moved out by archive.
+
+    Returns:
+      Dictionary mapping habit ID to the stats of its archived check-offs;
+      habits without any are left out
+    """
+    return archive.load_archived_stats(self.conn)
+
+  def get_archive_state(self) -> Optional[archive.ArchiveState]:
+    """Return the cutoff day and file of the last archive run, or None if nothing was archived."""
+    return archive.get_state(self.conn)
+
+  def archive(self, before: datetime, path: Optional[str] = None) -> tuple[int, int]:
+    """
+    Move check-offs before a day into an archive database, see src.archive.
+
+    The check-offs are saved to the archive, which folds them into its own
+    stats and bitmaps, and those become the habits' archived_history rows
+    before the check-offs are deleted here. Live stats and bitmaps are
+    unchanged by the move; only habits with backfilled check-offs older
+    than their previously archived ones are recomputed. A run interrupted
+    before the deletion leaves copies in the archive, which the next run
+    skips. The freed pages are only returned to the file system by compact.
+
+    Args:
+      before: Check-offs on days before this one's are archived
+      path: Archive database file, created if needed (default: the file
+        of the last run, else the database path with .archive inserted)
+    Returns:
+      Tuple of (check_offs_archived, habits_archived)
+    Raises:
+      ValueError: If the day is within the last MIN_RETENTION_DAYS days,
+        or the archive path is missing for an in-memory database or is
+        the database itself
+    """
+    cutoff_day = to_epoch_day(before)
+    if cutoff_day > to_epoch_day(datetime.now()) - MIN_RETENTION_DAYS:
+      raise ValueError(f"Check-offs of the last {MIN_RETENTION_DAYS} days cannot be archived")
+    state = archive.get_state(self.conn)
+    path = path or (state.path if state else None) or archive.default_archive_path(self.db_path)
+    if path is None:
+      raise ValueError("An in-memory database needs an archive path")
+    if os.path.abspath(path) == os.path.abspath(self.db_path):
+      raise ValueError("The archive must be another file than the database")
+
+    # Other threads must not write check-offs between the copy and the deletion
+    with self._write_lock:
+      last_id = self.conn.execute("SELECT MAX(id) FROM check_offs").fetchone()[0] or 0
+      habit_rows = self.conn.execute("""
+        SELECT id AS habit_id, task_name, periodicity, creation_date FROM habits
+        WHERE id IN (SELECT habit_id FROM check_offs WHERE check_day < ? AND id <= ?)
+      """, (cutoff_day, last_id)).fetchall()
+      if not habit_rows:
+        return 0, 0
+      habit_ids = [row['habit_id'] for row in habit_rows]
+
+      archive_db = HabitDatabase(path)
+      try:
+        archive_db.import_rows(dict(row) for row in habit_rows)
+        check_offs = self.conn.execute("""
+          SELECT habit_id, check_date FROM check_offs WHERE check_day < ? AND id <= ?
+        """, (cutoff_day, last_id))
+        archive_db.save_check_offs_batch(
+          (habit_id, datetime.fromisoformat(check_date)) for habit_id, check_date in check_offs
+        )
+        stats = {habit_id: archive_db.get_stats(habit_id) for habit_id in habit_ids}
+        archived_bitmaps = archive_db.get_period_bitmaps(habit_ids)
+      finally:
+        archive_db.close()
+
+      with self._write():
+        backfilled = archive.backfilled_habits(self.conn)
+        archive.save_summaries(self.conn, stats, archived_bitmaps)
+        archived = archive.remove_check_offs(self.conn, cutoff_day, last_id, path)
+        for habit_id in backfilled:
+          self._rebuild_habit_stats(habit_id)
+    return archived, len(habit_ids)
+
+  def compact(self) -> None:
+    """Rebuild the database file without its free pages, e.g. after archive (VACUUM)."""
+    with self._write_lock:
+      self._writer_conn.execute("VACUUM")
+      if self.pooled:
+        # Truncate the write-ahead log the rewrite went through
+        self._writer_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+  def import_rows(self, rows: Iterable[Dict[str, str]], batch_size: int = 10_000) -> tuple[int, int]:
+    """
+    Import habits and check-offs from a stream of rows.
+
+    Each row has habit_id, task_name, periodicity and creation_date, plus an
+    optional check_date, with dates as ISO strings. Rows are written in
+    batches, each with executemany in its own transaction, so memory stays
+    bounded by batch_size. Habits whose ID already exists are kept as they
+    are, and duplicate check-offs are skipped.
+
+    Returns:
+      Tuple of (habits_added, check_offs_added)
+    Raises:
+      ValueError: For an invalid row, or a check-off before the archive
+        cutoff; the batches before it stay imported
+    """
+    habits_added = 0
+    check_offs_added = 0
+    touched = set()
+
+    try:
+      for batch in _batched(rows, batch_size):
+        habit_params = {}
+        check_off_params = []
+        for row in batch:
+          habit_id = int(row['habit_id'])
+          if habit_id not in habit_params:
+            # Validates the periodicity
+            habit = Habit(row['task_name'], row['periodicity'], datetime.fromisoformat(row['creation_date']))
+            habit_params[habit_id] = (
+              habit_id, habit.task_name, habit.periodicity,
+              habit.creation_date.isoformat(), to_epoch_seconds(habit.creation_date)
+            )
+          if row.get('check_date'):
+            check_date = datetime.fromisoformat(row['check_date'])
+            check_ts = to_epoch_seconds(check_date)
+            check_off_params.append(
+              (habit_id, check_date.isoformat(), check_ts, check_ts // SECONDS_PER_DAY)
+            )
+
+        with self._write():
+          archive.ensure_live(self.conn, min((params[3] for params in check_off_params), default=None))
+          cursor = self.conn.executemany("""
+            INSERT OR IGNORE INTO habits (id, task_name, periodicity, creation_date, creation_ts)
+            VALUES (?, ?, ?, ?, ?)
+          """, habit_params.values())
+          habits_added += cursor.rowcount
+          self.conn.executemany(
+            "INSERT OR IGNORE INTO habit_stats (habit_id) VALUES (?)",
+            ((habit_id,) for habit_id in habit_params)
+          )
+          cursor = self.conn.executemany("""
+            INSERT OR IGNORE INTO check_offs (habit_id, check_date, check_ts, check_day)
+            VALUES (?, ?, ?, ?)
+          """, check_off_params)
+          check_offs_added += cursor.rowcount
+        touched.update(params[0] for params in check_off_params)
+    finally:
+      # Keep derived data consistent with the batches already committed
+      with self._write():
+        self._rebuild_derived(touched)
+    return habits_added, check_offs_added
+
+  def iter_export_rows(self) -> Iterator[tuple]:
+    """
+    Stream every habit and check-off as export rows.
+
+    Yields (habit_id, task_name, periodicity, creation_date, check_date)
+    tuples ordered by habit and date. Habits without check-offs yield a
+    single row with check_date set to None. Rows are stepped from the
+    cursor as they are consumed, so memory use is constant.
+    """
+    cursor = self.conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("""
+      SELECT h.id, h.task_name, h.periodicity, h.creation_date, c.check_date
+      FROM habits h LEFT JOIN check_offs c ON c.habit_id = h.id
+      ORDER BY h.id, c.check_date
+    """)
+    yield from cursor
+
+  def get_all_habits(self, storage: str = 'dates',
+                     load_history: bool = True) -> List[tuple[int, Habit]]:
+    """
+    Return all habits with their IDs.
+
+    Habits and check-offs are fetched with two queries regardless of the
+    number of habits, and merged in a single pass over both cursors.
+
+    Args:
+      storage: In-memory check-off representation, see Habit
+      load_history: Whether to load check-offs, or only the habits
+    """
+    habit_rows = self.conn.execute("SELECT * FROM habits ORDER BY id")
+    if not load_history:
+      return [(row['id'], self._habit_from_row(row, storage)) for row in habit_rows]
+
+    column, order = self._check_off_source(storage)
+    check_off_rows = self.conn.execute(f"""
+      SELECT habit_id, {column} FROM check_offs
+      ORDER BY habit_id, {order}
+    """)
+    return list(self._build_habits(habit_rows, check_off_rows, storage))
+
+  def _build_habits(self, habit_rows: Iterable[sqlite3.Row],
+                    check_off_rows: Iterable[sqlite3.Row],
+                    storage: str = 'dates') -> Iterator[tuple[int, Habit]]:
+    """
+    Merge habit rows and check-off rows into Habit instances.
+
+    Both inputs must be ordered by habit ID (check-offs additionally by
+    date). Check-offs belonging to habits not present in habit_rows are
+    skipped.
+    """
+    check_offs = iter(check_off_rows)
+    pending = next(check_offs, None)
+
+    for row in habit_rows:
+      habit_id = row['id']
+      habit = self._habit_from_row(row, storage)
+
+      # Skip orphaned check-offs, then consume the ones for this habit
+      while pending is not None and pending['habit_id'] < habit_id:
+        pending = next(check_offs, None)
+      values = []
+      while pending is not None and pending['habit_id'] == habit_id:
+        values.append(pending[1])
+        pending = next(check_offs, None)
+      self._load_check_offs(habit, storage, values)
+
+      yield habit_id, habit
+
+  @staticmethod
+  def _habit_from_row(row: sqlite3.Row, storage: str = 'dates') -> Habit:
+    """Create a Habit without check-offs from a habits table row."""
+    return Habit(
+      task_name=row['task_name'],
+      periodicity=row['periodicity'],
+      creation_date=datetime.fromisoformat(row['creation_date']),
+      storage=storage
+    )
+
+  @staticmethod
+  def _check_off_source(storage: str) -> tuple[str, str]:
+    """
+    Return the check-off column and ORDER BY clause to read for a storage mode.
+
+    Datetime storage reads the ISO text, since fromisoformat is the cheapest
+    way to build datetime objects. Compact storage reads the integer column
+    through the covering (habit_id, check_day, check_ts) index.
+    """
+    if storage == 'dates':
+      return 'check_date', 'check_date'
+    return 'check_ts', 'check_day, check_ts'
+
+  @staticmethod
+  def _load_check_offs(habit: Habit, storage: str, values: List) -> None:
+    """Load values read via _check_off_source into a habit."""
+    if storage == 'dates':
+      habit.load_sorted_check_offs(map(datetime.fromisoformat, values))
+    else:
+      habit.load_sorted_epoch_seconds(values)
 
   def delete_habit(self, habit_id: int) -> None:
     """Delete a habit and its check-offs from the database."""
-    with self.conn:
+    with self._write():
       self.conn.execute("DELETE FROM check_offs WHERE habit_id = ?", (habit_id,))
+      self.conn.execute("DELETE FROM habit_stats WHERE habit_id = ?", (habit_id,))
+      self.conn.execute("DELETE FROM check_off_rollups WHERE habit_id = ?", (habit_id,))
+      self.conn.execute("DELETE FROM habit_bitmaps WHERE habit_id = ?", (habit_id,))
+      self.conn.execute("DELETE FROM archived_history WHERE habit_id = ?", (habit_id,))
       self.conn.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
 
-  def get_check_offs(self, habit_id: int) -> List[datetime]:
-    """Get all check-off dates for a habit."""
-    cursor = self.conn.execute("""
-      SELECT check_date FROM check_offs 
-      WHERE habit_id = ?
-      ORDER BY check_date
-    """, (habit_id,))
-    
-    return [datetime.fromisoformat(row['check_date']) for row in cursor.fetchall()]
+  def get_check_offs(self, habit_id: int, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, limit: Optional[int] = None,
+                     descending: bool = False) -> List[datetime]:
+    """
+    Get the check-off dates of a habit, oldest first.
+
+    Bounds and limits are resolved on the (habit_id, check_day, check_ts)
+    index, so reading a recent window costs the same however long the
+    habit's history is.
+
+    Args:
+      habit_id: ID of the habit
+      since: Only return check-offs at or after this time
+      until: Only return check-offs before this time
+      limit: Maximum number of check-offs to return
+      descending: Return the newest check-offs first, so that limit keeps
+        the most recent ones
+    """
+    where, params = self._check_off_range(since, until)
+    cursor = self.conn.execute(f"""
+      SELECT check_date FROM check_offs
+      WHERE habit_id = ?{where}
+      ORDER BY {self._check_off_order(descending)}
+      LIMIT ?
+    """, (habit_id, *params, -1 if limit is None else limit))
+    return [datetime.fromisoformat(row[0]) for row in cursor]
+
+  def get_check_offs_many(self, habit_ids: Iterable[int], since: Optional[datetime] = None,
+                          until: Optional[datetime] = None, limit: Optional[int] = None,
+                          descending: bool = False) -> Dict[int, List[datetime]]:
+    """
+    Get the check-off dates of several habits in one query.
+
+    Args:
+      habit_ids: IDs of the habits
+      since, until, descending: As for get_check_offs
+      limit: Maximum number of check-offs to return per habit
+    Returns:
+      Dictionary mapping each habit ID to its check-off dates; habits
+      without check-offs in the range map to an empty list
+    """
+    habit_ids = list(habit_ids)
+    where, params = self._check_off_range(since, until)
+    order = self._check_off_order(descending)
+    if limit is None:
+      query = f"""
+        SELECT habit_id, check_date FROM check_offs
+        WHERE habit_id IN (SELECT value FROM json_each(?)){where}
+        ORDER BY habit_id, {order}
+      """
+      params = [json.dumps(habit_ids), *params]
+    else:
+      # One bounded index scan per habit instead of reading whole histories
+      query = f"""
+        SELECT c.habit_id, c.check_date
+        FROM json_each(?) AS ids
+        JOIN check_offs c ON c.id IN (
+          SELECT id FROM check_offs
+          WHERE habit_id = ids.value{where}
+          ORDER BY {order}
+          LIMIT ?
+        )
+        ORDER BY c.habit_id, {order}
+      """
+      params = [json.dumps(habit_ids), *params, limit]
+
+    check_offs = {habit_id: [] for habit_id in habit_ids}
+    for habit_id, check_date in self.conn.execute(query, params):
+      check_offs[habit_id].append(datetime.fromisoformat(check_date))
+    return check_offs
+
+  @staticmethod
+  def _check_off_range(since: Optional[datetime],
+                       until: Optional[datetime]) -> tuple[str, List[int]]:
+    """
+    Return an AND clause and parameters restricting check-offs to [since, until).
+
+    The day bounds let SQLite seek on the index, the second-precise bounds
+    then trim the edge days.
+    """
+    where, params = "", []
+    if since is not None:
+      since_ts = to_epoch_seconds(since)
+      where += " AND check_day >= ? AND check_ts >= ?"
+      params += [since_ts // SECONDS_PER_DAY, since_ts]
+    if until is not None:
+      until_ts = to_epoch_seconds(until)
+      where += " AND check_day <= ? AND check_ts < ?"
+      params += [until_ts // SECONDS_PER_DAY, until_ts]
+    return where, params
+
+  @staticmethod
+  def _check_off_order(descending: bool) -> str:
+    """Return an ORDER BY list for one habit's check-offs that follows the index."""
+    return "check_day DESC, check_ts DESC" if descending else "check_day, check_ts"
+
+  def get_check_off_seconds(self, first_id: Optional[int] = None,
+                            last_id: Optional[int] = None) -> Iterator[tuple[int, int]]:
+    """
+    Return (habit_id, epoch_seconds) tuples for all habits.
+
+    Rows are ordered by habit and date, and check-offs of deleted habits
+    are skipped.
+
+    Args:
+      first_id: Only return check-offs of habits with this ID or greater
+      last_id: Only return check-offs of habits with this ID or lower
+    """
+    where = []
+    params = []
+    if first_id is not None:
+      where.append("c.habit_id >= ?")
+      params.append(first_id)
+    if last_id is not None:
+      where.append("c.habit_id <= ?")
+      params.append(last_id)
+
+    cursor = self.conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(f"""
+      SELECT c.habit_id, c.check_ts
+      FROM check_offs c JOIN habits h ON h.id = c.habit_id
+      {"WHERE " + " AND ".join(where) if where else ""}
+      ORDER BY c.habit_id, c.check_day, c.check_ts
+    """, params)
 
   def close(self) -> None:
-    """Close the database connection."""
-    self.conn.close()
\ No newline at end of file
+    """Close the database connections."""
+    with self._connections_lock:
+      for conn in self._connections:
+        conn.close()
+      self._connections.clear()
\ No newline at end of file
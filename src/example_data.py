@@ -2,8 +2,9 @@ from datetime import datetime, timedelta
 from typing import List, Tuple
 from .db_manager import HabitDatabase
 from .habit import Habit
+from .storage import HabitStore
 
-def create_example_data(db: HabitDatabase) -> List[Tuple[int, Habit]]:
+def create_example_data(db: HabitStore) -> List[Tuple[int, Habit]]:
   """
   Create example habits with 4 weeks of check-off history.
   Returns list of (habit_id, habit) tuples.
@@ -1,8 +1,193 @@
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional
+from .dates import SECONDS_PER_DAY, from_epoch_day, from_epoch_seconds, to_epoch_day, to_epoch_seconds
+
+class CheckOffDates(Sequence):
+  """
+  Sorted, duplicate-free collection of check-off dates.
+
+  Dates are kept in ascending order alongside a set for O(1) membership.
+  Appending a date newer than the latest one (the common case when
+  replaying history in order) is O(1); older dates are placed with a
+  binary search.
+  """
+
+  def __init__(self, dates: Iterable[datetime] = ()):
+    self._dates: List[datetime] = sorted(set(dates))
+    self._members = set(self._dates)
+
+  @classmethod
+  def from_sorted(cls, dates: Iterable[datetime]) -> "CheckOffDates":
+    """Build from dates already in ascending order, e.g. ORDER BY check_date rows."""
+    instance = cls()
+    for date in dates:
+      if not instance._dates or date > instance._dates[-1]:
+        instance._dates.append(date)
+        instance._members.add(date)
+    return instance
+
+  @classmethod
+  def from_sorted_epoch_seconds(cls, seconds: Iterable[int]) -> "CheckOffDates":
+    """Build from ascending epoch seconds, as stored in the database."""
+    return cls.from_sorted(map(from_epoch_seconds, seconds))
+
+  def add(self, date: datetime) -> bool:
+    """Insert a date, returning False if it was already present."""
+    if date in self._members:
+      return False
+    if not self._dates or date > self._dates[-1]:
+      self._dates.append(date)
+    else:
+      insort(self._dates, date)
+    self._members.add(date)
+    return True
+
+  def latest(self) -> Optional[datetime]:
+    """Return the most recent date, or None if empty."""
+    return self._dates[-1] if self._dates else None
+
+  def count_since(self, start: datetime) -> int:
+    """Count dates greater than or equal to start."""
+    return len(self._dates) - bisect_left(self._dates, start)
+
+  def __getitem__(self, index):
+    return self._dates[index]
+
+  def __len__(self) -> int:
+    return len(self._dates)
+
+  def __iter__(self) -> Iterator[datetime]:
+    return iter(self._dates)
+
+  def __reversed__(self) -> Iterator[datetime]:
+    return reversed(self._dates)
+
+  def __contains__(self, date) -> bool:
+    return date in self._members
+
+  def __eq__(self, other) -> bool:
+    if isinstance(other, (list, tuple, Sequence)):
+      return self._dates == list(other)
+    return NotImplemented
+
+  def __repr__(self) -> str:
+    return f"CheckOffDates({self._dates!r})"
+
+class CompactCheckOffDates(Sequence):
+  """
+  Sorted check-off dates packed into an integer array.
+
+  Values are converted to datetime objects lazily on access, so a loaded
+  history costs a few bytes per check-off instead of a datetime object each.
+  Subclasses pick the resolution; dates falling in the same unit are merged.
+  """
+  typecode = 'q'
+  _encode: Callable[[datetime], int]
+  _decode: Callable[[int], datetime]
+  _from_epoch_seconds: Callable[[int], int]
+
+  def __init__(self, dates: Iterable[datetime] = ()):
+    self._values = array(self.typecode, sorted({self._encode(date) for date in dates}))
+
+  @classmethod
+  def from_sorted(cls, dates: Iterable[datetime]) -> "CompactCheckOffDates":
+    """Build from dates already in ascending order, e.g. ORDER BY check_date rows."""
+    return cls.from_sorted_values(cls._encode(date) for date in dates)
+
+  @classmethod
+  def from_sorted_values(cls, values: Iterable[int]) -> "CompactCheckOffDates":
+    """Build from already encoded values in ascending order."""
+    instance = cls()
+    packed = instance._values
+    for value in values:
+      if not packed or value > packed[-1]:
+        packed.append(value)
+    return instance
+
+  @classmethod
+  def from_sorted_epoch_seconds(cls, seconds: Iterable[int]) -> "CompactCheckOffDates":
+    """Build from ascending epoch seconds, as stored in the database."""
+    return cls.from_sorted_values(map(cls._from_epoch_seconds, seconds))
+
+  def add(self, date: datetime) -> bool:
+    """Insert a date, returning False if its unit was already present."""
+    value = self._encode(date)
+    packed = self._values
+    if not packed or value > packed[-1]:
+      packed.append(value)
+      return True
+    index = bisect_left(packed, value)
+    if packed[index] == value:
+      return False
+    packed.insert(index, value)
+    return True
+
+  def latest(self) -> Optional[datetime]:
+    """Return the most recent date, or None if empty."""
+    return self._decode(self._values[-1]) if self._values else None
+
+  def count_since(self, start: datetime) -> int:
+    """Count dates greater than or equal to start."""
+    return len(self._values) - bisect_left(self._values, self._encode(start))
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self._decode(value) for value in self._values[index]]
+    return self._decode(self._values[index])
+
+  def __len__(self) -> int:
+    return len(self._values)
+
+  def __iter__(self) -> Iterator[datetime]:
+    return map(self._decode, self._values)
+
+  def __reversed__(self) -> Iterator[datetime]:
+    return map(self._decode, reversed(self._values))
+
+  def __contains__(self, date) -> bool:
+    if not isinstance(date, datetime):
+      return False
+    value = self._encode(date)
+    index = bisect_left(self._values, value)
+    return index < len(self._values) and self._values[index] == value
+
+  def __eq__(self, other) -> bool:
+    if isinstance(other, (list, tuple, Sequence)):
+      return list(self) == list(other)
+    return NotImplemented
+
+  def __repr__(self) -> str:
+    return f"{type(self).__name__}({self._values.tolist()!r})"
+
+class EpochDayDates(CompactCheckOffDates):
+  """Check-off dates stored as days since the epoch; time of day is dropped."""
+  typecode = 'i'
+  _encode = staticmethod(to_epoch_day)
+  _decode = staticmethod(from_epoch_day)
+  _from_epoch_seconds = staticmethod(lambda seconds: seconds // SECONDS_PER_DAY)
+
+class EpochSecondDates(CompactCheckOffDates):
+  """Check-off dates stored as whole seconds since the epoch."""
+  typecode = 'q'
+  _encode = staticmethod(to_epoch_seconds)
+  _decode = staticmethod(from_epoch_seconds)
+  _from_epoch_seconds = staticmethod(lambda seconds: seconds)
+
+CHECK_OFF_STORAGE = {
+  'dates': CheckOffDates,
+  'epoch_days': EpochDayDates,
+  'epoch_seconds': EpochSecondDates,
+}
 
 class Habit:
-  def __init__(self, task_name: str, periodicity: str, creation_date: Optional[datetime] = None):
+  __slots__ = ('task_name', 'periodicity', 'creation_date', 'check_off_dates')
+
+  def __init__(self, task_name: str, periodicity: str, creation_date: Optional[datetime] = None,
+               storage: str = 'dates'):
     """
     Initialize a new habit.
     
@@ -10,23 +195,33 @@ class Habit:
       task_name: The habit task description
       periodicity: Daily/Weekly/Monthly
       creation_date: When the habit was created (defaults to now)
+      storage: How check-offs are held in memory: 'dates' (datetime objects),
+        or the compact 'epoch_days' / 'epoch_seconds' integer arrays
     """
     self.task_name = task_name
     self.periodicity = periodicity.lower()
     self.creation_date = creation_date or datetime.now()
-    self.check_off_dates: List[datetime] = []
     
     # Validate periodicity
     valid_periodicities = ['daily', 'weekly', 'monthly']
     if self.periodicity not in valid_periodicities:
       raise ValueError(f"Periodicity must be one of: {valid_periodicities}")
 
+    if storage not in CHECK_OFF_STORAGE:
+      raise ValueError(f"Storage must be one of: {list(CHECK_OFF_STORAGE)}")
+    self.check_off_dates = CHECK_OFF_STORAGE[storage]()
+
+  def load_sorted_check_offs(self, dates: Iterable[datetime]) -> None:
+    """Replace the check-off history with dates already in ascending order."""
+    self.check_off_dates = type(self.check_off_dates).from_sorted(dates)
+
+  def load_sorted_epoch_seconds(self, seconds: Iterable[int]) -> None:
+    """Replace the check-off history with ascending epoch seconds."""
+    self.check_off_dates = type(self.check_off_dates).from_sorted_epoch_seconds(seconds)
+
   def check_off(self, date: Optional[datetime] = None) -> None:
     """Mark the habit as completed for a given date."""
-    check_date = date or datetime.now()
-    if check_date not in self.check_off_dates:
-      self.check_off_dates.append(check_date)
-      self.check_off_dates.sort()
+    self.check_off_dates.add(date or datetime.now())
 
   def calculate_streak(self) -> int:
     """Calculate the current streak."""
@@ -34,17 +229,17 @@ class Habit:
       return 0
 
     today = datetime.now()
-    sorted_dates = sorted(self.check_off_dates, reverse=True)
+    latest = self.check_off_dates.latest()
     
     # Check if the most recent check-off is within the expected interval
     if self.periodicity == 'daily':
-      if today - sorted_dates[0] > timedelta(days=1):
+      if today - latest > timedelta(days=1):
         return 0
     elif self.periodicity == 'weekly':
-      if today - sorted_dates[0] > timedelta(days=7):
+      if today - latest > timedelta(days=7):
         return 0
     else:  # monthly
-      if today - sorted_dates[0] > timedelta(days=30):
+      if today - latest > timedelta(days=30):
         return 0
 
     streak = 1
@@ -54,34 +249,45 @@ class Habit:
       'monthly': timedelta(days=30)
     }[self.periodicity]
 
-    # Count consecutive check-offs
-    for i in range(len(sorted_dates) - 1):
-      if sorted_dates[i] - sorted_dates[i + 1] <= expected_interval:
+    # Count consecutive check-offs, walking back from the most recent
+    newer = latest
+    for older in islice(reversed(self.check_off_dates), 1, None):
+      if newer - older <= expected_interval:
         streak += 1
+        newer = older
       else:
         break
 
     return streak
 
   def get_completion_rate(self) -> float:
-    """Calculate the completion rate as a percentage."""
-    if not self.check_off_dates:
-      return 0.0
+    """
+    Calculate the completion rate as a percentage of the check-offs in memory.
 
-    total_days = (datetime.now() - self.creation_date).days
-    if total_days == 0:
-      return 100.0 if self.check_off_dates else 0.0
+    A habit loaded from the database only holds its live check-offs; the
+    stored rate, archived check-offs included, is HabitStats.completion_rate
+    of HabitDatabase.get_stats.
+    """
+    return completion_rate(self.periodicity, self.creation_date, len(self.check_off_dates))
 
-    expected_completions = 0
-    if self.periodicity == 'daily':
-      expected_completions = total_days
-    elif self.periodicity == 'weekly':
-      expected_completions = total_days // 7
-    else:  # monthly
-      expected_completions = total_days // 30
+def completion_rate(periodicity: str, creation_date: datetime, completions: int) -> float:
+  """Calculate the completion rate as a percentage from a number of check-offs."""
+  if not completions:
+    return 0.0
+
+  total_days = (datetime.now() - creation_date).days
+  if total_days == 0:
+    return 100.0
+
+  expected_completions = 0
+  if periodicity == 'daily':
+    expected_completions = total_days
+  elif periodicity == 'weekly':
+    expected_completions = total_days // 7
+  else:  # monthly
+    expected_completions = total_days // 30
 
-    if expected_completions == 0:
-      return 100.0 if self.check_off_dates else 0.0
+  if expected_completions == 0:
+    return 100.0
 
-    actual_completions = len(self.check_off_dates)
-    return (actual_completions / expected_completions) * 100 
\ No newline at end of file
+  return (completions / expected_completions) * 100
@@ -0,0 +1,118 @@
+import sqlite3
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, NamedTuple, Optional
+from .dates import to_epoch_seconds
+from .habit import completion_rate
+
+# Maximum gap between two check-offs that keeps a streak going
+STREAK_INTERVALS = {
+  'daily': timedelta(days=1),
+  'weekly': timedelta(days=7),
+  'monthly': timedelta(days=30)
+}
+
+class HabitStats(NamedTuple):
+  """
+  Materialized streak and completion figures for one habit.
+
+  current_run is the length of the streak ending at the last check-off;
+  whether that streak is still alive depends on the current time, see
+  current_streak.
+  """
+  current_run: int = 0
+  longest_streak: int = 0
+  last_check_off: Optional[datetime] = None
+  total_count: int = 0
+
+  @classmethod
+  def from_dates(cls, dates: Iterable[datetime], periodicity: str,
+                 start: Optional["HabitStats"] = None) -> "HabitStats":
+    """
+    Compute stats from check-off dates in ascending order.
+
+    Args:
+      dates: Check-off dates, oldest first
+      periodicity: Periodicity of the habit
+      start: Stats of earlier, archived check-offs to continue from;
+        dates not newer than its last check-off only add to the count
+    """
+    stats = start or cls()
+    archived_until = stats.last_check_off
+    for date in dates:
+      if archived_until is not None and date <= archived_until:
+        stats = stats._replace(total_count=stats.total_count + 1)
+      else:
+        stats = stats.extend(date, periodicity)
+    return stats
+
+  def extend(self, date: datetime, periodicity: str) -> "HabitStats":
+    """
+    Return the stats after appending a check-off.
+
+    The date must be newer than last_check_off; older dates require
+    recomputing from the full history with from_dates.
+    """
+    if self.last_check_off is None:
+      return HabitStats(1, max(self.longest_streak, 1), date, self.total_count + 1)
+
+    if date - self.last_check_off <= STREAK_INTERVALS[periodicity]:
+      run = self.current_run + 1
+    else:
+      run = 1
+    return HabitStats(run, max(self.longest_streak, run), date, self.total_count + 1)
+
+  def current_streak(self, periodicity: str, now: Optional[datetime] = None) -> int:
+    """Return the current streak, or 0 if the last check-off is too old."""
+    if self.last_check_off is None:
+      return 0
+    now = now or datetime.now()
+    if now - self.last_check_off > STREAK_INTERVALS[periodicity]:
+      return 0
+    return self.current_run
+
+  def completion_rate(self, periodicity: str, creation_date: datetime) -> float:
+    """Calculate the completion rate as a percentage, as Habit.get_completion_rate does."""
+    return completion_rate(periodicity, creation_date, self.total_count)
+
+def save_habit_stats(conn: sqlite3.Connection, habit_id: int, stats: HabitStats) -> None:
+  """Insert or replace the stats row of a habit."""
+  last_check_off = stats.last_check_off
+  conn.execute("""
+    INSERT OR REPLACE INTO habit_stats
+      (habit_id, current_run, longest_streak, last_check_date, last_check_ts, total_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+  """, (
+    habit_id, stats.current_run, stats.longest_streak,
+    last_check_off.isoformat() if last_check_off else None,
+    to_epoch_seconds(last_check_off) if last_check_off else None,
+    stats.total_count
+  ))
+
+def rebuild_habit_stats(conn: sqlite3.Connection, habit_id: Optional[int] = None,
+                        archived: Optional[Dict[int, HabitStats]] = None) -> None:
+  """
+  Recompute stats rows from the check-off history.
+
+  Args:
+    conn: Connection, expected to be inside a transaction
+    habit_id: Only rebuild this habit (default: all habits)
+    archived: Stats of archived check-offs by habit ID, which the
+      history continues from, see src.archive
+  """
+  archived = archived or {}
+  where = "WHERE h.id = ?" if habit_id is not None else ""
+  params = (habit_id,) if habit_id is not None else ()
+  if habit_id is None:
+    conn.execute("DELETE FROM habit_stats")
+
+  rows = conn.execute(f"""
+    SELECT h.id, h.periodicity, c.check_date
+    FROM habits h LEFT JOIN check_offs c ON c.habit_id = h.id
+    {where}
+    ORDER BY h.id, c.check_date
+  """, params)
+  for (current_id, periodicity), group in groupby(rows, key=lambda row: (row[0], row[1])):
+    dates = (datetime.fromisoformat(row[2]) for row in group if row[2] is not None)
+    save_habit_stats(conn, current_id,
+                     HabitStats.from_dates(dates, periodicity, archived.get(current_id)))
@@ -0,0 +1,184 @@
+"""
+Group-commit writer for high-rate check-off ingestion.
+
+BufferedCheckOffWriter queues check-offs and a background thread writes
+them with HabitDatabase.save_check_offs_batch, one transaction per batch.
+A batch is committed as soon as it holds batch_size check-offs or
+flush_interval seconds after its first check-off arrived, whichever comes
+first, so the cost of a commit (and its fsync) is shared by the whole
+batch instead of being paid per row.
+
+The queue is bounded: when the database cannot keep up, write() blocks
+until there is room again, which slows producers down instead of letting
+memory grow without limit.
+
+The durability mode decides when write() returns:
+
+- 'queued': as soon as the check-off is queued. A crash loses the queued
+  check-offs, at most queue_size of them.
+- 'committed': once the batch holding the check-off is committed. A
+  batch is then committed as soon as the queue runs empty, and the
+  writers arriving during a commit share the next one, so throughput
+  grows with the number of writing threads.
+
+How durable a commit is on disk is set by the database's synchronous
+level, see HabitDatabase.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import List, Optional
+from .db_manager import HabitDatabase
+
+DURABILITY_MODES = ['queued', 'committed']
+
+class BufferedCheckOffWriter:
+  def __init__(self, db: HabitDatabase, batch_size: int = 1000, flush_interval: float = 0.05,
+               queue_size: int = 10_000, durability: str = 'queued'):
+    """
+    Start a writer and its background flushing thread.
+
+    Args:
+      db: Pooled database, whose writer connection may be used from the
+        flushing thread
+      batch_size: Check-offs committed per transaction at most
+      flush_interval: Seconds a check-off may wait for its batch to fill in
+        'queued' mode
+      queue_size: Check-offs queued at most before write() blocks
+      durability: One of DURABILITY_MODES
+    Raises:
+      ValueError: For invalid sizes or durability mode, or a database
+        that is not pooled
+    """
+    if durability not in DURABILITY_MODES:
+      raise ValueError(f"Durability must be one of: {DURABILITY_MODES}")
+    if batch_size < 1 or queue_size < 1:
+      raise ValueError("Batch and queue sizes must be positive")
+    if flush_interval < 0:
+      raise ValueError("Flush interval must not be negative")
+    if not db.pooled:
+      raise ValueError("The writer needs a pooled database to write from its own thread")
+
+    self.db = db
+    self.batch_size = batch_size
+    self.flush_interval = flush_interval
+    self.durability = durability
+    self.written = 0
+    self.batches = 0
+    self._queue: queue.Queue = queue.Queue(queue_size)
+    self._error: Optional[BaseException] = None
+    self._closed = False
+    self._thread = threading.Thread(target=self._run, name='habits-writer', daemon=True)
+    self._thread.start()
+
+  def write(self, habit_id: int, check_date: Optional[datetime] = None,
+            timeout: Optional[float] = None) -> None:
+    """
+    Queue a check-off, blocking while the queue is full.
+
+    Args:
+      habit_id: Habit to check off
+      check_date: Completion date (default: now)
+      timeout: Seconds to wait for room in the queue (default: forever)
+    Raises:
+      queue.Full: If the queue stayed full for timeout seconds
+      RuntimeError: If the writer is closed or a previous batch failed
+    """
+    self._check()
+    future = Future() if self.durability == 'committed' else None
+    self._queue.put((habit_id, check_date or datetime.now(), future), timeout=timeout)
+    if future is not None:
+      future.result()
+
+  def flush(self) -> None:
+    """
+    Commit every check-off queued so far and wait for it.
+
+    Raises:
+      RuntimeError: If the writer is closed or a batch failed
+    """
+    self._check()
+    done = Future()
+    self._queue.put(done)
+    done.result()
+    self._check()
+
+  def close(self) -> None:
+    """
+    Commit the queued check-offs and stop the flushing thread.
+
+    Raises:
+      RuntimeError: If a batch failed since the last check
+    """
+    if self._closed:
+      return
+    self._closed = True
+    self._queue.put(None)
+    self._thread.join()
+    if self._error is not None:
+      raise RuntimeError("Writing check-offs failed") from self._error
+
+  def __enter__(self) -> "BufferedCheckOffWriter":
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    self.close()
+
+  def _check(self) -> None:
+    if self._closed:
+      raise RuntimeError("The writer is closed")
+    if self._error is not None:
+      raise RuntimeError("Writing check-offs failed") from self._error
+
+  def _run(self) -> None:
+    """Flushing thread: gather batches from the queue and commit them."""
+    stopping = False
+    while not stopping:
+      item = self._queue.get()
+      batch: List[tuple] = []
+      markers: List[Future] = []
+      deadline = time.monotonic() + self.flush_interval
+      # Markers (flush requests and the stop sentinel) end the batch early
+      while True:
+        if item is None:
+          stopping = True
+          break
+        if isinstance(item, Future):
+          markers.append(item)
+          break
+        batch.append(item)
+        if len(batch) >= self.batch_size:
+          break
+        try:
+          if self.durability == 'committed':
+            # Writers block until their commit, so an empty queue means
+            # nobody else is about to join this batch
+            item = self._queue.get_nowait()
+          else:
+            item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+          break
+
+      self._commit(batch)
+      for marker in markers:
+        marker.set_result(None)
+
+  def _commit(self, batch: List[tuple]) -> None:
+    """Write one batch, passing the outcome to the waiting writers."""
+    if not batch:
+      return
+    try:
+      self.db.save_check_offs_batch((habit_id, check_date) for habit_id, check_date, _ in batch)
+    except Exception as e:
+      self._error = e
+      for _, _, future in batch:
+        if future is not None:
+          future.set_exception(e)
+      return
+    self.written += len(batch)
+    self.batches += 1
+    for _, _, future in batch:
+      if future is not None:
+        future.set_result(None)
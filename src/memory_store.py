@@ -0,0 +1,358 @@
+"""
+Pure Python habit store, see src.storage.
+
+Habits live in a dictionary keyed by ID next to a sorted list of the IDs,
+so keyset pages are a binary search away. Each habit's check-offs are
+kept as a sorted list of datetimes with a parallel array of epoch
+seconds, which answers date ranges, day counts and the numpy engine's
+column reads by bisection. Stats are maintained on every write exactly
+like the habit_stats table of HabitDatabase.
+
+Nothing touches the disk, which makes the store suited to tests,
+benchmarks and ephemeral workloads. Like a default HabitDatabase, a store
+must not be shared between threads.
+"""
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from .bitmaps import PeriodBitmap, period_of_day
+from .dates import SECONDS_PER_DAY, to_epoch_seconds
+from .habit import Habit
+from .habit_stats import HabitStats
+from .profiling import Profiler
+
+class MemoryHabitStore:
+  def __init__(self):
+    """Create an empty store."""
+    # Present for HabitStore compatibility; nothing is ever written to it
+    self.db_path = ':memory:'
+    self.profiler: Optional[Profiler] = None
+    self._habits: Dict[int, Habit] = {}
+    self._ids: List[int] = []
+    self._next_id = 1
+    self._dates: Dict[int, List[datetime]] = {}
+    self._seconds: Dict[int, array] = {}
+    self._stats: Dict[int, HabitStats] = {}
+    self._changes = 0
+
+  def _add_habit(self, habit: Habit, habit_id: Optional[int] = None) -> int:
+    """Store a copy of a habit without its history and return its ID."""
+    if habit_id is None:
+      habit_id = self._next_id
+    self._next_id = max(self._next_id, habit_id + 1)
+    self._habits[habit_id] = Habit(habit.task_name, habit.periodicity, habit.creation_date)
+    insort(self._ids, habit_id)
+    self._dates[habit_id] = []
+    self._seconds[habit_id] = array('q')
+    self._stats[habit_id] = HabitStats()
+    return habit_id
+
+  def _insert(self, habit_id: int, check_date: datetime) -> bool:
+    """Insert a check-off into the indexes, returning False for duplicates."""
+    dates = self._dates[habit_id]
+    index = bisect_left(dates, check_date)
+    if index < len(dates) and dates[index] == check_date:
+      return False
+    dates.insert(index, check_date)
+    self._seconds[habit_id].insert(index, to_epoch_seconds(check_date))
+    return True
+
+  def _refresh_stats(self, habit_id: int, new_dates: List[datetime]) -> None:
+    """Fold inserted dates into the stats, replaying the history after backfills."""
+    habit = self._habits[habit_id]
+    stats = self._stats[habit_id]
+    if stats.last_check_off is not None and new_dates[0] <= stats.last_check_off:
+      self._stats[habit_id] = HabitStats.from_dates(self._dates[habit_id], habit.periodicity)
+      return
+    for check_date in new_dates:
+      stats = stats.extend(check_date, habit.periodicity)
+    self._stats[habit_id] = stats
+
+  def _copy(self, habit_id: int, storage: str = 'dates', load_history: bool = True) -> Habit:
+    """Return a new Habit instance, so callers cannot modify the stored one."""
+    stored = self._habits[habit_id]
+    habit = Habit(stored.task_name, stored.periodicity, stored.creation_date, storage)
+    if load_history:
+      habit.load_sorted_check_offs(self._dates[habit_id])
+    return habit
+
+  def _id_range(self, after_id: Optional[int], limit: Optional[int],
+                periodicity: Optional[str], batch_size: int = 1) -> Iterator[int]:
+    """Yield habit IDs in order after after_id, as HabitDatabase pages them."""
+    if batch_size < 1:
+      raise ValueError("Batch size must be positive")
+    start = 0 if after_id is None else bisect_right(self._ids, after_id)
+    ids = (
+      habit_id for habit_id in islice(self._ids, start, None)
+      if not periodicity or self._habits[habit_id].periodicity == periodicity.lower()
+    )
+    return islice(ids, limit)
+
+  def save_habit(self, habit: Habit) -> int:
+    """Save a habit without its check-offs and return its ID."""
+    self._changes += 1
+    return self._add_habit(habit)
+
+  def save_habits_bulk(self, habits: Iterable[Habit], batch_size: int = 50_000) -> tuple[int, int]:
+    """
+    Save new habits together with their check-off history.
+
+    Returns:
+      Tuple of (habits_added, check_offs_added)
+    """
+    habits_added = 0
+    check_offs_added = 0
+    for habit in habits:
+      habit_id = self._add_habit(habit)
+      dates = sorted(habit.check_off_dates)
+      self._dates[habit_id] = dates
+      self._seconds[habit_id] = array('q', map(to_epoch_seconds, dates))
+      self._stats[habit_id] = HabitStats.from_dates(dates, habit.periodicity)
+      habits_added += 1
+      check_offs_added += len(dates)
+    self._changes += 1
+    return habits_added, check_offs_added
+
+  def load_habit(self, habit_id: int, storage: str = 'dates',
+                 load_history: bool = True) -> Optional[Habit]:
+    """Return a habit with its check-offs, or None if it doesn't exist."""
+    if habit_id not in self._habits:
+      return None
+    return self._copy(habit_id, storage, load_history)
+
+  def delete_habit(self, habit_id: int) -> None:
+    """Delete a habit and its check-offs."""
+    if self._habits.pop(habit_id, None) is None:
+      return
+    self._ids.pop(bisect_left(self._ids, habit_id))
+    del self._dates[habit_id], self._seconds[habit_id], self._stats[habit_id]
+    self._changes += 1
+
+  def save_check_off(self, habit_id: int, check_date: datetime) -> None:
+    """Save a check-off date for a habit; unknown habits are ignored."""
+    if habit_id in self._habits and self._insert(habit_id, check_date):
+      self._refresh_stats(habit_id, [check_date])
+      self._changes += 1
+
+  def save_check_offs_bulk(self, habit_ids: Iterable[int], dates: Iterable[datetime]) -> int:
+    """
+    Check off every given habit on every given date.
+
+    Returns:
+      Number of check-offs added (existing ones are skipped)
+    Raises:
+      ValueError: If any habit does not exist; nothing is written then
+    """
+    habit_ids = sorted(set(habit_ids))
+    dates = sorted(set(dates))
+    if not habit_ids or not dates:
+      return 0
+    missing = [habit_id for habit_id in habit_ids if habit_id not in self._habits]
+    if missing:
+      raise ValueError(f"Habits not found: {missing}")
+
+    added = 0
+    for habit_id in habit_ids:
+      inserted = [check_date for check_date in dates if self._insert(habit_id, check_date)]
+      if inserted:
+        self._refresh_stats(habit_id, inserted)
+        added += len(inserted)
+    self._changes += 1
+    return added
+
+  def save_check_offs_batch(self, check_offs: Iterable[tuple[int, datetime]]) -> int:
+    """
+    Save (habit_id, check_date) pairs, like save_check_off for each.
+
+    Returns:
+      Number of check-offs added (existing ones are skipped)
+    """
+    dates_by_habit: Dict[int, set] = {}
+    for habit_id, check_date in check_offs:
+      dates_by_habit.setdefault(habit_id, set()).add(check_date)
+
+    added = 0
+    for habit_id, dates in dates_by_habit.items():
+      if habit_id not in self._habits:
+        continue
+      inserted = [check_date for check_date in sorted(dates) if self._insert(habit_id, check_date)]
+      if inserted:
+        self._refresh_stats(habit_id, inserted)
+        added += len(inserted)
+    self._changes += 1
+    return added
+
+  def delete_check_off(self, habit_id: int, check_date: datetime) -> bool:
+    """Remove a check-off of a habit, returning True if it existed."""
+    dates = self._dates.get(habit_id, [])
+    index = bisect_left(dates, check_date)
+    if index == len(dates) or dates[index] != check_date:
+      return False
+    del dates[index], self._seconds[habit_id][index]
+    self._stats[habit_id] = HabitStats.from_dates(dates, self._habits[habit_id].periodicity)
+    self._changes += 1
+    return True
+
+  def get_check_offs(self, habit_id: int, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, limit: Optional[int] = None,
+                     descending: bool = False) -> List[datetime]:
+    """Get the check-off dates of a habit in [since, until), see HabitDatabase.get_check_offs."""
+    dates = self._dates.get(habit_id, [])
+    start = 0 if since is None else bisect_left(dates, since)
+    end = len(dates) if until is None else bisect_left(dates, until)
+    if descending:
+      stop = start if limit is None else max(start, end - limit)
+      return dates[stop:end][::-1]
+    stop = end if limit is None else min(end, start + limit)
+    return dates[start:stop]
+
+  def get_check_offs_many(self, habit_ids: Iterable[int], since: Optional[datetime] = None,
+                          until: Optional[datetime] = None, limit: Optional[int] = None,
+                          descending: bool = False) -> Dict[int, List[datetime]]:
+    """Get the check-off dates of several habits, see HabitDatabase.get_check_offs_many."""
+    return {
+      habit_id: self.get_check_offs(habit_id, since, until, limit, descending)
+      for habit_id in habit_ids
+    }
+
+  def get_check_off_seconds(self, first_id: Optional[int] = None,
+                            last_id: Optional[int] = None) -> Iterator[tuple[int, int]]:
+    """Return (habit_id, epoch_seconds) tuples ordered by habit and date."""
+    start = 0 if first_id is None else bisect_left(self._ids, first_id)
+    end = len(self._ids) if last_id is None else bisect_right(self._ids, last_id)
+    return (
+      (habit_id, seconds)
+      for habit_id in self._ids[start:end]
+      for seconds in self._seconds[habit_id]
+    )
+
+  def count_check_offs(self, start_day: int, end_day: int,
+                       habit_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """
+    Count check-offs per habit between two epoch days, both inclusive.
+
+    Returns:
+      Dictionary mapping habit ID to its count, without habits having none
+    """
+    start, end = start_day * SECONDS_PER_DAY, (end_day + 1) * SECONDS_PER_DAY
+    counts = {}
+    for habit_id in self._ids if habit_ids is None else habit_ids:
+      seconds = self._seconds.get(habit_id)
+      if seconds:
+        count = bisect_left(seconds, end) - bisect_left(seconds, start)
+        if count:
+          counts[habit_id] = count
+    return counts
+
+  def get_period_bitmaps(self, habit_ids: Optional[Iterable[int]] = None,
+                         periodicity: Optional[str] = None) -> Dict[int, PeriodBitmap]:
+    """Return period bitmaps, built from the check-offs on each call, see HabitDatabase."""
+    bitmaps = {}
+    for habit_id in self._ids if habit_ids is None else habit_ids:
+      habit = self._habits.get(habit_id)
+      if habit is None or not self._seconds[habit_id]:
+        continue
+      if periodicity and habit.periodicity != periodicity.lower():
+        continue
+      bitmaps[habit_id] = PeriodBitmap.from_periods(
+        period_of_day(seconds // SECONDS_PER_DAY, habit.periodicity)
+        for seconds in self._seconds[habit_id]
+      )
+    return bitmaps
+
+  def get_archived_stats(self) -> Dict[int, HabitStats]:
+    """Return an empty dictionary, as check-offs are never archived from memory."""
+    return {}
+
+  def get_stats(self, habit_id: int) -> Optional[HabitStats]:
+    """Return the stats of a habit, or None if it doesn't exist."""
+    return self._stats.get(habit_id)
+
+  def get_all_stats(self) -> List[tuple[int, Habit, HabitStats]]:
+    """Return every habit, without history, with its stats."""
+    return list(self.iter_stats())
+
+  def iter_stats(self, batch_size: int = 1000, after_id: Optional[int] = None,
+                 limit: Optional[int] = None,
+                 periodicity: Optional[str] = None) -> Iterator[tuple[int, Habit, HabitStats]]:
+    """Stream habits with their stats in ID order, see HabitDatabase.iter_stats."""
+    for habit_id in self._id_range(after_id, limit, periodicity, batch_size):
+      yield habit_id, self._copy(habit_id, load_history=False), self._stats[habit_id]
+
+  def iter_habits(self, batch_size: int = 1000, after_id: Optional[int] = None,
+                  limit: Optional[int] = None, periodicity: Optional[str] = None,
+                  load_history: bool = False, storage: str = 'dates') -> Iterator[tuple[int, Habit]]:
+    """Stream habits in ID order, see HabitDatabase.iter_habits."""
+    for habit_id in self._id_range(after_id, limit, periodicity, batch_size):
+      yield habit_id, self._copy(habit_id, storage, load_history)
+
+  def get_all_habits(self, storage: str = 'dates',
+                     load_history: bool = True) -> List[tuple[int, Habit]]:
+    """Return all habits with their IDs."""
+    return [(habit_id, self._copy(habit_id, storage, load_history)) for habit_id in self._ids]
+
+  def get_newest_habit_ids(self) -> Dict[str, int]:
+    """Return the ID of the most recently created habit of each periodicity."""
+    newest = {}
+    for habit_id in self._ids:
+      newest[self._habits[habit_id].periodicity] = habit_id
+    return newest
+
+  def rebuild_stats(self) -> None:
+    """Recompute the stats of every habit from its check-off history."""
+    for habit_id, habit in self._habits.items():
+      self._stats[habit_id] = HabitStats.from_dates(self._dates[habit_id], habit.periodicity)
+    self._changes += 1
+
+  def import_rows(self, rows: Iterable[Dict[str, str]], batch_size: int = 10_000) -> tuple[int, int]:
+    """
+    Import habits and check-offs from a stream of rows, see HabitDatabase.import_rows.
+
+    Returns:
+      Tuple of (habits_added, check_offs_added)
+    """
+    habits_added = 0
+    check_offs_added = 0
+    touched = set()
+    try:
+      for row in rows:
+        habit_id = int(row['habit_id'])
+        if habit_id not in self._habits:
+          # Validates the periodicity
+          habit = Habit(row['task_name'], row['periodicity'], datetime.fromisoformat(row['creation_date']))
+          self._add_habit(habit, habit_id)
+          habits_added += 1
+        if row.get('check_date') and self._insert(habit_id, datetime.fromisoformat(row['check_date'])):
+          check_offs_added += 1
+          touched.add(habit_id)
+    finally:
+      for habit_id in touched:
+        self._stats[habit_id] = HabitStats.from_dates(self._dates[habit_id], self._habits[habit_id].periodicity)
+      self._changes += 1
+    return habits_added, check_offs_added
+
+  def iter_export_rows(self) -> Iterator[tuple]:
+    """Stream every habit and check-off as export rows, see HabitDatabase.iter_export_rows."""
+    for habit_id in self._ids:
+      habit = self._habits[habit_id]
+      fields = (habit_id, habit.task_name, habit.periodicity, habit.creation_date.isoformat())
+      dates = self._dates[habit_id]
+      if not dates:
+        yield (*fields, None)
+      for check_date in dates:
+        yield (*fields, check_date.isoformat())
+
+  def get_data_version(self) -> tuple[int, int]:
+    """Return a token that changes with every write, see HabitDatabase.get_data_version."""
+    return self._changes, 0
+
+  def enable_profiling(self, profiler: Optional[Profiler] = None) -> Profiler:
+    """Record analytics sections from now on; there are no statements to record."""
+    if profiler is not None or self.profiler is None:
+      self.profiler = profiler or Profiler()
+    return self.profiler
+
+  def close(self) -> None:
+    """Nothing to release; present for HabitStore compatibility."""
@@ -0,0 +1,180 @@
+"""
+Versioned schema migrations for the habit database.
+
+The schema version is stored in PRAGMA user_version. Each migration moves
+the schema forward by exactly one version and runs in its own transaction,
+so an interrupted upgrade leaves the database at the last completed version.
+"""
+import sqlite3
+from typing import Callable, List
+from .habit_stats import rebuild_habit_stats
+from .bitmaps import rebuild_bitmaps
+from .rollups import rebuild_rollups
+
+def _create_base_tables(conn: sqlite3.Connection) -> None:
+  """Version 1: habits and check-offs with ISO text dates."""
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS habits (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      task_name TEXT NOT NULL,
+      periodicity TEXT NOT NULL,
+      creation_date TEXT NOT NULL
+    )
+  """)
+
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS check_offs (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      habit_id INTEGER NOT NULL,
+      check_date TEXT NOT NULL,
+      FOREIGN KEY (habit_id) REFERENCES habits (id),
+      UNIQUE(habit_id, check_date)
+    )
+  """)
+
+def _add_integer_dates(conn: sqlite3.Connection) -> None:
+  """
+  Version 2: integer epoch columns and a covering index on check-offs.
+
+  check_ts holds whole seconds since the epoch and check_day the day
+  number, both derived from the naive ISO text which SQLite reads as UTC.
+  """
+  conn.execute("ALTER TABLE habits ADD COLUMN creation_ts INTEGER")
+  conn.execute("ALTER TABLE check_offs ADD COLUMN check_ts INTEGER")
+  conn.execute("ALTER TABLE check_offs ADD COLUMN check_day INTEGER")
+
+  # Backfill rows written before this version
+  conn.execute("""
+    UPDATE habits
+    SET creation_ts = CAST(strftime('%s', creation_date) AS INTEGER)
+  """)
+  conn.execute("""
+    UPDATE check_offs
+    SET check_ts = CAST(strftime('%s', check_date) AS INTEGER)
+  """)
+  conn.execute("UPDATE check_offs SET check_day = check_ts / 86400")
+
+  conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_check_offs_habit_day
+    ON check_offs (habit_id, check_day, check_ts)
+  """)
+
+def _add_habit_stats(conn: sqlite3.Connection) -> None:
+  """Version 3: per-habit materialized streak and completion stats."""
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS habit_stats (
+      habit_id INTEGER PRIMARY KEY,
+      current_run INTEGER NOT NULL DEFAULT 0,
+      longest_streak INTEGER NOT NULL DEFAULT 0,
+      last_check_date TEXT,
+      last_check_ts INTEGER,
+      total_count INTEGER NOT NULL DEFAULT 0,
+      FOREIGN KEY (habit_id) REFERENCES habits (id)
+    )
+  """)
+  rebuild_habit_stats(conn)
+
+def _add_rollups(conn: sqlite3.Connection) -> None:
+  """Version 4: per-habit check-off counts by day, ISO week and month."""
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS check_off_rollups (
+      habit_id INTEGER NOT NULL,
+      bucket_type TEXT NOT NULL,
+      bucket INTEGER NOT NULL,
+      count INTEGER NOT NULL,
+      PRIMARY KEY (bucket_type, bucket, habit_id)
+    ) WITHOUT ROWID
+  """)
+  # Bucket ranges are scanned for all habits, single habits are looked up here
+  conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_check_off_rollups_habit
+    ON check_off_rollups (habit_id, bucket_type, bucket)
+  """)
+  rebuild_rollups(conn)
+
+def _add_change_counter(conn: sqlite3.Connection) -> None:
+  """Version 5: a counter bumped by every write transaction of HabitDatabase."""
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS data_changes (
+      id INTEGER PRIMARY KEY CHECK (id = 1),
+      counter INTEGER NOT NULL
+    )
+  """)
+  conn.execute("INSERT OR IGNORE INTO data_changes (id, counter) VALUES (1, 0)")
+
+def _add_bitmaps(conn: sqlite3.Connection) -> None:
+  """Version 6: per-habit bitmaps of completed days, ISO weeks or months."""
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS habit_bitmaps (
+      habit_id INTEGER PRIMARY KEY,
+      base INTEGER NOT NULL,
+      bits BLOB NOT NULL,
+      FOREIGN KEY (habit_id) REFERENCES habits (id)
+    )
+  """)
+  rebuild_bitmaps(conn)
+
+def _add_archive(conn: sqlite3.Connection) -> None:
+  """
+  Version 7: summaries of check-offs moved to an archive database.
+
+  archived_history holds, per habit, the habit_stats figures and bitmap
+  of its archived check-offs; archive_state the cutoff day and the
+  archive file of the last run.
+  """
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS archived_history (
+      habit_id INTEGER PRIMARY KEY,
+      current_run INTEGER NOT NULL DEFAULT 0,
+      longest_streak INTEGER NOT NULL DEFAULT 0,
+      last_check_date TEXT,
+      last_check_ts INTEGER,
+      total_count INTEGER NOT NULL DEFAULT 0,
+      bitmap_base INTEGER,
+      bitmap_bits BLOB,
+      FOREIGN KEY (habit_id) REFERENCES habits (id)
+    )
+  """)
+  conn.execute("""
+    CREATE TABLE IF NOT EXISTS archive_state (
+      id INTEGER PRIMARY KEY CHECK (id = 1),
+      cutoff_day INTEGER NOT NULL,
+      path TEXT NOT NULL
+    )
+  """)
+
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+  _create_base_tables,
+  _add_integer_dates,
+  _add_habit_stats,
+  _add_rollups,
+  _add_change_counter,
+  _add_bitmaps,
+  _add_archive,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_version(conn: sqlite3.Connection) -> int:
+  """Return the schema version recorded in the database."""
+  return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> int:
+  """
+  Apply all pending migrations.
+
+  Returns:
+    The schema version after migrating
+  """
+  version = get_version(conn)
+  if version > SCHEMA_VERSION:
+    raise RuntimeError(
+      f"Database schema version {version} is newer than supported version {SCHEMA_VERSION}"
+    )
+
+  for index in range(version, SCHEMA_VERSION):
+    with conn:
+      conn.execute("BEGIN")
+      MIGRATIONS[index](conn)
+      conn.execute(f"PRAGMA user_version = {index + 1}")
+  return SCHEMA_VERSION
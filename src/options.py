@@ -0,0 +1,23 @@
+"""
+Choices and limits of command line options.
+
+The CLI builds its options from these before any command runs, so this
+module imports nothing: loading it must not pull in the storage and
+analytics modules that only the selected command needs.
+"""
+
+# Engines computing streaks and completion summaries
+ENGINES = ['python', 'numpy', 'sql']
+
+# File formats of import and export
+FORMATS = ['csv', 'ndjson']
+
+# Storage backends, see src.storage
+BACKENDS = ['sqlite', 'memory']
+
+# Rankings of habit pairs, see src.correlations
+CORRELATION_SORTS = ['lift', 'correlation', 'both']
+
+# Days of check-offs always kept live, covering the longest default
+# completion window (three 30-day months) of HabitAnalytics
+MIN_RETENTION_DAYS = 90
@@ -0,0 +1,74 @@
+"""
+Process-pool execution of streak analytics over habit shards.
+
+Habits are split into contiguous ID ranges holding about the same number
+of habits. Each worker process opens the database read-only, computes the
+longest and current streaks of its shard with the numpy or sql engine, and
+sends them back as compact integer arrays. The results are concatenated in
+ID order. Every worker has its own connection, so the SQLite reads and the
+computations run on separate cores.
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from typing import List, NamedTuple, Tuple
+from .dates import to_epoch_seconds
+
+class Shard(NamedTuple):
+  """Inclusive range of habit IDs."""
+  first_id: int
+  last_id: int
+
+def plan_shards(db, count: int) -> List[Shard]:
+  """Split the habit IDs into at most count ranges of similar size."""
+  cursor = db.conn.execute("""
+    SELECT MIN(id), MAX(id) FROM (
+      SELECT id, NTILE(?) OVER (ORDER BY id) AS shard FROM habits
+    )
+    GROUP BY shard
+    ORDER BY shard
+  """, (count,))
+  return [Shard(*row) for row in cursor]
+
+def _shard_streaks(db_path: str, engine: str, shard: Shard,
+                   now: datetime) -> Tuple[array, array, array]:
+  """Worker: compute (habit_ids, longest, current) arrays for one shard."""
+  from .db_manager import HabitDatabase
+  db = HabitDatabase(db_path, read_only=True)
+  try:
+    if engine == 'numpy':
+      from . import vectorized
+      _, arrays = vectorized.load_check_off_arrays(db, *shard)
+      longest, current = arrays.streaks(to_epoch_seconds(now))
+      return (array('q', arrays.habit_ids.tolist()), array('q', longest.tolist()),
+              array('q', current.tolist()))
+
+    from . import sql_analytics
+    rows = sql_analytics.get_streaks(db, now, *shard)
+    return tuple(array('q', column) for column in zip(*rows)) or (array('q'),) * 3
+  finally:
+    db.close()
+
+def compute_streaks(db, engine: str, workers: int, now: datetime) -> List[Tuple[int, int, int]]:
+  """
+  Compute the longest and current streak of every habit in worker processes.
+
+  Args:
+    db: Database opened from a file, which the workers open read-only
+    engine: 'numpy' or 'sql', the engine each worker runs on its shard
+    workers: Number of worker processes, and of shards
+    now: Time the current streaks are measured at
+  Returns:
+    List of (habit_id, longest_streak, current_streak) ordered by habit ID
+  """
+  shards = plan_shards(db, workers)
+  if not shards:
+    return []
+
+  streaks = []
+  with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+    results = pool.map(_shard_streaks, repeat(db.db_path), repeat(engine), shards, repeat(now))
+    for habit_ids, longest, current in results:
+      streaks.extend(zip(habit_ids, longest, current))
+  return streaks
@@ -0,0 +1,198 @@
+"""
+Query and section instrumentation for HabitDatabase and HabitAnalytics.
+
+A Profiler collects, per distinct SQL statement, how often it ran, the
+time spent executing it and fetching its rows, and the number of rows
+fetched. Analytics methods are timed as named sections. Profiling is
+enabled per database with HabitDatabase.enable_profiling, which wraps the
+connection in a ProfiledConnection.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List
+
+class Profiler:
+  def __init__(self):
+    # Normalized SQL -> [calls, seconds, rows]
+    self.queries: Dict[str, List] = {}
+    # Section name -> [calls, seconds]
+    self.sections: Dict[str, List] = {}
+    # Pooled databases report from several threads
+    self._lock = threading.Lock()
+
+  def record_query(self, sql: str, seconds: float = 0.0, rows: int = 0, calls: int = 0) -> None:
+    """Add execution or fetch figures to a statement's totals."""
+    sql = " ".join(sql.split())
+    with self._lock:
+      entry = self.queries.setdefault(sql, [0, 0.0, 0])
+      entry[0] += calls
+      entry[1] += seconds
+      entry[2] += rows
+
+  @contextmanager
+  def section(self, name: str) -> Iterator[None]:
+    """Time a named block of code."""
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      seconds = time.perf_counter() - started
+      with self._lock:
+        entry = self.sections.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+  @property
+  def statement_count(self) -> int:
+    return sum(calls for calls, _, _ in self.queries.values())
+
+  def to_dict(self) -> Dict[str, Any]:
+    """Return the collected figures in a JSON-serializable form."""
+    return {
+      'statement_count': self.statement_count,
+      'query_seconds': sum(seconds for _, seconds, _ in self.queries.values()),
+      'queries': [
+        {'sql': sql, 'calls': calls, 'seconds': seconds, 'rows': rows}
+        for sql, (calls, seconds, rows) in self._sorted(self.queries)
+      ],
+      'sections': [
+        {'name': name, 'calls': calls, 'seconds': seconds}
+        for name, (calls, seconds) in self._sorted(self.sections)
+      ],
+    }
+
+  def format_table(self, width: int = 60) -> str:
+    """Return a human-readable summary, slowest statements first."""
+    lines = [
+      f"\nSQL statements: {self.statement_count}",
+      "-" * (width + 36),
+      f"{'Statement':{width}} {'Calls':>7} {'Total ms':>10} {'Avg ms':>8} {'Rows':>8}",
+      "-" * (width + 36),
+    ]
+    for sql, (calls, seconds, rows) in self._sorted(self.queries):
+      statement = sql if len(sql) <= width else sql[:width - 3] + "..."
+      average = seconds / calls * 1000 if calls else 0.0
+      lines.append(f"{statement:{width}} {calls:>7} {seconds * 1000:>10.2f} {average:>8.3f} {rows:>8}")
+
+    if self.sections:
+      lines += [
+        "",
+        f"{'Section':{width}} {'Calls':>7} {'Total ms':>10}",
+        "-" * (width + 19),
+      ]
+      for name, (calls, seconds) in self._sorted(self.sections):
+        lines.append(f"{name:{width}} {calls:>7} {seconds * 1000:>10.2f}")
+    return "\n".join(lines)
+
+  @staticmethod
+  def _sorted(entries: Dict[str, List]) -> List:
+    return sorted(entries.items(), key=lambda item: item[1][1], reverse=True)
+
+class ProfiledCursor:
+  """Cursor wrapper that reports execution and fetch figures to a Profiler."""
+
+  def __init__(self, cursor: sqlite3.Cursor, profiler: Profiler):
+    object.__setattr__(self, '_cursor', cursor)
+    object.__setattr__(self, '_profiler', profiler)
+    object.__setattr__(self, '_sql', None)
+
+  def _run(self, method: Callable, sql: str, *args) -> "ProfiledCursor":
+    object.__setattr__(self, '_sql', sql)
+    started = time.perf_counter()
+    try:
+      method(sql, *args)
+    finally:
+      self._profiler.record_query(sql, time.perf_counter() - started, calls=1)
+    return self
+
+  def execute(self, sql: str, parameters=()) -> "ProfiledCursor":
+    return self._run(self._cursor.execute, sql, parameters)
+
+  def executemany(self, sql: str, seq_of_parameters) -> "ProfiledCursor":
+    return self._run(self._cursor.executemany, sql, seq_of_parameters)
+
+  def _fetched(self, started: float, rows: int) -> None:
+    if self._sql is not None:
+      self._profiler.record_query(self._sql, time.perf_counter() - started, rows)
+
+  def fetchone(self):
+    started = time.perf_counter()
+    row = self._cursor.fetchone()
+    self._fetched(started, row is not None)
+    return row
+
+  def fetchmany(self, size: int = None):
+    started = time.perf_counter()
+    rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+    self._fetched(started, len(rows))
+    return rows
+
+  def fetchall(self):
+    started = time.perf_counter()
+    rows = self._cursor.fetchall()
+    self._fetched(started, len(rows))
+    return rows
+
+  def __iter__(self):
+    while True:
+      started = time.perf_counter()
+      row = self._cursor.fetchone()
+      self._fetched(started, row is not None)
+      if row is None:
+        return
+      yield row
+
+  def __getattr__(self, name: str):
+    return getattr(self._cursor, name)
+
+  def __setattr__(self, name: str, value) -> None:
+    setattr(self._cursor, name, value)
+
+class ProfiledConnection:
+  """Connection wrapper whose statements are recorded by a Profiler."""
+
+  def __init__(self, conn: sqlite3.Connection, profiler: Profiler):
+    self._conn = conn
+    self.profiler = profiler
+
+  def cursor(self) -> ProfiledCursor:
+    return ProfiledCursor(self._conn.cursor(), self.profiler)
+
+  def execute(self, sql: str, parameters=()) -> ProfiledCursor:
+    return self.cursor().execute(sql, parameters)
+
+  def executemany(self, sql: str, seq_of_parameters) -> ProfiledCursor:
+    return self.cursor().executemany(sql, seq_of_parameters)
+
+  def __enter__(self) -> "ProfiledConnection":
+    self._conn.__enter__()
+    return self
+
+  def __exit__(self, *exc_info):
+    if not self._conn.in_transaction:
+      return self._conn.__exit__(*exc_info)
+
+    # Time the implicit COMMIT or ROLLBACK
+    started = time.perf_counter()
+    try:
+      return self._conn.__exit__(*exc_info)
+    finally:
+      statement = "ROLLBACK" if exc_info[0] else "COMMIT"
+      self.profiler.record_query(statement, time.perf_counter() - started, calls=1)
+
+  def __getattr__(self, name: str):
+    return getattr(self._conn, name)
+
+def profiled_section(method: Callable) -> Callable:
+  """Time a HabitAnalytics method as a section when its database is profiled."""
+  name = method.__qualname__
+
+  @wraps(method)
+  def wrapper(self, *args, **kwargs):
+    profiler = getattr(self.db, 'profiler', None)
+    with profiler.section(name) if profiler else nullcontext():
+      return method(self, *args, **kwargs)
+  return wrapper
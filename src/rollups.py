@@ -0,0 +1,172 @@
+"""
+Per-habit check-off counts bucketed by day, ISO week and calendar month.
+
+Every bucket is identified by the epoch day it starts on: the day itself,
+the Monday of its ISO week, or the first of its month. Counts are kept up
+to date by the HabitDatabase write paths, so the number of check-offs in
+any range of days is a sum over a handful of rows: whole months in the
+middle of the range, whole weeks around them, and single days at the
+edges.
+"""
+import json
+import sqlite3
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from .dates import from_epoch_day, to_epoch_day
+
+BUCKET_TYPES = ['day', 'week', 'month']
+
+# Epoch day 0 (1970-01-01) was a Thursday
+_MONDAY_OFFSET = 3
+
+def week_start(day: int) -> int:
+  """Return the epoch day of the Monday starting the ISO week of a day."""
+  return day - (day + _MONDAY_OFFSET) % 7
+
+def month_start(day: int) -> int:
+  """Return the epoch day of the first of the month of a day."""
+  date = from_epoch_day(day)
+  return day - date.day + 1
+
+def next_month_start(day: int) -> int:
+  """Return the epoch day of the first of the month after a day's month."""
+  date = from_epoch_day(month_start(day)) + timedelta(days=31)
+  return to_epoch_day(date.replace(day=1))
+
+def bucket_starts(day: int) -> List[Tuple[str, int]]:
+  """Return the (bucket_type, bucket) pairs a check-off on a day is counted in."""
+  return [('day', day), ('week', week_start(day)), ('month', month_start(day))]
+
+def add_check_offs(conn: sqlite3.Connection, check_offs: Iterable[Tuple[int, int]],
+                   delta: int = 1) -> None:
+  """
+  Add inserted check-offs to their buckets, or remove deleted ones.
+
+  Args:
+    conn: Connection, expected to be inside a transaction
+    check_offs: (habit_id, check_day) pairs
+    delta: 1 for inserted check-offs, -1 for deleted ones
+  """
+  counts = Counter()
+  for habit_id, day in check_offs:
+    for bucket_type, bucket in bucket_starts(day):
+      counts[habit_id, bucket_type, bucket] += delta
+  conn.executemany("""
+    INSERT INTO check_off_rollups (habit_id, bucket_type, bucket, count)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (bucket_type, bucket, habit_id) DO UPDATE SET count = count + excluded.count
+  """, ((*key, count) for key, count in counts.items()))
+  if delta < 0:
+    conn.execute("DELETE FROM check_off_rollups WHERE count <= 0")
+
+def rebuild_rollups(conn: sqlite3.Connection, habit_ids: Optional[Iterable[int]] = None) -> None:
+  """
+  Recompute bucket counts from the check-off history.
+
+  Args:
+    conn: Connection, expected to be inside a transaction
+    habit_ids: Only rebuild these habits (default: all habits)
+  """
+  if habit_ids is None:
+    conn.execute("DELETE FROM check_off_rollups")
+    where, params = "", []
+  else:
+    where, params = "WHERE habit_id IN (SELECT value FROM json_each(?))", [json.dumps(list(habit_ids))]
+    conn.execute(f"DELETE FROM check_off_rollups {where}", params)
+
+  # SQLite's % truncates, so shift negative days into range before the modulo
+  buckets = {
+    'day': "check_day",
+    'week': f"check_day - ((check_day + {_MONDAY_OFFSET}) % 7 + 7) % 7",
+    'month': "CAST(julianday(date(check_day * 86400, 'unixepoch', 'start of month'))"
+             " - 2440587.5 AS INTEGER)",
+  }
+  for bucket_type, expression in buckets.items():
+    conn.execute(f"""
+      INSERT INTO check_off_rollups (habit_id, bucket_type, bucket, count)
+      SELECT habit_id, '{bucket_type}', {expression} AS bucket, COUNT(*)
+      FROM check_offs
+      {where}
+      GROUP BY habit_id, bucket
+    """, params)
+
+def cover(start_day: int, end_day: int) -> List[Tuple[str, int, int]]:
+  """
+  Split an inclusive range of days into as few whole buckets as possible.
+
+  Returns:
+    (bucket_type, first_bucket, last_bucket) ranges covering the days
+  """
+  if start_day > end_day:
+    return []
+
+  first_month = month_start(start_day)
+  if first_month < start_day:
+    first_month = next_month_start(start_day)
+  after_months = first_month
+  while next_month_start(after_months) - 1 <= end_day:
+    after_months = next_month_start(after_months)
+  if after_months == first_month:
+    return _cover_weeks(start_day, end_day)
+
+  last_month = month_start(after_months - 1)
+  return (
+    _cover_weeks(start_day, first_month - 1)
+    + [('month', first_month, last_month)]
+    + _cover_weeks(after_months, end_day)
+  )
+
+def _cover_weeks(start_day: int, end_day: int) -> List[Tuple[str, int, int]]:
+  """Split an inclusive range of days into whole weeks and single days."""
+  if start_day > end_day:
+    return []
+  first_week = week_start(start_day)
+  if first_week < start_day:
+    first_week += 7
+  after_weeks = week_start(end_day + 1)
+  if after_weeks <= first_week:
+    return [('day', start_day, end_day)]
+
+  ranges = []
+  if start_day < first_week:
+    ranges.append(('day', start_day, first_week - 1))
+  ranges.append(('week', first_week, after_weeks - 7))
+  if after_weeks <= end_day:
+    ranges.append(('day', after_weeks, end_day))
+  return ranges
+
+def count_check_offs(conn: sqlite3.Connection, start_day: int, end_day: int,
+                     habit_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+  """
+  Count check-offs per habit between two epoch days, both inclusive.
+
+  Args:
+    conn: Connection to read the rollups from
+    start_day: First day of the range
+    end_day: Last day of the range
+    habit_ids: Only count these habits (default: all habits)
+  Returns:
+    Dictionary mapping habit ID to its count; habits without check-offs
+    in the range are left out
+  """
+  ranges = cover(start_day, end_day)
+  if not ranges:
+    return {}
+
+  # One range scan per bucket range: over the primary key for all habits,
+  # or over the habit index for a few of them
+  if habit_ids is None:
+    source, habit_filter, extra = "check_off_rollups", "", []
+  else:
+    source = "check_off_rollups INDEXED BY idx_check_off_rollups_habit"
+    habit_filter = "habit_id IN (SELECT value FROM json_each(?)) AND "
+    extra = [json.dumps(list(habit_ids))]
+  scans = " UNION ALL ".join(f"""
+    SELECT habit_id, count FROM {source}
+    WHERE {habit_filter}bucket_type = ? AND bucket BETWEEN ? AND ?
+  """ for _ in ranges)
+  params = [value for bucket_range in ranges for value in (*extra, *bucket_range)]
+
+  cursor = conn.execute(f"SELECT habit_id, SUM(count) FROM ({scans}) GROUP BY habit_id", params)
+  return {row[0]: row[1] for row in cursor}
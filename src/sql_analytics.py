@@ -0,0 +1,128 @@
+"""
+SQL push-down engine for streak and completion analytics.
+
+Streaks are computed inside SQLite with a gaps-and-islands query: LAG gives
+the gap to the previous check-off, a running SUM over "gap too long" flags
+numbers the runs, and grouping by run yields their lengths. Only one
+aggregated row per habit crosses into Python. Once check-offs have been
+archived (see src.archive), each habit's last archived check-off joins
+the sequence weighted by the run ending at it.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from .dates import SECONDS_PER_DAY, to_epoch_seconds
+from .habit_stats import STREAK_INTERVALS
+
+# Bounds of SQLite integers, used when no habit ID range is given
+MIN_ID = -2 ** 63
+MAX_ID = 2 ** 63 - 1
+
+def _interval_values() -> Tuple[str, list]:
+  """Return a VALUES list and parameters mapping periodicity to the max gap in seconds."""
+  placeholders = ", ".join("(?, ?)" for _ in STREAK_INTERVALS)
+  params = []
+  for periodicity, interval in STREAK_INTERVALS.items():
+    params.extend((periodicity, int(interval.total_seconds())))
+  return placeholders, params
+
+def get_streaks(db, now: datetime, first_id: Optional[int] = None,
+                last_id: Optional[int] = None) -> List[Tuple[int, int, int]]:
+  """
+  Compute the longest and current streak of every habit.
+
+  Args:
+    now: Time the current streaks are measured at
+    first_id: Only compute habits with this ID or greater
+    last_id: Only compute habits with this ID or lower
+  Returns:
+    List of (habit_id, longest_streak, current_streak) ordered by habit ID
+  """
+  placeholders, params = _interval_values()
+  low = first_id if first_id is not None else MIN_ID
+  high = last_id if last_id is not None else MAX_ID
+  # Without archived runs the window functions read check_offs in index order
+  source, source_params = "check_offs", []
+  if db.conn.execute("SELECT EXISTS (SELECT 1 FROM archived_history)").fetchone()[0]:
+    source = """(
+      SELECT habit_id, check_day, check_ts, 1 AS weight FROM check_offs
+      WHERE habit_id BETWEEN ? AND ?
+      UNION ALL
+      SELECT habit_id, last_check_ts / 86400, last_check_ts, current_run FROM archived_history
+      WHERE habit_id BETWEEN ? AND ? AND last_check_ts IS NOT NULL
+    )"""
+    source_params = [low, high, low, high]
+  cursor = db.conn.execute(f"""
+    WITH intervals(periodicity, max_gap) AS (VALUES {placeholders}),
+    gaps AS (
+      SELECT c.habit_id, c.check_day, c.check_ts, {"c.weight" if source_params else "1"} AS weight,
+        i.max_gap,
+        c.check_ts - LAG(c.check_ts) OVER (
+          PARTITION BY c.habit_id ORDER BY c.check_day, c.check_ts
+        ) AS gap
+      FROM {source} c
+      JOIN habits h ON h.id = c.habit_id
+      JOIN intervals i ON i.periodicity = h.periodicity
+      WHERE c.habit_id BETWEEN ? AND ?
+    ),
+    numbered AS (
+      SELECT habit_id, check_ts, weight, max_gap,
+        SUM(CASE WHEN gap IS NULL OR gap > max_gap THEN 1 ELSE 0 END) OVER (
+          PARTITION BY habit_id ORDER BY check_day, check_ts ROWS UNBOUNDED PRECEDING
+        ) AS run_id
+      FROM gaps
+    ),
+    runs AS (
+      SELECT habit_id, run_id, SUM(weight) AS length, MAX(check_ts) AS run_end, max_gap
+      FROM numbered
+      GROUP BY habit_id, run_id
+    ),
+    per_habit AS (
+      SELECT habit_id, MAX(length) AS longest, MAX(run_id) AS last_run
+      FROM runs
+      GROUP BY habit_id
+    )
+    SELECT h.id,
+      MAX(COALESCE(p.longest, 0), COALESCE(a.longest_streak, 0)),
+      CASE WHEN r.run_end >= ? - r.max_gap THEN r.length ELSE 0 END
+    FROM habits h
+    LEFT JOIN per_habit p ON p.habit_id = h.id
+    LEFT JOIN runs r ON r.habit_id = h.id AND r.run_id = p.last_run
+    LEFT JOIN archived_history a ON a.habit_id = h.id
+    WHERE h.id BETWEEN ? AND ?
+    ORDER BY h.id
+  """, (*params, *source_params, low, high, to_epoch_seconds(now), low, high))
+  return [tuple(row) for row in cursor]
+
+def get_completion_counts(db, now: datetime,
+                          windows: Dict[str, timedelta]) -> Dict[str, Tuple[int, int]]:
+  """
+  Count recent check-offs of the most recently created habit of each periodicity.
+
+  This mirrors the summary semantics of the Python path, where the last
+  habit of each periodicity determines its rate.
+
+  Args:
+    now: End of the windows
+    windows: Window length per periodicity
+  Returns:
+    Dictionary mapping periodicity to (habit_id, check-offs within the window)
+  """
+  placeholders = ", ".join("(?, ?, ?)" for _ in windows)
+  params = []
+  for periodicity, window in windows.items():
+    cutoff = to_epoch_seconds(now - window)
+    params.extend((periodicity, cutoff, cutoff // SECONDS_PER_DAY))
+
+  cursor = db.conn.execute(f"""
+    WITH windows(periodicity, cutoff, cutoff_day) AS (VALUES {placeholders}),
+    last_habits AS (
+      SELECT periodicity, MAX(id) AS id FROM habits GROUP BY periodicity
+    )
+    SELECT l.periodicity, l.id, COUNT(c.id)
+    FROM last_habits l
+    JOIN windows w ON w.periodicity = l.periodicity
+    LEFT JOIN check_offs c ON c.habit_id = l.id
+      AND c.check_day >= w.cutoff_day AND c.check_ts >= w.cutoff
+    GROUP BY l.periodicity, l.id
+  """, params)
+  return {row[0]: (row[1], row[2]) for row in cursor}
@@ -0,0 +1,115 @@
+"""
+Storage backends for habits and their check-offs.
+
+HabitStore is the interface HabitAnalytics, the CLI and the benchmarks
+program against, extracted from the public methods of HabitDatabase. Two
+backends implement it:
+
+- 'sqlite': HabitDatabase, persisting to an SQLite file, or to a private
+  in-memory database with db_path ':memory:' whose contents can be saved
+  and loaded with snapshot and restore
+- 'memory': MemoryHabitStore, pure Python dictionaries and arrays living
+  only as long as the process, for tests, benchmarks and ephemeral data
+
+The sql analytics engine and process-pool workers run SQL against the
+database, so they need the sqlite backend, as does moving old check-offs
+out with HabitDatabase.archive.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, runtime_checkable
+from .bitmaps import PeriodBitmap
+from .habit import Habit
+from .habit_stats import HabitStats
+from .options import BACKENDS
+from .profiling import Profiler
+
+@runtime_checkable
+class HabitStore(Protocol):
+  """Operations shared by every storage backend, see HabitDatabase for their contracts."""
+  db_path: str
+  profiler: Optional[Profiler]
+
+  def save_habit(self, habit: Habit) -> int: ...
+
+  def save_habits_bulk(self, habits: Iterable[Habit], batch_size: int = 50_000) -> tuple[int, int]: ...
+
+  def load_habit(self, habit_id: int, storage: str = 'dates',
+                 load_history: bool = True) -> Optional[Habit]: ...
+
+  def delete_habit(self, habit_id: int) -> None: ...
+
+  def save_check_off(self, habit_id: int, check_date: datetime) -> None: ...
+
+  def save_check_offs_bulk(self, habit_ids: Iterable[int], dates: Iterable[datetime]) -> int: ...
+
+  def save_check_offs_batch(self, check_offs: Iterable[tuple[int, datetime]]) -> int: ...
+
+  def delete_check_off(self, habit_id: int, check_date: datetime) -> bool: ...
+
+  def get_check_offs(self, habit_id: int, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, limit: Optional[int] = None,
+                     descending: bool = False) -> List[datetime]: ...
+
+  def get_check_offs_many(self, habit_ids: Iterable[int], since: Optional[datetime] = None,
+                          until: Optional[datetime] = None, limit: Optional[int] = None,
+                          descending: bool = False) -> Dict[int, List[datetime]]: ...
+
+  def get_check_off_seconds(self, first_id: Optional[int] = None,
+                            last_id: Optional[int] = None) -> Iterator[tuple[int, int]]: ...
+
+  def count_check_offs(self, start_day: int, end_day: int,
+                       habit_ids: Optional[Iterable[int]] = None) -> Dict[int, int]: ...
+
+  def get_period_bitmaps(self, habit_ids: Optional[Iterable[int]] = None,
+                         periodicity: Optional[str] = None) -> Dict[int, PeriodBitmap]: ...
+
+  def get_archived_stats(self) -> Dict[int, HabitStats]: ...
+
+  def get_stats(self, habit_id: int) -> Optional[HabitStats]: ...
+
+  def get_all_stats(self) -> List[tuple[int, Habit, HabitStats]]: ...
+
+  def iter_stats(self, batch_size: int = 1000, after_id: Optional[int] = None,
+                 limit: Optional[int] = None,
+                 periodicity: Optional[str] = None) -> Iterator[tuple[int, Habit, HabitStats]]: ...
+
+  def iter_habits(self, batch_size: int = 1000, after_id: Optional[int] = None,
+                  limit: Optional[int] = None, periodicity: Optional[str] = None,
+                  load_history: bool = False, storage: str = 'dates') -> Iterator[tuple[int, Habit]]: ...
+
+  def get_all_habits(self, storage: str = 'dates',
+                     load_history: bool = True) -> List[tuple[int, Habit]]: ...
+
+  def get_newest_habit_ids(self) -> Dict[str, int]: ...
+
+  def rebuild_stats(self) -> None: ...
+
+  def import_rows(self, rows: Iterable[Dict[str, str]], batch_size: int = 10_000) -> tuple[int, int]: ...
+
+  def iter_export_rows(self) -> Iterator[tuple]: ...
+
+  def get_data_version(self) -> tuple[int, int]: ...
+
+  def enable_profiling(self, profiler: Optional[Profiler] = None) -> Profiler: ...
+
+  def close(self) -> None: ...
+
+def open_store(db_path: str = "habits.db", backend: str = 'sqlite', **options) -> HabitStore:
+  """
+  Open a habit store.
+
+  Args:
+    db_path: SQLite database file, or ':memory:'; the memory backend
+      ignores it, as its data never leaves the process
+    backend: One of BACKENDS
+    options: Further HabitDatabase arguments, such as pooled
+  Raises:
+    ValueError: For an unknown backend
+  """
+  if backend == 'sqlite':
+    from .db_manager import HabitDatabase
+    return HabitDatabase(db_path, **options)
+  if backend == 'memory':
+    from .memory_store import MemoryHabitStore
+    return MemoryHabitStore()
+  raise ValueError(f"Backend must be one of: {BACKENDS}")
@@ -0,0 +1,54 @@
+"""
+CSV and NDJSON formats for importing and exporting habit history.
+
+Both formats hold one row per check-off with the columns in EXPORT_FIELDS;
+habits without check-offs appear once with an empty check_date. Rows are
+read and written one at a time so files of any size can be streamed.
+"""
+import csv
+import json
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+from .options import FORMATS
+
+EXPORT_FIELDS = ['habit_id', 'task_name', 'periodicity', 'creation_date', 'check_date']
+
+def detect_format(filename: Optional[str], default: str = 'csv') -> str:
+  """Guess the format from a file name's extension."""
+  if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+    return 'ndjson'
+  if filename and filename.lower().endswith('.csv'):
+    return 'csv'
+  return default
+
+def read_rows(stream: TextIO, file_format: str) -> Iterator[Dict[str, str]]:
+  """Yield rows as dictionaries keyed by EXPORT_FIELDS."""
+  if file_format == 'csv':
+    yield from csv.DictReader(stream)
+  elif file_format == 'ndjson':
+    for line in stream:
+      if line.strip():
+        yield json.loads(line)
+  else:
+    raise ValueError(f"Format must be one of: {FORMATS}")
+
+def write_rows(stream: TextIO, file_format: str, rows: Iterable[tuple]) -> int:
+  """
+  Write export rows and return how many were written.
+
+  Args:
+    rows: Tuples with values in EXPORT_FIELDS order
+  """
+  count = 0
+  if file_format == 'csv':
+    writer = csv.writer(stream)
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+      writer.writerow(row)
+      count += 1
+  elif file_format == 'ndjson':
+    for row in rows:
+      stream.write(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n")
+      count += 1
+  else:
+    raise ValueError(f"Format must be one of: {FORMATS}")
+  return count
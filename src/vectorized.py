@@ -0,0 +1,164 @@
+"""
+NumPy engine for bulk streak and completion analytics.
+
+Check-offs of all habits are held in CSR layout: one flat array of epoch
+seconds sorted by habit and date, plus per-habit offsets into it. Every
+habit is then processed at once with diff, cumsum and reduceat instead of
+looping over datetime objects. Runs carried over from archived check-offs
+(see src.archive) extend each habit's first run. NumPy is optional;
+callers fall back to the pure-Python path when it is not installed.
+"""
+from itertools import takewhile
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from .dates import to_epoch_seconds
+from .habit import Habit
+from .habit_stats import STREAK_INTERVALS, HabitStats
+
+try:
+  import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+  np = None
+
+INTERVAL_SECONDS = {
+  periodicity: int(interval.total_seconds())
+  for periodicity, interval in STREAK_INTERVALS.items()
+}
+
+def available() -> bool:
+  """Return True if NumPy can be imported."""
+  return np is not None
+
+class CheckOffArrays(NamedTuple):
+  """Check-offs of many habits in CSR layout."""
+  habit_ids: "np.ndarray"
+  intervals: "np.ndarray"
+  offsets: "np.ndarray"
+  values: "np.ndarray"
+  # Per habit, the last archived check-off in epoch seconds, the run
+  # ending at it and the longest archived run; None if nothing is archived
+  archived_last: Optional["np.ndarray"] = None
+  archived_run: Optional["np.ndarray"] = None
+  archived_longest: Optional["np.ndarray"] = None
+
+  @classmethod
+  def from_rows(cls, habits: List[Tuple[int, Habit]],
+                check_off_rows: Iterable[Tuple[int, int]],
+                archived: Optional[Dict[int, HabitStats]] = None) -> "CheckOffArrays":
+    """
+    Build arrays from habits and (habit_id, epoch_seconds) rows.
+
+    Args:
+      habits: (habit_id, habit) tuples ordered by habit ID
+      check_off_rows: Rows ordered by habit ID and date, for those habits only
+      archived: Stats of archived check-offs by habit ID
+    """
+    habit_ids = np.fromiter((habit_id for habit_id, _ in habits), dtype=np.int64, count=len(habits))
+    intervals = np.fromiter(
+      (INTERVAL_SECONDS[habit.periodicity] for _, habit in habits), dtype=np.int64, count=len(habits)
+    )
+    rows = np.array(list(check_off_rows), dtype=np.int64).reshape(-1, 2)
+    offsets = np.empty(len(habits) + 1, dtype=np.int64)
+    offsets[:-1] = np.searchsorted(rows[:, 0], habit_ids, side='left')
+    offsets[-1] = len(rows)
+    arrays = cls(habit_ids, intervals, offsets, np.ascontiguousarray(rows[:, 1]))
+    if not archived:
+      return arrays
+
+    # Habits without archived check-offs get a last one too old to matter
+    never = np.iinfo(np.int64).min // 2
+    summaries = [archived.get(habit_id) for habit_id, _ in habits]
+    archived_last = np.fromiter(
+      (to_epoch_seconds(s.last_check_off) if s and s.last_check_off else never for s in summaries),
+      dtype=np.int64, count=len(habits)
+    )
+    archived_run = np.fromiter((s.current_run if s else 0 for s in summaries),
+                               dtype=np.int64, count=len(habits))
+    archived_longest = np.fromiter((s.longest_streak if s else 0 for s in summaries),
+                                   dtype=np.int64, count=len(habits))
+    return arrays._replace(archived_last=archived_last, archived_run=archived_run,
+                           archived_longest=archived_longest)
+
+  def _segments(self) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Return per-habit counts, the non-empty mask and each check-off's habit index."""
+    counts = np.diff(self.offsets)
+    owner = np.repeat(np.arange(len(self.habit_ids)), counts)
+    return counts, counts > 0, owner
+
+  def streaks(self, now: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Compute the longest and current streak of every habit.
+
+    Args:
+      now: Current time in epoch seconds
+    Returns:
+      Tuple of (longest, current) arrays aligned with habit_ids
+    """
+    longest = np.zeros(len(self.habit_ids), dtype=np.int64)
+    current = np.zeros(len(self.habit_ids), dtype=np.int64)
+    if self.archived_last is not None:
+      # Until a live check-off follows, the archived run is the current one
+      alive = now - self.archived_last <= self.intervals
+      current = np.where(alive, self.archived_run, 0)
+      longest = self.archived_longest.copy()
+    if not len(self.values):
+      return longest, current
+
+    counts, nonempty, owner = self._segments()
+
+    # A run starts at each habit's first check-off and after every long gap
+    starts = np.ones(len(self.values), dtype=bool)
+    starts[1:] = (owner[1:] != owner[:-1]) | (np.diff(self.values) > self.intervals[owner[1:]])
+    run_ids = np.cumsum(starts) - 1
+    run_lengths = np.bincount(run_ids)
+
+    first = self.offsets[:-1][nonempty]
+    last = self.offsets[1:][nonempty] - 1
+    if self.archived_last is not None:
+      # The first run continues the run ending at the last archived check-off
+      carried = self.values[first] - self.archived_last[nonempty] <= self.intervals[nonempty]
+      run_lengths[run_ids[first]] += np.where(carried, self.archived_run[nonempty], 0)
+    longest[nonempty] = np.maximum(longest[nonempty],
+                                   np.maximum.reduceat(run_lengths, run_ids[first]))
+
+    alive = now - self.values[last] <= self.intervals[nonempty]
+    current[nonempty] = np.where(alive, run_lengths[run_ids[last]], 0)
+    return longest, current
+
+  def counts_since(self, cutoffs: "np.ndarray") -> "np.ndarray":
+    """
+    Count check-offs at or after a per-habit cutoff.
+
+    Args:
+      cutoffs: Epoch seconds aligned with habit_ids
+    """
+    result = np.zeros(len(self.habit_ids), dtype=np.int64)
+    if not len(self.values):
+      return result
+
+    counts, nonempty, _ = self._segments()
+    recent = (self.values >= np.repeat(cutoffs, counts)).astype(np.int64)
+    result[nonempty] = np.add.reduceat(recent, self.offsets[:-1][nonempty])
+    return result
+
+def load_check_off_arrays(db, first_id: Optional[int] = None,
+                          last_id: Optional[int] = None) -> Tuple[List[Tuple[int, Habit]], CheckOffArrays]:
+  """
+  Load every habit and its check-offs into CSR arrays.
+
+  Args:
+    first_id: Only load habits with this ID or greater
+    last_id: Only load habits with this ID or lower
+  Returns:
+    Tuple of (habits without history, arrays aligned with them)
+  """
+  if first_id is None and last_id is None:
+    habits = db.get_all_habits(load_history=False)
+  else:
+    after_id = first_id - 1 if first_id is not None else None
+    habits = list(takewhile(
+      lambda item: last_id is None or item[0] <= last_id,
+      db.iter_habits(after_id=after_id)
+    ))
+  return habits, CheckOffArrays.from_rows(
+    habits, db.get_check_off_seconds(first_id, last_id), db.get_archived_stats()
+  )
@@ -1,16 +1,22 @@
 import pytest
 from datetime import datetime, timedelta
-from src.analytics import HabitAnalytics
+from src.analytics import ENGINES, HabitAnalytics
+from src.dates import to_epoch_seconds
 from src.db_manager import HabitDatabase
 from src.habit import Habit
+from src.storage import BACKENDS, open_store
 
-@pytest.fixture
-def db():
-  """Create a temporary database for testing."""
-  db = HabitDatabase(":memory:")
+@pytest.fixture(params=BACKENDS)
+def db(request):
+  """Create a temporary store for testing, once per backend."""
+  db = open_store(":memory:", backend=request.param)
   yield db
   db.close()
 
+def skip_unless_sqlite(db):
+  if not isinstance(db, HabitDatabase):
+    pytest.skip("the sql engine needs an SQLite database")
+
 @pytest.fixture
 def analytics(db):
   return HabitAnalytics(db)
@@ -94,4 +100,214 @@ def test_get_current_streaks(analytics, db):
   streaks = analytics.get_current_streaks()
   assert len(streaks) == 2
   assert streaks[0][2] == 3  # First habit has longer streak
-  assert streaks[1][2] == 2  # Second habit has shorter streak 
\ No newline at end of file
+  assert streaks[1][2] == 2  # Second habit has shorter streak 
+
+def create_mixed_history(db):
+  """Create habits of every periodicity with gaps, runs and no history."""
+  today = datetime.now()
+  patterns = [
+    ("Exercise", "daily", [0, 1, 2, 4, 5, 6, 7, 20]),
+    ("Read", "daily", [3, 4, 5, 6, 7, 8]),
+    ("Plan", "weekly", [0, 7, 14, 30, 37]),
+    ("Budget", "monthly", [1, 31, 61, 150]),
+    ("Stretch", "daily", []),
+  ]
+  for task, periodicity, days_ago in patterns:
+    habit_id = db.save_habit(Habit(task, periodicity, today - timedelta(days=200)))
+    for days in days_ago:
+      db.save_check_off(habit_id, today - timedelta(days=days, hours=1))
+
+def test_numpy_engine_matches_python(db):
+  pytest.importorskip("numpy")
+  create_mixed_history(db)
+  python = HabitAnalytics(db, engine='python')
+  numpy = HabitAnalytics(db, engine='numpy')
+  assert numpy.engine == 'numpy'
+  
+  python_streaks = {habit_id: streak for habit_id, _, streak in python.get_current_streaks()}
+  numpy_streaks = {habit_id: streak for habit_id, _, streak in numpy.get_current_streaks()}
+  assert numpy_streaks == python_streaks
+  
+  habit_id, _, streak = numpy.get_longest_streak_habit()
+  assert (habit_id, streak) == python.get_longest_streak_habit()[::2]
+  assert numpy.get_completion_summary() == python.get_completion_summary()
+
+def test_numpy_engine_matches_history_replay(db):
+  pytest.importorskip("numpy")
+  from src.vectorized import load_check_off_arrays
+  create_mixed_history(db)
+  
+  habits, arrays = load_check_off_arrays(db)
+  longest, current = arrays.streaks(to_epoch_seconds(datetime.now()))
+  for index, (habit_id, _) in enumerate(habits):
+    habit = db.load_habit(habit_id)
+    assert longest[index] == HabitAnalytics(db)._calculate_longest_streak(habit)
+    assert current[index] == habit.calculate_streak()
+
+def test_invalid_engine(db):
+  with pytest.raises(ValueError):
+    HabitAnalytics(db, engine='invalid')
+
+def test_sql_engine_matches_python(db):
+  skip_unless_sqlite(db)
+  create_mixed_history(db)
+  python = HabitAnalytics(db, engine='python')
+  sql = HabitAnalytics(db, engine='sql')
+  
+  python_streaks = {habit_id: streak for habit_id, _, streak in python.get_current_streaks()}
+  sql_streaks = {habit_id: streak for habit_id, _, streak in sql.get_current_streaks()}
+  assert sql_streaks == python_streaks
+  
+  habit_id, _, streak = sql.get_longest_streak_habit()
+  assert (habit_id, streak) == python.get_longest_streak_habit()[::2]
+  assert sql.get_completion_summary() == python.get_completion_summary()
+
+def test_sql_engine_empty_database(db):
+  skip_unless_sqlite(db)
+  sql = HabitAnalytics(db, engine='sql')
+  assert sql.get_current_streaks() == []
+  assert sql.get_longest_streak_habit() == (None, None, 0)
+  assert sql.get_completion_summary() == {'daily': 0.0, 'weekly': 0.0, 'monthly': 0.0}
+
+def test_profiled_sections(db, analytics):
+  profiler = db.enable_profiling()
+  analytics.get_current_streaks()
+  assert 'HabitAnalytics.get_current_streaks' in profiler.sections
+
+@pytest.mark.parametrize("engine", ["python", "numpy", "sql"])
+def test_iter_current_streaks_pages_in_id_order(db, engine):
+  if engine == 'sql':
+    skip_unless_sqlite(db)
+  create_mixed_history(db)
+  analytics = HabitAnalytics(db, engine=engine)
+  expected = sorted((id, streak) for id, _, streak in analytics.get_current_streaks())
+
+  streaks = [(id, streak) for id, _, streak in analytics.iter_current_streaks(batch_size=1)]
+  assert streaks == expected
+  page = analytics.iter_current_streaks(after_id=expected[0][0], limit=1)
+  assert [(id, streak) for id, _, streak in page] == expected[1:2]
+
+@pytest.mark.parametrize("engine", ["numpy", "sql"])
+def test_parallel_workers_match_serial(tmp_path, engine):
+  db = HabitDatabase(str(tmp_path / "parallel.db"))
+  create_mixed_history(db)
+  serial = HabitAnalytics(db, engine=engine)
+  parallel = HabitAnalytics(db, engine=engine, workers=3)
+
+  def ids_and_streaks(streaks):
+    return [(id, streak) for id, _, streak in streaks]
+  assert ids_and_streaks(parallel.get_current_streaks()) == ids_and_streaks(serial.get_current_streaks())
+  serial_id, _, serial_longest = serial.get_longest_streak_habit()
+  parallel_id, _, parallel_longest = parallel.get_longest_streak_habit()
+  assert (parallel_id, parallel_longest) == (serial_id, serial_longest)
+  db.close()
+
+def test_parallel_workers_need_a_file(db):
+  with pytest.raises(ValueError):
+    HabitAnalytics(db, engine='sql', workers=2)
+
+def test_windowed_completion_summary(db, analytics):
+  today = datetime.now()
+  habit_id = db.save_habit(Habit("Exercise", "daily", today - timedelta(days=60)))
+  db.save_check_offs_bulk([habit_id], [today - timedelta(days=day) for day in range(0, 60, 2)])
+
+  summary = analytics.get_completion_summary(timedelta(days=30))
+  assert summary['daily'] == 50
+  assert analytics.get_completion_summary(timedelta(days=60))['daily'] == 50
+  with pytest.raises(ValueError):
+    analytics.get_completion_summary(timedelta(hours=6))
+
+def test_sql_engine_needs_sqlite():
+  with pytest.raises(ValueError):
+    HabitAnalytics(open_store(backend='memory'), engine='sql')
+
+def test_period_streaks(analytics, db):
+  now = datetime.now()
+  daily_id = db.save_habit(Habit("Exercise", "daily", now - timedelta(days=30)))
+  # Morning and evening check-offs more than a day apart still fill consecutive days
+  for i, hour in [(1, 20), (2, 7), (3, 21), (6, 9), (7, 9)]:
+    db.save_check_off(daily_id, (now - timedelta(days=i)).replace(hour=hour))
+  weekly_id = db.save_habit(Habit("Read", "weekly", now - timedelta(weeks=10)))
+  db.save_habit(Habit("Plan", "monthly"))
+
+  streaks = {habit_id: (current, longest) for habit_id, _, current, longest in analytics.get_period_streaks()}
+  assert streaks[daily_id] == (3, 3)
+  assert streaks[weekly_id] == (0, 0)
+  assert len(streaks) == 3
+
+def test_perfect_days(analytics, db):
+  today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+  first = db.save_habit(Habit("Exercise", "daily", today - timedelta(days=20)))
+  second = db.save_habit(Habit("Read", "daily", today - timedelta(days=3)))
+  db.save_habit(Habit("Plan", "weekly", today - timedelta(days=20)))
+  for i in [0, 1, 2, 4, 5, 6, 25]:
+    db.save_check_off(first, today - timedelta(days=i))
+  for i in [0, 2, 3]:
+    db.save_check_off(second, today - timedelta(days=i))
+
+  perfect = analytics.get_perfect_days(days=10)
+  today_day = to_epoch_seconds(today) // 86400
+  # Days before the second habit existed only need the first one
+  assert sorted(today_day - day for day in perfect.periods()) == [0, 2, 4, 5, 6]
+  assert perfect.current_run(today_day) == 1
+  assert perfect.longest_run() == 3
+
+  only_first = analytics.get_perfect_days(days=10, habit_ids=(first,))
+  assert sorted(today_day - day for day in only_first.periods()) == [0, 1, 2, 4, 5, 6]
+  # Nothing is perfect before any habit existed
+  assert len(analytics.get_perfect_days(days=40, habit_ids=(first,))) == 6
+  with pytest.raises(ValueError):
+    analytics.get_perfect_days(days=10, habit_ids=(first + 2,))
+  with pytest.raises(ValueError):
+    analytics.get_perfect_days(days=0)
+
+def test_correlations(analytics, db):
+  today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+  start = today - timedelta(days=29)
+  meditate = db.save_habit(Habit("Meditate", "daily", start))
+  exercise = db.save_habit(Habit("Exercise", "daily", start))
+  read = db.save_habit(Habit("Read", "daily", start))
+  db.save_habit(Habit("Plan", "weekly", start))
+  for i in range(0, 28, 3):
+    db.save_check_off(meditate, start + timedelta(days=i))
+    # Exercise follows meditation the next day
+    db.save_check_off(exercise, start + timedelta(days=i + 1))
+  for i in range(0, 30, 2):
+    db.save_check_off(read, start + timedelta(days=i))
+
+  first, second, count, *_ = analytics.get_correlations(periods=30, lag=1, top=1, sort='correlation')[0]
+  assert (first, second, count) == (meditate, exercise, 10)
+  same_day = analytics.get_correlations(periods=30, top=None, min_count=1)
+  assert {(c.first_id, c.second_id) for c in same_day} <= {(meditate, read), (exercise, read)}
+  assert analytics.get_correlations(periodicity='weekly') == []
+  with pytest.raises(ValueError):
+    analytics.get_correlations(sort='fun')
+
+def test_engines_continue_archived_runs(tmp_path):
+  pytest.importorskip("numpy")
+  db = HabitDatabase(str(tmp_path / "habits.db"))
+  create_mixed_history(db)
+  today = datetime.now()
+  patterns = [
+    ("Walk", "daily", range(120)),
+    ("Swim", "daily", [*range(95, 105), 1, 0]),
+    ("Call", "weekly", [91, 98, 105, 112, 200]),
+    ("Paint", "daily", [200, 201, 202]),
+  ]
+  for task, periodicity, days_ago in patterns:
+    habit_id = db.save_habit(Habit(task, periodicity, today - timedelta(days=300)))
+    db.save_check_offs_batch((habit_id, today - timedelta(days=days)) for days in days_ago)
+
+  def results():
+    return {
+      engine: (sorted((habit_id, streak) for habit_id, _, streak in analytics.get_current_streaks()),
+               analytics.get_longest_streak_habit()[::2], analytics.get_completion_summary())
+      for engine in ENGINES
+      for analytics in [HabitAnalytics(db, engine=engine)]
+    }
+
+  expected = results()
+  assert db.archive(today - timedelta(days=100))[0] > 0
+  assert results() == expected
+  assert HabitAnalytics(db).get_habit_longest_streak(6) == 120
+  db.close()
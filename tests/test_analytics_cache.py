@@ -0,0 +1,129 @@
+import sqlite3
+import time
+import pytest
+from datetime import date, datetime, timedelta
+from src import analytics_cache
+from src.analytics import HabitAnalytics
+from src.analytics_cache import AnalyticsCache
+from src.db_manager import HabitDatabase
+from src.habit import Habit
+
+@pytest.fixture
+def db():
+  """Create a temporary database for testing."""
+  db = HabitDatabase(":memory:")
+  yield db
+  db.close()
+
+def streak_ids(streaks):
+  return [(id, streak) for id, _, streak in streaks]
+
+def test_repeated_calls_hit_the_cache(db):
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  db.save_check_off(habit_id, datetime.now())
+  cache = AnalyticsCache()
+  analytics = HabitAnalytics(db, cache=cache)
+
+  first = analytics.get_current_streaks()
+  assert analytics.get_current_streaks() == first
+  analytics.get_completion_summary()
+  analytics.get_completion_summary(timedelta(days=30))
+  assert cache.stats() == {'hits': 1, 'misses': 3, 'size': 3}
+
+def test_writes_invalidate_results(db):
+  analytics = HabitAnalytics(db, cache=AnalyticsCache())
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  assert streak_ids(analytics.get_current_streaks()) == [(habit_id, 0)]
+
+  db.save_check_off(habit_id, datetime.now())
+  assert streak_ids(analytics.get_current_streaks()) == [(habit_id, 1)]
+  other_id = db.save_habit(Habit("Read", "daily"))
+  assert len(analytics.get_current_streaks()) == 2
+  db.delete_habit(other_id)
+  assert len(analytics.get_current_streaks()) == 1
+  assert analytics.cache.hits == 0
+
+def test_commits_by_other_connections_invalidate_results(tmp_path):
+  path = str(tmp_path / "cache.db")
+  db = HabitDatabase(path)
+  analytics = HabitAnalytics(db, cache=AnalyticsCache())
+  db.save_habit(Habit("Exercise", "daily"))
+  assert len(analytics.get_current_streaks()) == 1
+
+  # A write that bypasses HabitDatabase does not bump the change counter
+  other = sqlite3.connect(path)
+  with other:
+    other.execute("INSERT INTO habits (task_name, periodicity, creation_date) VALUES ('Read', 'daily', ?)",
+                  (datetime.now().isoformat(),))
+  other.close()
+  assert len(analytics.get_current_streaks()) == 2
+  db.close()
+
+def test_date_change_invalidates_results(db, monkeypatch):
+  analytics = HabitAnalytics(db, cache=AnalyticsCache())
+  analytics.get_completion_summary()
+
+  class Tomorrow(date):
+    @classmethod
+    def today(cls):
+      return date.today() + timedelta(days=1)
+  monkeypatch.setattr(analytics_cache, 'date', Tomorrow)
+  analytics.get_completion_summary()
+  assert analytics.cache.misses == 2
+
+def test_changing_a_result_leaves_the_cache_intact(db):
+  for name in ("Exercise", "Read"):
+    db.save_habit(Habit(name, "daily"))
+  analytics = HabitAnalytics(db, cache=AnalyticsCache())
+  expected = streak_ids(analytics.get_current_streaks())
+
+  streaks = analytics.get_current_streaks()
+  streaks.reverse()
+  streaks.append(None)
+  summary = analytics.get_completion_summary()
+  summary.clear()
+  assert streak_ids(analytics.get_current_streaks()) == expected
+  assert analytics.get_completion_summary() != {}
+  assert analytics.cache.hits == 3
+
+def test_streaks_ending_during_the_day_are_kept_until_the_next_day(db, monkeypatch):
+  habit_id = db.save_habit(Habit("Exercise", "daily", datetime.now() - timedelta(days=3)))
+  # The streak runs out half a second after the first call
+  db.save_check_off(habit_id, datetime.now() - timedelta(days=1) + timedelta(seconds=0.5))
+  analytics = HabitAnalytics(db, cache=AnalyticsCache())
+  assert streak_ids(analytics.get_current_streaks()) == [(habit_id, 1)]
+  time.sleep(0.6)
+  assert streak_ids(HabitAnalytics(db).get_current_streaks()) == [(habit_id, 0)]
+  assert streak_ids(analytics.get_current_streaks()) == [(habit_id, 1)]
+
+  class Tomorrow(date):
+    @classmethod
+    def today(cls):
+      return date.today() + timedelta(days=1)
+  monkeypatch.setattr(analytics_cache, 'date', Tomorrow)
+  assert streak_ids(analytics.get_current_streaks()) == [(habit_id, 0)]
+
+def test_results_persist_across_processes(tmp_path):
+  path = str(tmp_path / "persist.db")
+  cache_path = str(tmp_path / "analytics.cache")
+  db = HabitDatabase(path)
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  db.save_check_off(habit_id, datetime.now())
+  expected = streak_ids(HabitAnalytics(db, cache=AnalyticsCache(path=cache_path)).get_current_streaks())
+
+  cache = AnalyticsCache(path=cache_path)
+  assert streak_ids(HabitAnalytics(db, cache=cache).get_current_streaks()) == expected
+  assert cache.hits == 1
+
+  db.save_check_off(habit_id, datetime.now() - timedelta(days=1))
+  cache = AnalyticsCache(path=cache_path)
+  assert streak_ids(HabitAnalytics(db, cache=cache).get_current_streaks()) == [(habit_id, 2)]
+  assert cache.misses == 1
+  db.close()
+
+def test_least_recently_used_results_are_evicted(db):
+  cache = AnalyticsCache(maxsize=2)
+  analytics = HabitAnalytics(db, cache=cache)
+  for periodicity in ("daily", "weekly", "monthly", "daily"):
+    analytics.get_habits_by_periodicity(periodicity)
+  assert cache.stats() == {'hits': 0, 'misses': 4, 'size': 2}
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from src.async_api import AsyncHabitAnalytics, AsyncHabitDatabase
+from src.habit import Habit
+
+@pytest.fixture(params=["memory", "file"])
+def db_path(request, tmp_path):
+  return ":memory:" if request.param == "memory" else str(tmp_path / "async.db")
+
+def test_mirrors_database_methods(db_path):
+  async def scenario():
+    async with AsyncHabitDatabase(db_path) as db:
+      habit_id = await db.save_habit(Habit("Exercise", "daily"))
+      today = datetime.now()
+      for i in range(3):
+        await db.save_check_off(habit_id, today - timedelta(days=i))
+
+      habit = await db.load_habit(habit_id)
+      assert len(habit.check_off_dates) == 3
+      assert [id for id, _ in await db.get_all_habits()] == [habit_id]
+      assert (await db.get_stats(habit_id)).longest_streak == 3
+
+      await db.delete_habit(habit_id)
+      assert await db.load_habit(habit_id) is None
+  asyncio.run(scenario())
+
+def test_concurrent_analytics(db_path):
+  async def scenario():
+    async with AsyncHabitDatabase(db_path) as db:
+      today = datetime.now()
+      for i in range(5):
+        habit_id = await db.save_habit(Habit(f"Habit {i}", "daily", today - timedelta(days=10)))
+        await db.save_check_offs_bulk([habit_id], [today - timedelta(days=d) for d in range(i + 1)])
+
+      analytics = AsyncHabitAnalytics(db)
+      results = await asyncio.gather(*(analytics.get_current_streaks() for _ in range(10)))
+      streaks = [[(id, streak) for id, _, streak in result] for result in results]
+      assert all(result == streaks[0] for result in streaks)
+      assert sorted(streak for _, streak in streaks[0]) == [1, 2, 3, 4, 5]
+      _, _, longest = await analytics.get_longest_streak_habit()
+      assert longest == 5
+  asyncio.run(scenario())
+
+def test_streams_rows_in_batches(db_path):
+  async def scenario():
+    async with AsyncHabitDatabase(db_path) as db:
+      start = datetime(2024, 1, 1)
+      habit_id = await db.save_habit(Habit("Exercise", "daily", start))
+      await db.save_check_offs_bulk([habit_id], [start + timedelta(days=d) for d in range(25)])
+
+      rows = [row async for row in db.iter_export_rows(batch_size=10)]
+      assert len(rows) == 25
+      assert rows[0][0] == habit_id
+      habits = [habit async for _, habit in db.iter_habits(batch_size=1, load_history=True)]
+      assert len(habits[0].check_off_dates) == 25
+      seconds = [ts async for _, ts in db.iter_check_off_seconds(batch_size=7)]
+      assert seconds == sorted(seconds) and len(seconds) == 25
+  asyncio.run(scenario())
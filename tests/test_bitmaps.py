@@ -0,0 +1,88 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from src.bitmaps import PeriodBitmap, longest_run, period_of_day, period_start_day, rebuild_bitmaps
+from src.dates import from_epoch_day, to_epoch_day
+from src.db_manager import HabitDatabase
+from src.habit import Habit
+
+@pytest.fixture
+def db():
+  """Create a temporary database for testing."""
+  db = HabitDatabase(":memory:")
+  yield db
+  db.close()
+
+def naive_longest_run(bits):
+  return max((len(run) for run in bin(bits)[2:].split('0')), default=0)
+
+def test_periods_follow_the_calendar():
+  # 2024-03-14 is a Thursday, in ISO week 11
+  day = to_epoch_day(datetime(2024, 3, 14))
+  assert period_of_day(day, 'daily') == day
+  monday = period_start_day(period_of_day(day, 'weekly'), 'weekly')
+  assert from_epoch_day(monday) == datetime(2024, 3, 11)
+  first = period_start_day(period_of_day(day, 'monthly'), 'monthly')
+  assert from_epoch_day(first) == datetime(2024, 3, 1)
+
+  # Consecutive weeks and months have consecutive indices, also before 1970
+  for start in [day, -400]:
+    weeks = [period_of_day(start + i, 'weekly') for i in range(0, 70, 7)]
+    assert weeks == list(range(weeks[0], weeks[0] + 10))
+  assert period_of_day(to_epoch_day(datetime(2025, 1, 1)), 'monthly') == \
+    period_of_day(to_epoch_day(datetime(2024, 12, 31)), 'monthly') + 1
+
+def test_longest_run_matches_naive_scan():
+  rng = random.Random(5)
+  assert longest_run(0) == 0
+  for _ in range(500):
+    bits = rng.getrandbits(rng.randint(1, 300)) | ((1 << rng.randint(0, 200)) - 1)
+    assert longest_run(bits) == naive_longest_run(bits)
+
+def test_bitmap_operations():
+  bitmap = PeriodBitmap.from_periods([10, 11, 12, 14, 15])
+  assert bitmap == PeriodBitmap(10, 0b110111)
+  assert list(bitmap.periods()) == [10, 11, 12, 14, 15]
+  assert len(bitmap) == 5 and 12 in bitmap and 13 not in bitmap and 9 not in bitmap
+
+  assert bitmap.run_ending(12) == 3
+  assert bitmap.run_ending(13) == 0
+  assert bitmap.run_ending(15) == 2
+  assert bitmap.run_ending(5) == 0
+  # An unfinished current period keeps the previous run alive
+  assert bitmap.current_run(16) == 2
+  assert bitmap.current_run(17) == 0
+  assert bitmap.longest_run() == 3
+
+  assert bitmap.window(11, 14) == 0b1011
+  assert bitmap.window(8, 11) == 0b1100
+  assert bitmap.add(8) == PeriodBitmap(8, 0b11011101)
+  assert PeriodBitmap.from_blob(10, bitmap.to_blob()) == bitmap
+  assert PeriodBitmap().add(3) == PeriodBitmap(3, 1)
+
+def test_bitmaps_follow_writes(db):
+  rng = random.Random(9)
+  start = datetime(2024, 1, 1, 8, 0)
+  habit_ids = [db.save_habit(Habit(f"Habit {p}", p)) for p in ['daily', 'weekly', 'monthly']]
+  for _ in range(200):
+    db.save_check_off(rng.choice(habit_ids), start + timedelta(hours=rng.randint(0, 24 * 400)))
+  db.save_check_offs_bulk(habit_ids, [start + timedelta(days=3), start + timedelta(days=500)])
+  db.save_check_offs_batch((rng.choice(habit_ids), start - timedelta(days=rng.randint(1, 50)))
+                           for _ in range(50))
+  for habit_id in habit_ids:
+    for check_date in db.get_check_offs(habit_id)[::7]:
+      db.delete_check_off(habit_id, check_date)
+
+  maintained = db.get_period_bitmaps()
+  with db._write():
+    rebuild_bitmaps(db.conn)
+  assert db.get_period_bitmaps() == maintained
+
+  for habit_id in habit_ids:
+    periodicity = db.load_habit(habit_id, load_history=False).periodicity
+    expected = {period_of_day(to_epoch_day(d), periodicity) for d in db.get_check_offs(habit_id)}
+    assert set(maintained[habit_id].periods()) == expected
+  assert db.get_period_bitmaps(periodicity='weekly').keys() == {habit_ids[1]}
+
+  db.delete_habit(habit_ids[0])
+  assert habit_ids[0] not in db.get_period_bitmaps()
@@ -1,12 +1,15 @@
 from click.testing import CliRunner
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytest
-from src.cli import cli
+from src.cli import cli, close_db
 from src.db_manager import HabitDatabase
+from src.habit import Habit
 
 @pytest.fixture
 def runner():
-	return CliRunner()
+	# Invocations share one in-memory database until the test ends
+	yield CliRunner(env={'HABITS_DB': ':memory:'})
+	close_db()
 
 @pytest.fixture
 def test_db():
@@ -56,4 +59,169 @@ def test_delete_habit(runner):
 	# Delete with force flag
 	result = runner.invoke(cli, ['delete', str(habit_id), '-f'])
 	assert result.exit_code == 0
-	assert 'Deleted habit' in result.output 
\ No newline at end of file
+	assert 'Deleted habit' in result.output 
+
+def test_stats_shows_recent_completions(runner, tmp_path):
+	path = str(tmp_path / "stats.db")
+	result = runner.invoke(cli, ['--db', path, 'create', 'Exercise', '-p', 'daily'])
+	habit_id = result.output.split('ID: ')[1].strip()
+	runner.invoke(cli, ['--db', path, 'check-many', habit_id, '--from', '2024-01-01', '--to', '2024-01-07'])
+	
+	result = runner.invoke(cli, ['--db', path, 'stats', habit_id])
+	assert result.exit_code == 0
+	recent = [line.strip() for line in result.output.splitlines() if '✓' in line]
+	assert recent == [f"✓ 2024-01-0{day}" for day in range(7, 2, -1)]
+
+def test_rebuild_stats(runner):
+	result = runner.invoke(cli, ['rebuild-stats'])
+	assert result.exit_code == 0
+	assert 'Rebuilt habit statistics' in result.output
+
+@pytest.mark.parametrize("file_format", ["csv", "ndjson"])
+def test_export_and_import_round_trip(runner, tmp_path, file_format):
+	runner.invoke(cli, ['create', 'Exercise', '-p', 'daily'])
+	path = str(tmp_path / f"history.{file_format}")
+	
+	result = runner.invoke(cli, ['export', path])
+	assert result.exit_code == 0
+	assert 'Exported' in result.output
+	
+	# Everything already exists, so nothing new is imported
+	result = runner.invoke(cli, ['import', path])
+	assert result.exit_code == 0
+	assert 'Imported 0 habits and 0 check-offs' in result.output
+
+def test_check_many_date_range(runner):
+	result = runner.invoke(cli, ['create', 'Exercise', '-p', 'daily'])
+	habit_id = int(result.output.split('ID: ')[1])
+	
+	result = runner.invoke(cli, ['check-many', str(habit_id), '--from', '2024-01-01', '--to', '2024-01-07'])
+	assert result.exit_code == 0
+	assert 'on 7 dates' in result.output
+
+def test_help_does_not_open_database(runner, tmp_path):
+	path = tmp_path / "lazy.db"
+	result = runner.invoke(cli, ['--db', str(path), '--help'])
+	assert result.exit_code == 0
+	assert not path.exists()
+
+def test_db_option(runner, tmp_path):
+	path = tmp_path / "other.db"
+	result = runner.invoke(cli, ['--db', str(path), 'create', 'Exercise', '-p', 'daily'])
+	assert result.exit_code == 0
+	assert 'with ID: 1' in result.output
+	
+	result = runner.invoke(cli, ['list'], env={'HABITS_DB': str(path)})
+	assert 'Exercise' in result.output
+
+def test_profile_option(runner, tmp_path):
+	json_path = tmp_path / "profile.json"
+	result = runner.invoke(cli, ['--profile', '--profile-json', str(json_path), 'list'])
+	assert result.exit_code == 0
+	assert 'SQL statements:' in result.output
+	assert json_path.exists()
+
+def test_listing_pagination_and_ndjson(runner, tmp_path):
+	import json
+	path = str(tmp_path / "paged.db")
+	for task in ["Exercise", "Read", "Meditate"]:
+		runner.invoke(cli, ['--db', path, 'create', task, '-p', 'daily'])
+
+	result = runner.invoke(cli, ['--db', path, 'list', '--format', 'ndjson', '--after-id', '1', '--limit', '1'])
+	assert result.exit_code == 0
+	records = [json.loads(line) for line in result.output.splitlines()]
+	assert [record['task_name'] for record in records] == ['Read']
+
+	result = runner.invoke(cli, ['--db', path, 'analytics', 'streaks', '--sort', 'id', '--format', 'ndjson'])
+	assert [json.loads(line)['id'] for line in result.output.splitlines()] == [1, 2, 3]
+
+	result = runner.invoke(cli, ['--db', path, 'analytics', 'habits', '--after-id', '3'])
+	assert 'No habits found' in result.output
+
+def test_summary_window(runner, tmp_path):
+	path = str(tmp_path / "window.db")
+	runner.invoke(cli, ['--db', path, 'create', 'Exercise', '-p', 'daily'])
+	runner.invoke(cli, ['--db', path, 'check', '1'])
+	
+	result = runner.invoke(cli, ['--db', path, 'analytics', 'summary', '--window', '10d'])
+	assert result.exit_code == 0
+	assert 'last 10 days' in result.output
+	assert 'Daily   :  10.0%' in result.output
+	
+	result = runner.invoke(cli, ['--db', path, 'analytics', 'summary', '--window', 'soon'])
+	assert result.exit_code != 0
+
+def test_analytics_cache_file(runner, tmp_path):
+	path = str(tmp_path / "cached.db")
+	cache_path = str(tmp_path / "analytics.cache")
+	runner.invoke(cli, ['--db', path, 'create', 'Exercise', '-p', 'daily'])
+	
+	for expected in ('0 hits, 1 misses', '1 hits, 0 misses'):
+		result = runner.invoke(cli, ['--db', path, 'analytics', '--cache', cache_path, '--cache-stats', 'summary'])
+		assert result.exit_code == 0
+		assert expected in result.output
+
+def test_memory_backend(runner):
+	result = runner.invoke(cli, ['--backend', 'memory', 'create', 'Exercise', '-p', 'daily'])
+	habit_id = result.output.split('ID: ')[1].strip()
+	runner.invoke(cli, ['--backend', 'memory', 'check', habit_id])
+	
+	result = runner.invoke(cli, ['--backend', 'memory', 'analytics', 'streaks'])
+	assert result.exit_code == 0
+	assert 'Exercise' in result.output and '1 days' in result.output
+	result = runner.invoke(cli, ['--backend', 'memory', 'analytics', '--engine', 'sql', 'streaks'])
+	assert result.exit_code == 2
+
+def test_perfect_days(runner):
+	runner.invoke(cli, ['create', 'Exercise', '-p', 'daily'])
+	runner.invoke(cli, ['create', 'Read', '-p', 'weekly'])
+	runner.invoke(cli, ['check', '1'])
+	
+	result = runner.invoke(cli, ['analytics', 'perfect-days', '--days', '7'])
+	assert result.exit_code == 0
+	assert datetime.now().strftime('%Y-%m-%d') in result.output
+	assert 'Total: 1 of 7 days' in result.output
+	assert 'Current run: 1 days' in result.output
+	
+	result = runner.invoke(cli, ['analytics', 'perfect-days', '--habit', '2'])
+	assert 'not a daily habit' in result.output
+
+def test_correlations(runner):
+	runner.invoke(cli, ['create', 'Meditate', '-p', 'daily'])
+	runner.invoke(cli, ['create', 'Exercise', '-p', 'daily'])
+	runner.invoke(cli, ['check-many', '1', '2'])
+	
+	result = runner.invoke(cli, ['analytics', 'correlations', '--sort', 'both', '--min-count', '1'])
+	assert result.exit_code == 0
+	assert 'Meditate & Exercise' in result.output
+	
+	result = runner.invoke(cli, ['analytics', 'correlations', '--sort', 'both', '--min-count', '1',
+		'--format', 'ndjson'])
+	assert '"first": "Meditate", "second_id": 2' in result.output
+	
+	result = runner.invoke(cli, ['analytics', 'correlations'])
+	assert 'No habit pairs found' in result.output
+
+def test_archive(runner, tmp_path):
+	path = str(tmp_path / "habits.db")
+	db = HabitDatabase(path)
+	today = datetime.now()
+	habit_id = db.save_habit(Habit("Exercise", "daily", today - timedelta(days=500)))
+	db.save_check_offs_bulk([habit_id], [today - timedelta(days=days) for days in range(400)])
+	db.close()
+	
+	result = runner.invoke(cli, ['--db', path, 'archive'])
+	assert result.exit_code == 0
+	assert 'Archived 34 check-offs of 1 habits' in result.output
+	assert 'habits.archive.db' in result.output
+	assert 'Compacted' in result.output
+	
+	result = runner.invoke(cli, ['--db', path, 'stats', str(habit_id)])
+	assert 'Current streak: 400' in result.output
+	
+	result = runner.invoke(cli, ['--db', path, 'analytics', 'summary', '--window', '500d'])
+	assert result.exit_code == 1
+	assert 'archived' in result.output
+	
+	result = runner.invoke(cli, ['--db', path, 'archive', '--older-than', '30'])
+	assert result.exit_code == 2
@@ -0,0 +1,70 @@
+import random
+import pytest
+from src import correlations
+from src.correlations import top_correlations
+
+def bits(periods):
+  return sum(1 << period for period in periods)
+
+def test_pair_metrics():
+  # A and B are done together on days 0-3, C only when A is not
+  done = [bits([0, 1, 2, 3]), bits([0, 1, 2, 3, 6]), bits([4, 5, 6, 7])]
+  existed = [bits(range(8))] * 3
+  pairs = top_correlations([1, 2, 3], done, existed, periods=8, top=None, min_count=2)
+  (first, second, count, both, lift, correlation), = pairs
+  assert (first, second, count) == (1, 2, 4)
+  assert both == pytest.approx(4 / 8)
+  assert lift == pytest.approx(4 * 8 / (4 * 5))
+  assert correlation == pytest.approx((4 / 8 - 4 / 8 * 5 / 8) / (4 / 8 * 4 / 8 * 5 / 8 * 3 / 8) ** 0.5)
+
+  # C follows A by four days
+  done = [bits([0, 1, 2, 3, 8, 9]), bits([5]), bits([4, 5, 6, 7, 12, 13])]
+  existed = [bits(range(16))] * 3
+  lagged = top_correlations([1, 2, 3], done, existed, periods=16, lag=4, sort='correlation')
+  assert lagged[0][:3] == (1, 3, 6)
+  assert lagged[0].correlation == pytest.approx(1.0)
+
+def test_periods_before_creation_are_ignored():
+  done = [bits([0, 1, 4, 5]), bits([4, 5])]
+  # The second habit only exists from period 4 on
+  existed = [bits(range(8)), bits(range(4, 8))]
+  pair, = top_correlations([1, 2], done, existed, periods=8, sort='both')
+  assert pair.both == pytest.approx(2 / 4)
+  assert pair.lift == pytest.approx(2 * 4 / (2 * 2))
+
+def test_numpy_and_python_agree():
+  pytest.importorskip("numpy")
+  rng = random.Random(11)
+  periods = 60
+  habit_ids = list(range(1, 41))
+  done = [rng.getrandbits(periods) & rng.getrandbits(periods) for _ in habit_ids]
+  existed = [((1 << periods) - 1) & ~((1 << rng.randint(0, 30)) - 1) for _ in habit_ids]
+  done = [d & e for d, e in zip(done, existed)]
+  for lag in [0, 1, 3]:
+    for sort in correlations.CORRELATION_SORTS:
+      expected = correlations._python_correlations(habit_ids, done, existed, periods, lag, sort, 2)
+      found = correlations._numpy_correlations(habit_ids, done, existed, periods, lag, None, sort, 2)
+      found, expected = sorted(found), sorted(expected)
+      assert len(found) == len(expected)
+      for a, b in zip(found, expected):
+        assert a[:3] == b[:3]
+        for x, y in zip(a[3:], b[3:]):
+          assert (x is None) == (y is None) and (x is None or x == pytest.approx(y))
+
+def test_top_pairs_across_blocks(monkeypatch):
+  pytest.importorskip("numpy")
+  rng = random.Random(2)
+  habit_ids = list(range(1, 101))
+  done = [rng.getrandbits(30) for _ in habit_ids]
+  existed = [(1 << 30) - 1] * len(habit_ids)
+  everything = top_correlations(habit_ids, done, existed, periods=30, top=None)
+  monkeypatch.setattr(correlations, '_BLOCK_CELLS', 250)
+  assert top_correlations(habit_ids, done, existed, periods=30, top=15) == everything[:15]
+
+def test_invalid_options():
+  with pytest.raises(ValueError):
+    top_correlations([1, 2], [1, 1], [3, 3], periods=2, sort='fun')
+  with pytest.raises(ValueError):
+    top_correlations([1, 2], [1, 1], [3, 3], periods=2, lag=1)
+  with pytest.raises(ValueError):
+    top_correlations([1, 2], [1, 1], [3, 3], periods=2, top=0)
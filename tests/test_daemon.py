@@ -0,0 +1,136 @@
+import os
+import socket
+import sys
+import threading
+import pytest
+from src import __main__ as entry_point
+from src import cli as cli_module
+from src import daemon
+from src.cli import close_db
+
+pytestmark = pytest.mark.skipif(not daemon.available(), reason="needs Unix sockets")
+
+@pytest.fixture
+def serve(tmp_path):
+  """Start a daemon on a thread; the returned function starts it with a command runner."""
+  servers = []
+
+  def start(run_command, socket_path=None):
+    server = daemon.CommandServer(socket_path or str(tmp_path / "test.sock"), run_command)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    servers.append((server, thread))
+    return server
+
+  yield start
+  for server, thread in servers:
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+def test_forward_round_trip(serve, tmp_path, monkeypatch):
+  def run_command(args):
+    print(" ".join(args), os.getcwd(), os.environ.get('HABITS_COLOR'))
+    print("warning", file=sys.stderr)
+    return 3
+
+  server = serve(run_command)
+  monkeypatch.setenv('HABITS_COLOR', 'blue')
+  monkeypatch.chdir(tmp_path)
+  response = daemon.forward(server.socket_path, ['list', '--limit', '5'])
+  assert response == {
+    'exit_code': 3, 'stdout': f"list --limit 5 {tmp_path} blue\n", 'stderr': "warning\n",
+  }
+  assert oct(os.stat(server.socket_path).st_mode & 0o777) == oct(0o600)
+
+def test_failing_command_keeps_serving(serve):
+  def run_command(args):
+    if args == ['boom']:
+      raise RuntimeError("boom")
+    return 0
+
+  server = serve(run_command)
+  response = daemon.forward(server.socket_path, ['boom'])
+  assert response['exit_code'] == 1 and 'RuntimeError: boom' in response['stderr']
+  assert daemon.forward(server.socket_path, ['ok'])['exit_code'] == 0
+
+def test_lost_response_is_not_retried(tmp_path, monkeypatch, capsys):
+  db_path = str(tmp_path / "habits.db")
+  listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  listener.bind(daemon.socket_path_for(db_path))
+  listener.listen()
+  requests = []
+
+  def accept_and_hang_up():
+    # Read each request, then close the connection without answering
+    for _ in range(2):
+      connection, _ = listener.accept()
+      with connection, connection.makefile('rb') as reader:
+        requests.append(reader.readline())
+
+  thread = threading.Thread(target=accept_and_hang_up, daemon=True)
+  thread.start()
+  try:
+    with pytest.raises(RuntimeError, match="did not answer"):
+      daemon.forward(daemon.socket_path_for(db_path), ['list'])
+    monkeypatch.delenv('HABITS_NO_DAEMON', raising=False)
+    assert daemon.forward_command_line(['--db', db_path, 'check', '1']) == 1
+    assert "did not answer" in capsys.readouterr().err
+    thread.join()
+  finally:
+    listener.close()
+  assert len(requests) == 2
+
+def test_no_daemon(tmp_path, serve):
+  path = str(tmp_path / "stale.sock")
+  assert daemon.forward(path, ['list']) is None
+  # A socket file nobody listens on is replaced by the next daemon
+  stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  stale.bind(path)
+  stale.close()
+  assert daemon.forward(path, ['list']) is None
+  server = serve(lambda args: 0, path)
+  with pytest.raises(RuntimeError):
+    daemon.CommandServer(path, lambda args: 0)
+  assert daemon.forward(server.socket_path, ['list'])['exit_code'] == 0
+
+def test_cli_forwards_to_daemon(serve, tmp_path, monkeypatch, capsys):
+  db_path = str(tmp_path / "habits.db")
+  monkeypatch.setattr(cli_module, '_db_path', db_path)
+  monkeypatch.delenv('HABITS_NO_DAEMON', raising=False)
+  commands = []
+
+  def run_command(args):
+    commands.append(args)
+    try:
+      return cli_module._run_forwarded(args)
+    finally:
+      # The connection belongs to the server thread
+      close_db()
+
+  serve(run_command, daemon.socket_path_for(db_path))
+  monkeypatch.setattr(sys, 'argv', ['habits', '--db', db_path, 'create', 'Read', '-p', 'daily'])
+  with pytest.raises(SystemExit) as exit_info:
+    cli_module.main()
+  assert exit_info.value.code == 0
+  assert "Created habit 'Read' with ID: 1" in capsys.readouterr().out
+
+  # python -m src forwards before importing the CLI
+  monkeypatch.setattr(sys, 'argv', ['habits', '--db', db_path, 'stats', 'x'])
+  with pytest.raises(SystemExit) as exit_info:
+    entry_point.main()
+  assert exit_info.value.code == 2
+  assert "Invalid value" in capsys.readouterr().err
+  assert commands == [['create', 'Read', '-p', 'daily'], ['stats', 'x']]
+
+  # Other commands and options, and other databases, run in this process
+  assert daemon.forward_command_line(['--db', db_path, 'export']) is None
+  assert daemon.forward_command_line(['--db', db_path, '--no-daemon', 'list']) is None
+  assert daemon.forward_command_line(['--db', db_path, '--profile', 'list']) is None
+  assert daemon.forward_command_line(['--db', db_path, 'list', '--help']) is None
+  assert daemon.forward_command_line([f'--db={tmp_path / "other.db"}', 'list']) is None
+  monkeypatch.setenv('HABITS_NO_DAEMON', '1')
+  assert daemon.forward_command_line(['--db', db_path, 'list']) is None
+  monkeypatch.setenv('HABITS_NO_DAEMON', '0')
+  monkeypatch.setenv('HABITS_DB', db_path)
+  assert daemon.forward_command_line(['list']) == 0
@@ -0,0 +1,29 @@
+from datetime import datetime
+from src.data_generator import create_generated_data, generate_habits
+from src.db_manager import HabitDatabase
+from src.habit_stats import HabitStats
+
+END = datetime(2024, 6, 30, 23, 0)
+
+def test_generation_is_reproducible():
+  first = [list(habit.check_off_dates) for habit in generate_habits(20, 60, seed=3, end=END)]
+  second = [list(habit.check_off_dates) for habit in generate_habits(20, 60, seed=3, end=END)]
+  other = [list(habit.check_off_dates) for habit in generate_habits(20, 60, seed=4, end=END)]
+  assert first == second
+  assert first != other
+
+def test_periodicity_mix_and_completion():
+  habits = list(generate_habits(10, 30, periodicity_mix={'weekly': 1.0},
+                                completion_range=(1.0, 1.0), gap_probability=0.0, end=END))
+  assert all(habit.periodicity == 'weekly' for habit in habits)
+  assert all(4 <= len(habit.check_off_dates) <= 5 for habit in habits)
+
+def test_create_generated_data_writes_batches():
+  db = HabitDatabase(":memory:")
+  habits_added, check_offs_added = create_generated_data(db, 25, 90, batch_size=100, seed=1, end=END)
+  
+  assert habits_added == 25
+  assert sum(len(habit.check_off_dates) for _, habit in db.get_all_habits()) == check_offs_added
+  habit_id, habit = db.get_all_habits()[0]
+  assert db.get_stats(habit_id) == HabitStats.from_dates(habit.check_off_dates, habit.periodicity)
+  db.close()
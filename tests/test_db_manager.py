@@ -1,7 +1,9 @@
 import pytest
+import sqlite3
 from datetime import datetime, timedelta
 from src.db_manager import HabitDatabase
 from src.habit import Habit
+from src.habit_stats import HabitStats
 
 @pytest.fixture
 def db():
@@ -64,4 +66,317 @@ def test_delete_habit(db):
 	
 	# Try to load the deleted habit
 	loaded_habit = db.load_habit(habit_id)
-	assert loaded_habit is None 
\ No newline at end of file
+	assert loaded_habit is None 
+
+def test_get_all_habits_loads_check_offs(db):
+	# Create habits with interleaved check-offs
+	today = datetime.now()
+	exercise_id = db.save_habit(Habit("Exercise", "daily"))
+	read_id = db.save_habit(Habit("Read", "weekly"))
+	for i in range(3):
+		db.save_check_off(read_id, today - timedelta(weeks=i))
+		db.save_check_off(exercise_id, today - timedelta(days=i))
+	db.save_check_off(exercise_id, today - timedelta(days=5))
+	
+	loaded = dict(db.get_all_habits())
+	assert len(loaded[exercise_id].check_off_dates) == 4
+	assert len(loaded[read_id].check_off_dates) == 3
+	assert loaded[exercise_id].check_off_dates == db.get_check_offs(exercise_id)
+
+def test_get_all_habits_query_count_is_constant(db):
+	statements = []
+	db.conn.set_trace_callback(statements.append)
+	
+	counts = []
+	for _ in range(3):
+		# Grow the number of habits and measure the queries per load
+		for i in range(10):
+			habit_id = db.save_habit(Habit(f"Habit {i}", "daily"))
+			db.save_check_off(habit_id, datetime.now())
+		statements.clear()
+		db.get_all_habits()
+		counts.append(len(statements))
+	
+	assert counts[0] == counts[1] == counts[2]
+
+def test_stats_follow_check_offs(db):
+	habit_id = db.save_habit(Habit("Exercise", "daily"))
+	assert db.get_stats(habit_id).total_count == 0
+	
+	# Two runs of 3 and 2 days, saved out of order to force a rebuild
+	today = datetime.now()
+	for i in (0, 1, 5, 6, 2):
+		db.save_check_off(habit_id, today - timedelta(days=i))
+	
+	stats = db.get_stats(habit_id)
+	assert stats.total_count == 5
+	assert stats.longest_streak == 3
+	assert stats.current_streak("daily") == 3
+	assert stats == HabitStats.from_dates(db.get_check_offs(habit_id), "daily")
+
+def test_rebuild_stats(db):
+	habit_id = db.save_habit(Habit("Exercise", "daily"))
+	db.save_check_off(habit_id, datetime.now())
+	expected = db.get_stats(habit_id)
+	
+	with db.conn:
+		db.conn.execute("DELETE FROM habit_stats")
+	db.rebuild_stats()
+	assert db.get_stats(habit_id) == expected
+
+def test_delete_habit_removes_stats(db):
+	habit_id = db.save_habit(Habit("Exercise", "daily"))
+	db.save_check_off(habit_id, datetime.now())
+	db.delete_habit(habit_id)
+	
+	assert db.get_stats(habit_id) is None
+	assert db.get_all_stats() == []
+
+def test_import_rows(db):
+	rows = [
+		{"habit_id": "7", "task_name": "Exercise", "periodicity": "daily",
+		 "creation_date": "2024-01-01T08:00:00", "check_date": f"2024-01-0{day}T08:00:00"}
+		for day in (1, 2, 3, 3)
+	]
+	rows.append({"habit_id": "9", "task_name": "Plan", "periodicity": "weekly",
+	             "creation_date": "2024-01-01T08:00:00", "check_date": ""})
+	
+	assert db.import_rows(rows, batch_size=2) == (2, 3)
+	assert db.import_rows(rows, batch_size=2) == (0, 0)
+	assert len(db.load_habit(7).check_off_dates) == 3
+	assert db.get_stats(7).longest_streak == 3
+	assert db.load_habit(9).periodicity == "weekly"
+
+def test_import_rows_rejects_invalid_periodicity(db):
+	rows = [{"habit_id": "1", "task_name": "Exercise", "periodicity": "hourly",
+	         "creation_date": "2024-01-01T08:00:00"}]
+	with pytest.raises(ValueError):
+		db.import_rows(rows)
+
+def test_iter_export_rows(db):
+	habit_id = db.save_habit(Habit("Exercise", "daily", datetime(2024, 1, 1)))
+	db.save_check_off(habit_id, datetime(2024, 1, 2))
+	empty_id = db.save_habit(Habit("Read", "weekly", datetime(2024, 1, 1)))
+	
+	assert list(db.iter_export_rows()) == [
+		(habit_id, "Exercise", "daily", "2024-01-01T00:00:00", "2024-01-02T00:00:00"),
+		(empty_id, "Read", "weekly", "2024-01-01T00:00:00", None),
+	]
+
+def test_save_check_offs_bulk(db):
+	exercise_id = db.save_habit(Habit("Exercise", "daily"))
+	read_id = db.save_habit(Habit("Read", "daily"))
+	today = datetime.now()
+	db.save_check_off(exercise_id, today - timedelta(days=3))
+	
+	dates = [today - timedelta(days=i) for i in range(3)]
+	assert db.save_check_offs_bulk([exercise_id, read_id], dates) == 6
+	assert db.save_check_offs_bulk([exercise_id], dates) == 0
+	
+	assert db.get_stats(exercise_id).longest_streak == 4
+	assert db.get_stats(read_id).current_streak("daily") == 3
+	assert db.get_stats(read_id) == HabitStats.from_dates(db.get_check_offs(read_id), "daily")
+
+def test_save_check_offs_bulk_unknown_habit(db):
+	habit_id = db.save_habit(Habit("Exercise", "daily"))
+	with pytest.raises(ValueError):
+		db.save_check_offs_bulk([habit_id, habit_id + 1], [datetime.now()])
+	assert db.get_check_offs(habit_id) == []
+
+def test_get_check_offs_range(db):
+	habit_id = db.save_habit(Habit("Exercise", "daily"))
+	start = datetime(2024, 1, 1, 8, 0)
+	db.save_check_offs_bulk([habit_id], [start + timedelta(days=i) for i in range(30)])
+	
+	recent = db.get_check_offs(habit_id, since=datetime(2024, 1, 28))
+	assert recent == [start + timedelta(days=i) for i in range(27, 30)]
+	# since is inclusive and until exclusive, to the second
+	window = db.get_check_offs(habit_id, since=datetime(2024, 1, 2, 8), until=datetime(2024, 1, 4, 8))
+	assert window == [datetime(2024, 1, 2, 8), datetime(2024, 1, 3, 8)]
+	assert db.get_check_offs(habit_id, limit=2, descending=True) == [datetime(2024, 1, 30, 8), datetime(2024, 1, 29, 8)]
+	assert db.get_check_offs(habit_id, until=start, limit=5) == []
+
+def test_get_check_offs_many(db):
+	exercise_id = db.save_habit(Habit("Exercise", "daily"))
+	read_id = db.save_habit(Habit("Read", "daily"))
+	today = datetime(2024, 3, 1)
+	db.save_check_offs_bulk([exercise_id], [today - timedelta(days=i) for i in range(5)])
+	db.save_check_offs_bulk([read_id], [today - timedelta(days=i) for i in range(2)])
+	
+	latest = db.get_check_offs_many([exercise_id, read_id, read_id + 1], limit=3, descending=True)
+	assert latest == {
+		exercise_id: [today - timedelta(days=i) for i in range(3)],
+		read_id: [today, today - timedelta(days=1)],
+		read_id + 1: [],
+	}
+	since = db.get_check_offs_many([exercise_id, read_id], since=today - timedelta(days=1))
+	assert since[exercise_id] == since[read_id] == db.get_check_offs(read_id)
+
+def test_profiling_counts_statements(db):
+	habit_id = db.save_habit(Habit("Exercise", "daily"))
+	for i in range(3):
+		db.save_check_off(habit_id, datetime.now() - timedelta(days=i))
+	
+	profiler = db.enable_profiling()
+	db.get_all_habits()
+	figures = profiler.to_dict()
+	assert figures['statement_count'] == 2
+	assert sum(query['rows'] for query in figures['queries']) == 4
+
+def test_pooled_rejects_memory_database():
+	with pytest.raises(ValueError):
+		HabitDatabase(":memory:", pooled=True)
+
+def test_pooled_concurrent_readers_and_writers(tmp_path):
+	import threading
+	from src.analytics import HabitAnalytics
+
+	db = HabitDatabase(str(tmp_path / "pooled.db"), pooled=True)
+	assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+	habit_ids = [db.save_habit(Habit(f"Habit {i}", "daily", datetime(2024, 1, 1))) for i in range(4)]
+	analytics = HabitAnalytics(db)
+	errors = []
+	done = threading.Event()
+
+	def write(habit_id):
+		try:
+			for day in range(50):
+				db.save_check_off(habit_id, datetime(2024, 1, 1) + timedelta(days=day))
+		except Exception as e:
+			errors.append(e)
+
+	def read():
+		try:
+			while not done.is_set():
+				assert len(analytics.get_current_streaks()) == len(habit_ids)
+		except Exception as e:
+			errors.append(e)
+
+	readers = [threading.Thread(target=read) for _ in range(4)]
+	writers = [threading.Thread(target=write, args=(habit_id,)) for habit_id in habit_ids]
+	for thread in readers + writers:
+		thread.start()
+	for thread in writers:
+		thread.join()
+	done.set()
+	for thread in readers:
+		thread.join()
+
+	assert errors == []
+	for habit_id in habit_ids:
+		assert len(db.get_check_offs(habit_id)) == 50
+		assert db.get_stats(habit_id).longest_streak == 50
+	db.close()
+
+def test_iter_habits_keyset_pagination(db):
+	ids = [db.save_habit(Habit(f"Habit {i}", "daily" if i % 2 else "weekly")) for i in range(7)]
+	db.save_check_off(ids[3], datetime.now())
+
+	assert [id for id, _ in db.iter_habits(batch_size=2)] == ids
+	assert [id for id, _ in db.iter_habits(batch_size=2, after_id=ids[2], limit=3)] == ids[3:6]
+	assert [id for id, _ in db.iter_habits(periodicity="daily")] == ids[1::2]
+
+	habits = dict(db.iter_habits(batch_size=3, load_history=True))
+	assert len(habits[ids[3]].check_off_dates) == 1
+	assert len(habits[ids[4]].check_off_dates) == 0
+	assert [id for id, _, _ in db.iter_stats(batch_size=4, after_id=ids[4])] == ids[5:]
+
+	with pytest.raises(ValueError):
+		next(db.iter_habits(batch_size=0))
+
+def test_read_only_database(tmp_path):
+	path = str(tmp_path / "readonly.db")
+	writer = HabitDatabase(path)
+	habit_id = writer.save_habit(Habit("Exercise", "daily"))
+	writer.close()
+
+	db = HabitDatabase(path, read_only=True)
+	assert db.load_habit(habit_id).task_name == "Exercise"
+	with pytest.raises(sqlite3.OperationalError):
+		db.save_habit(Habit("Read", "daily"))
+	db.close()
+
+def test_snapshot_and_restore(db, tmp_path):
+	path = str(tmp_path / "snapshot.db")
+	habit_id = db.save_habit(Habit("Exercise", "daily"))
+	db.save_check_off(habit_id, datetime(2024, 1, 1))
+	db.snapshot(path)
+	
+	db.save_habit(Habit("Read", "daily"))
+	version = db.get_data_version()
+	db.restore(path)
+	assert [id for id, _ in db.get_all_habits()] == [habit_id]
+	assert db.get_data_version()[0] > version[0]
+	
+	copy = HabitDatabase.from_snapshot(path)
+	assert copy.get_check_offs(habit_id) == [datetime(2024, 1, 1)]
+	copy.close()
+	with pytest.raises(FileNotFoundError):
+		db.restore(str(tmp_path / "missing.db"))
+
+def test_archive(tmp_path):
+	db = HabitDatabase(str(tmp_path / "habits.db"))
+	today = datetime.now()
+	habit_id = db.save_habit(Habit("Exercise", "daily", today - timedelta(days=400)))
+	# A 5-day run, then a 7-day run crossing the cutoff 300 days ago
+	for days in [*range(320, 315, -1), *range(302, 295, -1), 0]:
+		db.save_check_off(habit_id, today - timedelta(days=days))
+	stats, bitmaps = db.get_stats(habit_id), db.get_period_bitmaps()
+	assert stats.longest_streak == 7
+
+	assert db.archive(today - timedelta(days=300)) == (7, 1)
+	assert len(db.get_check_offs(habit_id)) == 6
+	assert db.get_stats(habit_id) == stats
+	assert db.get_period_bitmaps() == bitmaps
+	db.rebuild_stats()
+	assert db.get_stats(habit_id) == stats
+	assert db.get_period_bitmaps() == bitmaps
+	with pytest.raises(ValueError):
+		db.count_check_offs(0, 100_000)
+
+	archive = HabitDatabase(str(tmp_path / "habits.archive.db"))
+	assert archive.load_habit(habit_id).task_name == "Exercise"
+	assert len(archive.get_check_offs(habit_id)) == 7
+	archive.close()
+
+	# Live runs still continue the archived one when replayed
+	db.delete_check_off(habit_id, today - timedelta(days=298))
+	assert db.get_stats(habit_id)[:2] == (1, 5)
+	assert db.get_stats(habit_id).total_count == 12
+	assert db.archive(today - timedelta(days=298)) == (2, 1)
+	assert db.get_stats(habit_id).total_count == 12
+	with pytest.raises(ValueError):
+		db.archive(today - timedelta(days=10))
+	db.compact()
+	db.close()
+
+def test_archived_check_offs_cannot_be_saved_again(tmp_path):
+	db = HabitDatabase(str(tmp_path / "habits.db"))
+	today = datetime.now()
+	habit_id = db.save_habit(Habit("Exercise", "daily", today - timedelta(days=400)))
+	dates = [today - timedelta(days=days) for days in range(200)]
+	db.save_check_offs_bulk([habit_id], dates)
+	rows = list(db.iter_export_rows())
+	db.archive(today - timedelta(days=150))
+	stats = db.get_stats(habit_id)
+	assert stats.total_count == 200
+
+	archived = dates[-1]
+	with pytest.raises(ValueError):
+		db.save_check_off(habit_id, archived)
+	with pytest.raises(ValueError):
+		db.save_check_offs_bulk([habit_id], [archived])
+	with pytest.raises(ValueError):
+		db.save_check_offs_batch([(habit_id, archived)])
+	backfilled = Habit("Reading", "daily", today - timedelta(days=400))
+	backfilled.check_off(archived)
+	with pytest.raises(ValueError):
+		db.save_habits_bulk([backfilled])
+	assert len(db.get_all_habits()) == 1
+	export_columns = ['habit_id', 'task_name', 'periodicity', 'creation_date', 'check_date']
+	with pytest.raises(ValueError):
+		db.import_rows(dict(zip(export_columns, row)) for row in rows)
+	assert db.get_stats(habit_id) == stats
+	db.rebuild_stats()
+	assert db.get_stats(habit_id) == stats
+	db.close()
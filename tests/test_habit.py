@@ -1,8 +1,8 @@
 import pytest
 from datetime import datetime, timedelta
-from src.habit import Habit
+from src.habit import CheckOffDates, Habit
 from src.analytics import HabitAnalytics
-from src.db_manager import HabitDatabase
+from src.memory_store import MemoryHabitStore
 
 def test_habit_creation():
   habit = Habit("Exercise", "daily")
@@ -40,7 +40,7 @@ def test_completion_rate():
   assert habit.get_completion_rate() == 50.0
 
 def test_completion_summary():
-  db = HabitDatabase()
+  db = MemoryHabitStore()
   habit1 = Habit("Exercise", "daily")
   habit2 = Habit("Reading", "weekly")
   
@@ -57,4 +57,51 @@ def test_completion_summary():
     db.save_check_off(habit2_id, today - timedelta(weeks=i))
   
   analytics = HabitAnalytics(db)  # Initialize analytics *after* saving habits
-  summary = analytics.get_completion_summary()
\ No newline at end of file
+  summary = analytics.get_completion_summary()
+
+def test_check_off_dates_stay_sorted_and_unique():
+  habit = Habit("Exercise", "daily")
+  today = datetime.now()
+  dates = [today - timedelta(days=i) for i in (2, 0, 5, 1)]
+  for date in dates + dates[:2]:
+    habit.check_off(date)
+  
+  assert list(habit.check_off_dates) == sorted(dates)
+  assert habit.check_off_dates.latest() == today
+  assert dates[2] in habit.check_off_dates
+
+def test_check_off_dates_from_sorted():
+  today = datetime.now()
+  dates = [today - timedelta(days=i) for i in (3, 2, 2, 1)]
+  check_off_dates = CheckOffDates.from_sorted(dates)
+  
+  assert len(check_off_dates) == 3
+  assert check_off_dates.count_since(today - timedelta(days=2)) == 2
+
+def test_compact_storage_matches_dates_storage():
+  created = datetime.now() - timedelta(days=10)
+  today = datetime.now()
+  habits = [Habit("Exercise", "daily", created, storage=storage)
+            for storage in ('dates', 'epoch_seconds')]
+  for habit in habits:
+    for i in (0, 1, 2, 5):
+      habit.check_off(today - timedelta(days=i))
+  
+  dates_habit, compact_habit = habits
+  assert len(compact_habit.check_off_dates) == 4
+  assert compact_habit.calculate_streak() == dates_habit.calculate_streak() == 3
+  assert compact_habit.get_completion_rate() == dates_habit.get_completion_rate()
+  assert compact_habit.check_off_dates[-1] == today.replace(microsecond=0)
+
+def test_epoch_days_storage_merges_same_day():
+  habit = Habit("Exercise", "daily", storage='epoch_days')
+  day = datetime(2024, 3, 1)
+  habit.check_off(day.replace(hour=8))
+  habit.check_off(day.replace(hour=20))
+  
+  assert list(habit.check_off_dates) == [day]
+  assert day.replace(hour=12) in habit.check_off_dates
+
+def test_invalid_storage():
+  with pytest.raises(ValueError):
+    Habit("Exercise", "daily", storage="invalid")
@@ -0,0 +1,72 @@
+import pytest
+import queue
+import time
+from datetime import datetime, timedelta
+from src.db_manager import HabitDatabase
+from src.habit import Habit
+from src.habit_stats import HabitStats
+from src.ingest import BufferedCheckOffWriter
+
+@pytest.fixture
+def db(tmp_path):
+  """Create a pooled database, which the flushing thread can write to."""
+  db = HabitDatabase(str(tmp_path / "ingest.db"), pooled=True)
+  yield db
+  db.close()
+
+def test_batches_fill_up_to_batch_size(db):
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  start = datetime(2024, 1, 1, 8)
+  with BufferedCheckOffWriter(db, batch_size=10, flush_interval=60) as writer:
+    for day in range(25):
+      writer.write(habit_id, start + timedelta(days=day))
+    writer.flush()
+    assert (writer.written, writer.batches) == (25, 3)
+
+  dates = db.get_check_offs(habit_id)
+  assert len(dates) == 25
+  assert db.get_stats(habit_id) == HabitStats.from_dates(dates, "daily")
+  assert db.count_check_offs(0, 10**6) == {habit_id: 25}
+
+def test_partial_batches_are_flushed_after_the_interval(db):
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  writer = BufferedCheckOffWriter(db, batch_size=1000, flush_interval=0.01)
+  writer.write(habit_id, datetime(2024, 1, 1))
+  for _ in range(100):
+    if db.get_check_offs(habit_id):
+      break
+    time.sleep(0.01)
+  assert db.get_check_offs(habit_id) == [datetime(2024, 1, 1)]
+  writer.close()
+
+def test_committed_durability_waits_for_the_commit(db):
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  with BufferedCheckOffWriter(db, flush_interval=60, durability='committed', batch_size=1) as writer:
+    writer.write(habit_id, datetime(2024, 1, 1))
+    assert db.get_check_offs(habit_id) == [datetime(2024, 1, 1)]
+
+def test_full_queue_applies_back_pressure(db):
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  writer = BufferedCheckOffWriter(db, batch_size=1, flush_interval=0, queue_size=1)
+  # Hold the write lock so the flushing thread cannot commit
+  with db._write_lock:
+    with pytest.raises(queue.Full):
+      for day in range(3):
+        writer.write(habit_id, datetime(2024, 1, 1) + timedelta(days=day), timeout=0.2)
+  writer.close()
+  assert len(db.get_check_offs(habit_id)) == 2
+
+def test_close_flushes_and_rejects_further_writes(db):
+  habit_id = db.save_habit(Habit("Exercise", "daily"))
+  writer = BufferedCheckOffWriter(db, flush_interval=60)
+  writer.write(habit_id)
+  writer.close()
+  assert len(db.get_check_offs(habit_id)) == 1
+  with pytest.raises(RuntimeError):
+    writer.write(habit_id)
+
+def test_invalid_options(db):
+  with pytest.raises(ValueError):
+    BufferedCheckOffWriter(db, durability='eventually')
+  with pytest.raises(ValueError):
+    BufferedCheckOffWriter(HabitDatabase(":memory:"))
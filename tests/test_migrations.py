@@ -0,0 +1,81 @@
+import sqlite3
+import pytest
+from datetime import datetime
+from src.db_manager import HabitDatabase
+from src.migrations import SCHEMA_VERSION, get_version, migrate
+
+def create_legacy_database(path):
+  """Create a database with the original text-only schema."""
+  conn = sqlite3.connect(path)
+  conn.execute("""
+    CREATE TABLE habits (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      task_name TEXT NOT NULL,
+      periodicity TEXT NOT NULL,
+      creation_date TEXT NOT NULL
+    )
+  """)
+  conn.execute("""
+    CREATE TABLE check_offs (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      habit_id INTEGER NOT NULL,
+      check_date TEXT NOT NULL,
+      FOREIGN KEY (habit_id) REFERENCES habits (id),
+      UNIQUE(habit_id, check_date)
+    )
+  """)
+  conn.execute("INSERT INTO habits VALUES (1, 'Exercise', 'daily', '2024-01-01T08:00:00')")
+  conn.executemany(
+    "INSERT INTO check_offs (habit_id, check_date) VALUES (1, ?)",
+    [("2024-01-02T07:30:00.250000",), ("2024-01-03T21:15:00",)]
+  )
+  conn.commit()
+  conn.close()
+
+def test_new_database_is_at_current_version():
+  db = HabitDatabase(":memory:")
+  assert get_version(db.conn) == SCHEMA_VERSION
+  db.close()
+
+def test_legacy_database_is_backfilled(tmp_path):
+  path = str(tmp_path / "legacy.db")
+  create_legacy_database(path)
+  
+  db = HabitDatabase(path)
+  assert get_version(db.conn) == SCHEMA_VERSION
+  
+  habit = db.load_habit(1)
+  assert habit.creation_date == datetime(2024, 1, 1, 8, 0)
+  assert list(habit.check_off_dates) == [
+    datetime(2024, 1, 2, 7, 30, 0, 250000),
+    datetime(2024, 1, 3, 21, 15),
+  ]
+  
+  # Compact storage reads the backfilled integer seconds
+  compact = db.load_habit(1, storage='epoch_seconds')
+  assert list(compact.check_off_dates) == [
+    datetime(2024, 1, 2, 7, 30),
+    datetime(2024, 1, 3, 21, 15),
+  ]
+  days = [row['check_day'] for row in db.conn.execute("SELECT check_day FROM check_offs")]
+  assert days == [19724, 19725]
+  
+  stats = db.get_stats(1)
+  assert stats.total_count == 2
+  assert stats.longest_streak == 1
+  assert db.count_check_offs(19724, 19725) == {1: 2}
+  assert list(db.get_period_bitmaps()[1].periods()) == [19724, 19725]
+  db.close()
+
+def test_migrate_is_idempotent():
+  conn = sqlite3.connect(":memory:")
+  assert migrate(conn) == SCHEMA_VERSION
+  assert migrate(conn) == SCHEMA_VERSION
+  conn.close()
+
+def test_newer_schema_is_rejected():
+  conn = sqlite3.connect(":memory:")
+  conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+  with pytest.raises(RuntimeError):
+    migrate(conn)
+  conn.close()
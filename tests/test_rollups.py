@@ -0,0 +1,87 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from src.dates import from_epoch_day, to_epoch_day
+from src.db_manager import HabitDatabase
+from src.habit import Habit
+from src.rollups import cover, month_start, next_month_start, rebuild_rollups, week_start
+
+@pytest.fixture
+def db():
+  """Create a temporary database for testing."""
+  db = HabitDatabase(":memory:")
+  yield db
+  db.close()
+
+def bucket_days(bucket_type, bucket):
+  """Return the epoch days covered by a bucket."""
+  if bucket_type == 'day':
+    return [bucket]
+  if bucket_type == 'week':
+    return list(range(bucket, bucket + 7))
+  return list(range(bucket, next_month_start(bucket)))
+
+def test_bucket_starts():
+  # 2024-03-14 is a Thursday
+  day = to_epoch_day(datetime(2024, 3, 14))
+  assert from_epoch_day(week_start(day)) == datetime(2024, 3, 11)
+  assert from_epoch_day(month_start(day)) == datetime(2024, 3, 1)
+  assert from_epoch_day(next_month_start(day)) == datetime(2024, 4, 1)
+  assert from_epoch_day(week_start(-10)).weekday() == 0
+
+def test_cover_spans_each_day_once():
+  rng = random.Random(3)
+  for _ in range(300):
+    start = rng.randint(19000, 20000)
+    end = start + rng.randint(0, 400)
+    days = []
+    for bucket_type, first, last in cover(start, end):
+      bucket = first
+      while bucket <= last:
+        days.extend(bucket_days(bucket_type, bucket))
+        bucket = bucket + 1 if bucket_type == 'day' else (
+          bucket + 7 if bucket_type == 'week' else next_month_start(bucket))
+    assert days == list(range(start, end + 1))
+
+def rollup_rows(db):
+  return db.conn.execute(
+    "SELECT habit_id, bucket_type, bucket, count FROM check_off_rollups ORDER BY 1, 2, 3"
+  ).fetchall()
+
+def assert_rollups_match_history(db):
+  incremental = [tuple(row) for row in rollup_rows(db)]
+  with db.conn:
+    rebuild_rollups(db.conn)
+  assert incremental == [tuple(row) for row in rollup_rows(db)]
+
+def test_rollups_follow_every_write_path(db):
+  start = datetime(2024, 1, 25, 8)
+  first = db.save_habit(Habit("Exercise", "daily", start))
+  second = db.save_habit(Habit("Read", "weekly", start))
+  for day in (0, 1, 5, 9):
+    db.save_check_off(first, start + timedelta(days=day))
+  db.save_check_offs_bulk([first, second], [start + timedelta(days=day) for day in range(4, 12)])
+  assert_rollups_match_history(db)
+
+  generated = Habit("Meditate", "daily", start)
+  for day in range(40):
+    generated.check_off(start + timedelta(days=day))
+  db.save_habits_bulk([generated])
+  assert db.delete_check_off(first, start + timedelta(days=5))
+  assert not db.delete_check_off(first, start + timedelta(days=5))
+  db.delete_habit(second)
+  assert_rollups_match_history(db)
+
+def test_count_check_offs_matches_history(db):
+  rng = random.Random(7)
+  start = datetime(2023, 11, 1, 9)
+  habit_id = db.save_habit(Habit("Exercise", "daily", start))
+  dates = [start + timedelta(days=day) for day in range(200) if rng.random() < 0.6]
+  db.save_check_offs_bulk([habit_id], dates)
+
+  days = [to_epoch_day(date) for date in dates]
+  for _ in range(50):
+    first = rng.randint(days[0] - 10, days[-1])
+    last = first + rng.randint(0, 150)
+    expected = sum(first <= day <= last for day in days)
+    assert db.count_check_offs(first, last).get(habit_id, 0) == expected
@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime, timedelta
+from src.dates import to_epoch_day
+from src.habit import Habit
+from src.habit_stats import HabitStats
+from src.memory_store import MemoryHabitStore
+from src.storage import BACKENDS, HabitStore, open_store
+
+@pytest.fixture(params=BACKENDS)
+def store(request):
+  """Create an empty store, once per backend."""
+  store = open_store(":memory:", backend=request.param)
+  yield store
+  store.close()
+
+def test_backends_implement_the_protocol(store):
+  assert isinstance(store, HabitStore)
+
+def test_unknown_backend():
+  with pytest.raises(ValueError):
+    open_store(backend='csv')
+
+def test_check_offs_and_stats(store):
+  habit_id = store.save_habit(Habit("Exercise", "daily", datetime(2024, 1, 1)))
+  start = datetime(2024, 1, 1, 8)
+  for day in [0, 1, 2, 5, 6]:
+    store.save_check_off(habit_id, start + timedelta(days=day))
+  store.save_check_off(habit_id, start)
+
+  assert store.load_habit(habit_id).check_off_dates == store.get_check_offs(habit_id)
+  assert store.get_stats(habit_id) == HabitStats(2, 3, start + timedelta(days=6), 5)
+  assert store.get_check_offs(habit_id, since=start + timedelta(days=2), limit=2) == [
+    start + timedelta(days=2), start + timedelta(days=5)
+  ]
+  assert store.get_check_offs(habit_id, until=start + timedelta(days=2), descending=True) == [
+    start + timedelta(days=1), start
+  ]
+
+  # Filling the gap merges both runs
+  assert store.save_check_offs_bulk([habit_id], [start + timedelta(days=3), start + timedelta(days=4)]) == 2
+  assert store.get_stats(habit_id).longest_streak == 7
+  assert store.delete_check_off(habit_id, start + timedelta(days=3))
+  assert not store.delete_check_off(habit_id, start + timedelta(days=3))
+  assert store.get_stats(habit_id) == HabitStats.from_dates(store.get_check_offs(habit_id), "daily")
+  assert store.count_check_offs(to_epoch_day(start), to_epoch_day(start) + 2) == {habit_id: 3}
+
+def test_paging_and_deletes(store):
+  ids = [store.save_habit(Habit(f"Habit {i}", "weekly" if i % 2 else "daily")) for i in range(5)]
+  store.delete_habit(ids[2])
+
+  assert [id for id, _ in store.iter_habits(batch_size=2)] == [ids[0], ids[1], ids[3], ids[4]]
+  assert [id for id, _, _ in store.iter_stats(after_id=ids[0], limit=2)] == [ids[1], ids[3]]
+  assert [id for id, _ in store.iter_habits(periodicity="weekly")] == [ids[1], ids[3]]
+  assert store.get_newest_habit_ids() == {'daily': ids[4], 'weekly': ids[3]}
+  assert store.load_habit(ids[2]) is None
+  with pytest.raises(ValueError):
+    list(store.iter_stats(batch_size=0))
+  with pytest.raises(ValueError):
+    store.save_check_offs_bulk([ids[2]], [datetime.now()])
+
+def test_import_and_export_round_trip(store):
+  rows = [
+    {'habit_id': '7', 'task_name': 'Read', 'periodicity': 'daily',
+     'creation_date': '2024-01-01T00:00:00', 'check_date': date}
+    for date in ['2024-01-02T09:00:00', '2024-01-03T09:00:00', '2024-01-02T09:00:00']
+  ] + [{'habit_id': '9', 'task_name': 'Plan', 'periodicity': 'weekly',
+        'creation_date': '2024-01-01T00:00:00', 'check_date': ''}]
+  assert store.import_rows(rows) == (2, 2)
+  assert list(store.iter_export_rows()) == [
+    (7, 'Read', 'daily', '2024-01-01T00:00:00', '2024-01-02T09:00:00'),
+    (7, 'Read', 'daily', '2024-01-01T00:00:00', '2024-01-03T09:00:00'),
+    (9, 'Plan', 'weekly', '2024-01-01T00:00:00', None),
+  ]
+  assert store.get_stats(7).current_run == 2
+  assert store.save_habit(Habit("Next", "daily")) == 10
+
+def test_data_version_changes_on_writes(store):
+  before = store.get_data_version()
+  habit_id = store.save_habit(Habit("Exercise", "daily"))
+  assert store.get_data_version() != before
+  before = store.get_data_version()
+  store.save_check_off(habit_id, datetime.now())
+  assert store.get_data_version() != before
+
+def test_memory_store_copies_habits():
+  store = MemoryHabitStore()
+  habit_id = store.save_habit(Habit("Exercise", "daily"))
+  store.load_habit(habit_id).check_off(datetime.now())
+  assert store.get_check_offs(habit_id) == []
+
+def test_save_check_offs_batch(store):
+  exercise_id = store.save_habit(Habit("Exercise", "daily"))
+  read_id = store.save_habit(Habit("Read", "daily"))
+  start = datetime(2024, 1, 1)
+  store.save_check_off(exercise_id, start + timedelta(days=3))
+
+  pairs = [(exercise_id, start + timedelta(days=day)) for day in range(5)]
+  pairs += [(read_id, start), (read_id, start)]
+  assert store.save_check_offs_batch(pairs) == 5
+  for habit_id, runs in [(exercise_id, 5), (read_id, 1)]:
+    dates = store.get_check_offs(habit_id)
+    assert len(dates) == runs
+    assert store.get_stats(habit_id) == HabitStats.from_dates(dates, "daily")
+  assert store.count_check_offs(to_epoch_day(start), to_epoch_day(start) + 4, [exercise_id]) == {exercise_id: 5}